@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import sys
 import os
@@ -13,13 +13,16 @@ load_dotenv('../../config/.env')
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.preprocessing.preprocessor import DataPreprocessor
-from src.feature_engineering.engineer import FeatureEngineer
-from src.models.predictor import ShelfLifePredictor
-from src.inference.pipeline import InferencePipeline
-from src.rules.interpreter import RuleBasedInterpreter
+from src.inference.registry import ModelRegistry
+from src.inference.grid import DEFAULT_MAX_GRID_ERROR
+from src.inference.batcher import MicroBatcher
+from src.inference.cache import PredictionCache
+from src.inference.streaming import iter_ndjson_records, iter_csv_records, stream_predictions
 from src.services.voice_service import ElevenLabsVoiceService
 from src.services.chat_service import OpenRouterChatService
+from src.services.upstream import upstream_stats
+from src.services.audio_cache import AudioCache
+from src.services.chat_cache import ChatResponseCache
 
 app = Flask(__name__)
 CORS(app)
@@ -27,34 +30,227 @@ CORS(app)
 pipeline = None
 voice_service = None
 chat_service = None
+model_registry = None
+micro_batcher = None
+prediction_cache = None
 
 
-def load_pipeline():
-    global pipeline, voice_service, chat_service
-    try:
-        preprocessor = DataPreprocessor().load('models/preprocessor.pkl')
-        model = ShelfLifePredictor().load('models/shelf_life_predictor.pkl')
-        feature_engineer = FeatureEngineer()
-        rule_interpreter = RuleBasedInterpreter()
+def get_pipeline():
+    return pipeline
 
-        pipeline = InferencePipeline(preprocessor, feature_engineer, model, rule_interpreter)
-        print("Pipeline loaded successfully!")
-    except Exception as e:
-        print(f"Error loading pipeline: {e}")
-        traceback.print_exc()
+
+def set_pipeline(new_pipeline):
+    global pipeline
+    pipeline = new_pipeline
+
+
+def parse_item(data):
+    return {
+        'food_type': data['food_type'],
+        'temperature': float(data['temperature']),
+        'humidity': float(data['humidity']),
+        'storage_type': data['storage_type'],
+        'days_stored': float(data['days_stored'])
+    }
+
+
+def predict_item(data, active=None):
+    if active is None:
+        active = pipeline
+    item = parse_item(data)
+    with_interval = bool(data.get('interval', False))
+
+    if with_interval and not active.supports_intervals:
+        raise ValueError("The loaded model does not support prediction intervals")
+
+    def compute(row):
+        if with_interval:
+            return active.model_output(**row, with_interval=True)
+        if micro_batcher is not None:
+            return micro_batcher.submit(row, active)
+        return active.model_output(**row)
+
+    if prediction_cache is not None:
+        kind = 'prediction_interval' if with_interval else 'prediction'
+        output = prediction_cache.get_or_compute(item, active.model_version, compute, kind=kind)
+    else:
+        output = compute(item)
+    # The rules always see the exact readings, even when the model output
+    # came from a cache entry for nearby ones.
+    return active.finish_single(**item, **output)
+
+
+def explain_item(data, active=None):
+    if active is None:
+        active = pipeline
+    if not active.can_explain:
+        return None
+
+    item = parse_item(data)
+    compute = lambda row: active.explain_contributions(**row)
+
+    if prediction_cache is not None:
+        return prediction_cache.get_or_compute(item, active.model_version, compute, kind='contributions')
+    return compute(item)
+
+
+def load_model():
+    global model_registry
+    if model_registry is not None:
+        return
+
+    model_registry = ModelRegistry(
+        'models',
+        on_swap=set_pipeline,
+        poll_interval=float(os.getenv('MODEL_WATCH_INTERVAL', '5')),
+        use_grid=os.getenv('PREDICTION_GRID', '').lower() in ('1', 'true', 'yes'),
+        max_grid_error=float(os.getenv('PREDICTION_GRID_MAX_ERROR') or DEFAULT_MAX_GRID_ERROR),
+        safety_on_lower_bound=os.getenv('SAFETY_ON_LOWER_BOUND', '').lower() in ('1', 'true', 'yes')
+    )
+    if model_registry.reload():
+        print(f"Pipeline loaded successfully! (model version {model_registry.version})")
+
+
+def load_upstream_services():
+    global voice_service, chat_service
+    if chat_service is not None:
+        return
 
     try:
         voice_service = ElevenLabsVoiceService()
         chat_service = OpenRouterChatService()
         print("Services loaded successfully!")
+
+        if os.getenv('AUDIO_CACHE', '').lower() in ('1', 'true', 'yes'):
+            voice_service.audio_cache = AudioCache(
+                directory=os.getenv('AUDIO_CACHE_DIR', 'cache/audio'),
+                max_memory_bytes=int(float(os.getenv('AUDIO_CACHE_MEMORY_MB', '16')) * 1024 * 1024),
+                max_disk_bytes=int(float(os.getenv('AUDIO_CACHE_DISK_MB', '512')) * 1024 * 1024)
+            )
+            print(f"Audio cache enabled ({voice_service.audio_cache.directory})")
     except Exception as e:
         print(f"Error loading services: {e}")
         traceback.print_exc()
 
 
+def load_pipeline():
+    load_model()
+    load_upstream_services()
+
+
+def start_services():
+    # Threads and sqlite connections do not survive a fork, so everything
+    # here is started once per serving process, after the model is loaded.
+    global micro_batcher, prediction_cache
+    if model_registry is not None:
+        model_registry.start_watcher()
+
+    if micro_batcher is None and os.getenv('MICRO_BATCHING', '').lower() in ('1', 'true', 'yes'):
+        micro_batcher = MicroBatcher(
+            get_pipeline,
+            max_batch_size=int(os.getenv('MICRO_BATCH_MAX_SIZE', '64')),
+            max_wait_ms=float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', '2'))
+        ).start()
+        print(f"Micro-batching enabled (max {micro_batcher.max_batch_size} rows, "
+              f"{micro_batcher.max_wait * 1000:.1f}ms)")
+
+    cache_backend = os.getenv('PREDICTION_CACHE', '').lower()
+    if prediction_cache is None and cache_backend:
+        step = float(os.getenv('PREDICTION_CACHE_STEP', '0.5'))
+        prediction_cache = PredictionCache(
+            backend=cache_backend,
+            max_entries=int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', '100000')),
+            max_bytes=int(float(os.getenv('PREDICTION_CACHE_MAX_MB', '64')) * 1024 * 1024),
+            temperature_step=step,
+            humidity_step=step,
+            days_step=step,
+            path=os.getenv('PREDICTION_CACHE_PATH', 'cache/predictions.sqlite3')
+        )
+        print(f"Prediction cache enabled ({cache_backend}, step {step})")
+
+    start_chat_cache()
+
+
+def start_chat_cache():
+    if (chat_service is not None and chat_service.response_cache is None
+            and os.getenv('CHAT_CACHE', '').lower() in ('1', 'true', 'yes')):
+        chat_service.response_cache = ChatResponseCache(
+            path=os.getenv('CHAT_CACHE_PATH', 'cache/chat.sqlite3'),
+            ttl=float(os.getenv('CHAT_CACHE_TTL', '86400')),
+            max_entries=int(os.getenv('CHAT_CACHE_MAX_ENTRIES', '10000')),
+            max_bytes=int(float(os.getenv('CHAT_CACHE_MAX_MB', '32')) * 1024 * 1024),
+            temperature_step=float(os.getenv('CHAT_CACHE_TEMPERATURE_STEP', '1')),
+            humidity_step=float(os.getenv('CHAT_CACHE_HUMIDITY_STEP', '5')),
+            days_step=float(os.getenv('CHAT_CACHE_DAYS_STEP', '1'))
+        )
+        print(f"Chat response cache enabled ({chat_service.response_cache.path}, "
+              f"ttl {chat_service.response_cache.ttl:.0f}s)")
+
+
+def stop_services():
+    global micro_batcher, prediction_cache
+    if model_registry is not None:
+        model_registry.stop_watcher()
+    if micro_batcher is not None:
+        micro_batcher.stop()
+        micro_batcher = None
+    if prediction_cache is not None:
+        prediction_cache.close()
+        prediction_cache = None
+    if chat_service is not None and chat_service.response_cache is not None:
+        chat_service.response_cache.close()
+        chat_service.response_cache = None
+
+
+def create_app(forking=False):
+    # With forking=True (gunicorn --preload) only the shared, read-only state
+    # is built here; each worker calls start_services() after the fork.
+    load_pipeline()
+    if not forking:
+        start_services()
+    return app
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'pipeline_loaded': pipeline is not None})
+    response = {'status': 'healthy', 'pipeline_loaded': pipeline is not None}
+    if model_registry is not None:
+        response.update(model_registry.status())
+    return jsonify(response)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    response = {}
+    if micro_batcher is not None:
+        response['micro_batcher'] = micro_batcher.stats()
+    if prediction_cache is not None:
+        response['prediction_cache'] = prediction_cache.stats()
+    if voice_service is not None and voice_service.audio_cache is not None:
+        response['audio_cache'] = voice_service.audio_cache.stats()
+    if chat_service is not None and chat_service.response_cache is not None:
+        response['chat_cache'] = chat_service.response_cache.stats()
+    response['upstreams'] = upstream_stats()
+    return jsonify(response)
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if admin_token and request.headers.get('X-Admin-Token') != admin_token:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    if model_registry is None:
+        return jsonify({'error': 'Model registry not initialized'}), 500
+
+    if request.args.get('wait') in ('1', 'true'):
+        if not model_registry.reload(wait=True):
+            return jsonify({'error': model_registry.last_error or 'Reload failed'}), 500
+        return jsonify(model_registry.status())
+
+    if not model_registry.reload_async():
+        return jsonify({'error': 'Reload already in progress', **model_registry.status()}), 409
+    return jsonify({'reload_started': True, **model_registry.status()}), 202
 
 
 @app.route('/predict', methods=['POST'])
@@ -64,14 +260,10 @@ def predict():
 
     try:
         data = request.get_json()
+        if data.get('interval') and not pipeline.supports_intervals:
+            return jsonify({'error': 'The loaded model does not support prediction intervals'}), 400
 
-        result = pipeline.predict_single(
-            food_type=data['food_type'],
-            temperature=float(data['temperature']),
-            humidity=float(data['humidity']),
-            storage_type=data['storage_type'],
-            days_stored=float(data['days_stored'])
-        )
+        result = predict_item(data)
 
         return jsonify(result)
     except Exception as e:
@@ -82,21 +274,21 @@ def predict():
 
 @app.route('/explain', methods=['POST'])
 def explain():
-    if pipeline is None:
+    # One pipeline for the prediction, its contributions and the text, so a
+    # reload in between cannot mix two model versions in one answer.
+    active = pipeline
+    if active is None:
         return jsonify({'error': 'Model not loaded'}), 500
 
     try:
         data = request.get_json()
 
-        result = pipeline.predict_single(
-            food_type=data['food_type'],
-            temperature=float(data['temperature']),
-            humidity=float(data['humidity']),
-            storage_type=data['storage_type'],
-            days_stored=float(data['days_stored'])
-        )
+        result = predict_item(data, active)
+        contributions = explain_item(data, active)
+        if contributions is not None:
+            result = dict(result, **contributions)
 
-        explanation = pipeline.explain_prediction(result)
+        explanation = active.explain_prediction(result)
 
         return jsonify({
             'explanation': explanation,
@@ -116,42 +308,111 @@ def batch_predict():
     try:
         data = request.get_json()
         items = data.get('items', [])
+        per_item_importance = bool(data.get('per_item_feature_importance', False))
+        with_interval = bool(data.get('interval', False))
+
+        active = pipeline
+        if with_interval and not active.supports_intervals:
+            return jsonify({'error': 'The loaded model does not support prediction intervals'}), 400
 
-        results = pipeline.predict(items)
+        results = active.predict(items, include_feature_importance=per_item_importance, with_interval=with_interval)
 
-        return jsonify({'results': results})
+        return jsonify({'results': results, 'feature_importance': active.feature_importance})
     except Exception as e:
         print(f"Batch prediction error: {e}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/voice/explain', methods=['POST'])
-def voice_explain():
+@app.route('/batch_predict/stream', methods=['POST'])
+def batch_predict_stream():
     if pipeline is None:
         return jsonify({'error': 'Model not loaded'}), 500
 
+    active = pipeline
+    chunk_size = request.args.get('chunk_size', 5000, type=int)
+    with_interval = request.args.get('interval') in ('1', 'true')
+    if chunk_size <= 0:
+        return jsonify({'error': 'chunk_size must be positive'}), 400
+    if with_interval and not active.supports_intervals:
+        return jsonify({'error': 'The loaded model does not support prediction intervals'}), 400
+
+    if request.mimetype == 'text/csv':
+        records = iter_csv_records(request.stream)
+    elif request.mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        records = iter_ndjson_records(request.stream)
+    else:
+        return jsonify({'error': 'Send the items as text/csv or application/x-ndjson'}), 415
+
+    return Response(
+        stream_with_context(stream_predictions(active, records, chunk_size, with_interval)),
+        mimetype='application/x-ndjson'
+    )
+
+
+@app.route('/batch_explain', methods=['POST'])
+def batch_explain():
+    if pipeline is None:
+        return jsonify({'error': 'Model not loaded'}), 500
+
+    active = pipeline
+    if not active.can_explain:
+        return jsonify({'error': 'The loaded model does not support per-prediction contributions'}), 400
+
     try:
         data = request.get_json()
+        items = data.get('items', [])
+        top_n = int(data.get('top_n', 5))
 
-        result = pipeline.predict_single(
-            food_type=data['food_type'],
-            temperature=float(data['temperature']),
-            humidity=float(data['humidity']),
-            storage_type=data['storage_type'],
-            days_stored=float(data['days_stored'])
-        )
+        batch = active.predict_batch(items, with_contributions=True)
+        results = active.build_results(batch, include_feature_importance=False, top_n_contributions=top_n)
 
-        audio_result = voice_service.generate_explanation_audio(result)
+        return jsonify({'results': results, 'feature_importance': active.feature_importance})
+    except Exception as e:
+        print(f"Batch explanation error: {e}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
 
-        if 'error' in audio_result:
-            return jsonify(audio_result), 500
 
-        return send_file(
-            io.BytesIO(audio_result['audio_data']),
-            mimetype='audio/mpeg',
-            as_attachment=False
-        )
+def audio_response(audio_result):
+    if 'error' in audio_result:
+        return jsonify(audio_result), 500
+
+    if 'audio_stream' in audio_result:
+        # No Content-Length, so the server uses chunked transfer and the
+        # audio is relayed as ElevenLabs produces it.
+        return Response(audio_result['audio_stream'], mimetype='audio/mpeg')
+
+    if 'audio_path' in audio_result:
+        # Served from the disk cache; the WSGI file wrapper lets the server
+        # use sendfile instead of copying the MP3 through Python.
+        return send_file(audio_result['audio_path'], mimetype='audio/mpeg', etag=audio_result['cache_key'])
+
+    return send_file(
+        io.BytesIO(audio_result['audio_data']),
+        mimetype='audio/mpeg',
+        as_attachment=False
+    )
+
+
+@app.route('/voice/explain', methods=['POST'])
+def voice_explain():
+    if pipeline is None:
+        return jsonify({'error': 'Model not loaded'}), 500
+
+    try:
+        data = request.get_json()
+
+        result = predict_item(data)
+
+        try:
+            return audio_response(voice_service.generate_explanation_audio(result))
+        except FileNotFoundError:
+            # Another worker evicted the cached file between the lookup and
+            # send_file opening it. Once open, the file stays readable even if
+            # it is removed, so only this window needs handling: the second
+            # lookup misses and the audio is synthesized again.
+            return audio_response(voice_service.generate_explanation_audio(result))
 
     except Exception as e:
         print(f"Voice explanation error: {e}")
@@ -190,13 +451,7 @@ def prediction_explanation():
     try:
         data = request.get_json()
 
-        result = pipeline.predict_single(
-            food_type=data['food_type'],
-            temperature=float(data['temperature']),
-            humidity=float(data['humidity']),
-            storage_type=data['storage_type'],
-            days_stored=float(data['days_stored'])
-        )
+        result = predict_item(data)
 
         explanation = chat_service.get_prediction_explanation(result)
 
@@ -232,5 +487,5 @@ def storage_advice():
 
 
 if __name__ == '__main__':
-    load_pipeline()
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Development server only; see gunicorn.conf.py for production serving.
+    create_app().run(host='0.0.0.0', port=5001, debug=True)
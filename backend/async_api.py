@@ -0,0 +1,231 @@
+import sys
+import os
+import asyncio
+import traceback
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+
+import api
+from src.services.upstream import upstream_stats
+
+# Chat and voice endpoints spend almost all their time waiting on upstream
+# APIs. Served here on one event loop, an in-flight upstream call costs a
+# coroutine instead of a worker thread, and a slow upstream never queues
+# /predict, which stays on the WSGI server.
+
+in_flight = 0
+
+
+async def call_upstream(coroutine):
+    global in_flight
+    in_flight += 1
+    try:
+        return await coroutine
+    finally:
+        in_flight -= 1
+
+
+async def run_prediction(data):
+    # Scoring is CPU-bound, so it runs on the default executor rather than
+    # holding up the event loop.
+    return await asyncio.get_running_loop().run_in_executor(None, api.predict_item, data)
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == 'OPTIONS':
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get('Access-Control-Request-Headers', '*')
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+async def health_check(request):
+    return web.json_response({
+        'status': 'healthy',
+        'pipeline_loaded': api.pipeline is not None,
+        'chat_service_loaded': api.chat_service is not None,
+        'voice_service_loaded': api.voice_service is not None,
+        'upstream_in_flight': in_flight
+    })
+
+
+async def metrics(request):
+    response = {'upstreams': upstream_stats()}
+    if api.voice_service is not None and api.voice_service.audio_cache is not None:
+        response['audio_cache'] = api.voice_service.audio_cache.stats()
+    if api.chat_service is not None and api.chat_service.response_cache is not None:
+        response['chat_cache'] = api.chat_service.response_cache.stats()
+    return web.json_response(response)
+
+
+async def stream_audio(request, relay):
+    response = web.StreamResponse(headers={'Content-Type': 'audio/mpeg'})
+    response.enable_chunked_encoding()
+    try:
+        await response.prepare(request)
+        async for chunk in relay:
+            # write() waits while the client is behind, which in turn stops
+            # the relay reading from the upstream.
+            await response.write(chunk)
+        await response.write_eof()
+    except ConnectionResetError:
+        pass
+    finally:
+        relay.close()
+    return response
+
+
+async def audio_response(request, audio_result):
+    if 'error' in audio_result:
+        return web.json_response(audio_result, status=500)
+
+    if 'audio_stream' in audio_result:
+        return await stream_audio(request, audio_result['audio_stream'])
+
+    if 'audio_path' in audio_result:
+        # web.FileResponse would only open the path after the handler
+        # returns, too late to recover if the entry is evicted meanwhile, so
+        # the file is opened here; an open file stays readable after removal.
+        audio_file = await asyncio.get_running_loop().run_in_executor(None, open, audio_result['audio_path'], 'rb')
+        return web.Response(body=audio_file, content_type='audio/mpeg')
+
+    return web.Response(body=audio_result['audio_data'], content_type='audio/mpeg')
+
+
+async def voice_explain(request):
+    if api.pipeline is None:
+        return web.json_response({'error': 'Model not loaded'}, status=500)
+
+    try:
+        data = await request.json()
+
+        result = await run_prediction(data)
+
+        try:
+            audio_result = await call_upstream(api.voice_service.generate_explanation_audio_async(result))
+            return await audio_response(request, audio_result)
+        except FileNotFoundError:
+            # Evicted by another worker since the lookup; the second lookup
+            # misses and the audio is synthesized again.
+            audio_result = await call_upstream(api.voice_service.generate_explanation_audio_async(result))
+            return await audio_response(request, audio_result)
+
+    except Exception as e:
+        print(f"Voice explanation error: {e}")
+        traceback.print_exc()
+        return web.json_response({'error': str(e)}, status=500)
+
+
+async def chat(request):
+    if api.chat_service is None:
+        return web.json_response({'error': 'Chat service not loaded'}, status=500)
+
+    try:
+        data = await request.json()
+        message = data.get('message', '')
+        context = data.get('context')
+
+        response = await call_upstream(api.chat_service.chat_async(message, context))
+
+        if 'error' in response:
+            return web.json_response(response, status=500)
+
+        return web.json_response(response)
+
+    except Exception as e:
+        print(f"Chat error: {e}")
+        traceback.print_exc()
+        return web.json_response({'error': str(e)}, status=500)
+
+
+async def prediction_explanation(request):
+    if api.pipeline is None or api.chat_service is None:
+        return web.json_response({'error': 'Services not loaded'}, status=500)
+
+    try:
+        data = await request.json()
+
+        result = await run_prediction(data)
+
+        explanation = await call_upstream(api.chat_service.get_prediction_explanation_async(result))
+
+        return web.json_response({'explanation': explanation})
+
+    except Exception as e:
+        print(f"Prediction explanation error: {e}")
+        traceback.print_exc()
+        return web.json_response({'error': str(e)}, status=500)
+
+
+async def storage_advice(request):
+    if api.chat_service is None:
+        return web.json_response({'error': 'Chat service not loaded'}, status=500)
+
+    try:
+        data = await request.json()
+        food_type = data['food_type']
+        storage_conditions = data.get('storage_conditions', {})
+
+        response = await call_upstream(api.chat_service.get_storage_advice_async(food_type, storage_conditions))
+
+        if 'error' in response:
+            return web.json_response(response, status=500)
+
+        return web.json_response(response)
+
+    except Exception as e:
+        print(f"Storage advice error: {e}")
+        traceback.print_exc()
+        return web.json_response({'error': str(e)}, status=500)
+
+
+def load_services():
+    # Only what these endpoints use: the model, which follows retrains like
+    # the WSGI server's, and the upstream services with their caches. The
+    # micro-batcher and prediction cache serve /predict and stay there.
+    api.load_pipeline()
+    if api.model_registry is not None:
+        api.model_registry.start_watcher()
+    api.start_chat_cache()
+
+
+async def on_startup(app):
+    # Loading the model and opening the caches block, so they run on a
+    # thread instead of the event loop.
+    await asyncio.get_running_loop().run_in_executor(None, load_services)
+
+
+async def on_cleanup(app):
+    for service in (api.chat_service, api.voice_service):
+        if service is not None:
+            await service.close_async()
+    await asyncio.get_running_loop().run_in_executor(None, api.stop_services)
+
+
+def create_async_app():
+    app = web.Application(middlewares=[cors_middleware])
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_post('/voice/explain', voice_explain)
+    app.router.add_post('/chat', chat)
+    app.router.add_post('/chat/prediction_explanation', prediction_explanation)
+    app.router.add_post('/chat/storage_advice', storage_advice)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == '__main__':
+    # SIGTERM stops accepting connections and waits up to shutdown_timeout
+    # for in-flight upstream calls before closing the sessions.
+    web.run_app(
+        create_async_app(),
+        host=os.getenv('ASYNC_API_HOST', '0.0.0.0'),
+        port=int(os.getenv('ASYNC_API_PORT', '5002')),
+        shutdown_timeout=float(os.getenv('ASYNC_API_GRACEFUL_TIMEOUT', '30'))
+    )
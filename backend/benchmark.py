@@ -0,0 +1,116 @@
+import sys
+import os
+import json
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.preprocessing.preprocessor import DataPreprocessor, load_data
+from src.feature_engineering.engineer import FeatureEngineer
+from src.models.compiled import CompiledTreeEnsemble
+from src.models.predictor import ShelfLifePredictor
+from src.rules.interpreter import RuleBasedInterpreter
+from src.inference.pipeline import InferencePipeline
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor
+import numpy as np
+
+
+def time_call(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def load_features():
+    X, y = load_data('data/food_shelf_life.csv')
+    preprocessor = DataPreprocessor()
+    X_featured = FeatureEngineer().transform(preprocessor.fit_transform(X))
+    return X_featured, y
+
+
+def benchmark_compiled(batch_sizes=(1, 100, 100000)):
+    print("=" * 80)
+    print("Compiled tree ensemble vs sklearn predict")
+    print("=" * 80)
+
+    X_featured, y = load_features()
+
+    models = [
+        ('Random Forest', RandomForestRegressor(n_estimators=300, random_state=42, n_jobs=-1)),
+        ('Extra Trees', ExtraTreesRegressor(n_estimators=300, random_state=42, n_jobs=-1)),
+        ('Gradient Boosting', GradientBoostingRegressor(n_estimators=300, random_state=42))
+    ]
+
+    print(f"\n{'Model':<20} {'Batch':>8} {'sklearn':>12} {'compiled':>12} {'Speedup':>9} {'Max diff':>10}")
+    print("-" * 80)
+
+    for name, model in models:
+        model.fit(X_featured, y)
+        compiled = CompiledTreeEnsemble.from_estimator(model)
+
+        for batch_size in batch_sizes:
+            batch = X_featured.sample(batch_size, replace=True, random_state=42)
+            batch_array = batch.to_numpy()
+            repeats = 50 if batch_size <= 1000 else 3
+
+            sklearn_time = time_call(lambda: model.predict(batch), repeats)
+            compiled_time = time_call(lambda: compiled.predict(batch_array), repeats)
+            max_diff = np.abs(model.predict(batch) - compiled.predict(batch_array)).max()
+
+            print(f"{name:<20} {batch_size:>8} {sklearn_time * 1000:>10.2f}ms {compiled_time * 1000:>10.2f}ms "
+                  f"{sklearn_time / compiled_time:>8.1f}x {max_diff:>10.1e}")
+
+
+def load_pipeline_for_benchmark():
+    X, y = load_data('data/food_shelf_life.csv')
+    preprocessor = DataPreprocessor()
+    feature_engineer = FeatureEngineer()
+    X_featured = feature_engineer.transform(preprocessor.fit_transform(X))
+
+    predictor = ShelfLifePredictor(n_estimators=100)
+    predictor.train(X_featured, y)
+    return InferencePipeline(preprocessor, feature_engineer, predictor, RuleBasedInterpreter()), X
+
+
+def benchmark_response_size(n_items=100000):
+    print("=" * 80)
+    print(f"/batch_predict response size for {n_items} items")
+    print("=" * 80)
+
+    pipeline, X = load_pipeline_for_benchmark()
+    items = X.sample(n_items, replace=True, random_state=42).to_dict('records')
+    batch = pipeline.predict_batch(items)
+
+    print(f"\n{'Layout':<34} {'Build':>10} {'Encode':>10} {'Size':>12} {'Per item':>10}")
+    print("-" * 80)
+
+    layouts = [
+        ('per-item feature_importance', True, lambda results: {'results': results}),
+        ('envelope feature_importance', False,
+         lambda results: {'results': results, 'feature_importance': pipeline.feature_importance})
+    ]
+    for name, per_item, envelope in layouts:
+        start = time.perf_counter()
+        results = pipeline.build_results(batch, include_feature_importance=per_item)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        body = json.dumps(envelope(results)).encode()
+        encode_time = time.perf_counter() - start
+
+        print(f"{name:<34} {build_time:>9.2f}s {encode_time:>9.2f}s {len(body) / 1024 / 1024:>10.1f}MB "
+              f"{len(body) / n_items:>9.0f}B")
+
+
+BENCHMARKS = {
+    'compiled': benchmark_compiled,
+    'response_size': benchmark_response_size
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        BENCHMARKS[name]()
+        print()
@@ -0,0 +1,84 @@
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.models.bundle import load_model_bundle, BUNDLE_DIRNAME
+from src.feature_engineering.engineer import FeatureEngineer
+from src.rules.interpreter import RuleBasedInterpreter
+from src.inference.pipeline import InferencePipeline
+from src.inference.grid import PredictionGrid, DEFAULT_AXES, GRID_DIRNAME, DEFAULT_MAX_GRID_ERROR
+import pandas as pd
+import numpy as np
+
+
+def held_out_rows(grid, n_random, seed=42):
+    rng = np.random.default_rng(seed)
+
+    # Random points fall between lattice nodes, where interpolation error is
+    # largest; the dataset rows cover the conditions seen in practice.
+    rows = {
+        'food_type': rng.choice(grid.food_types, n_random),
+        'storage_type': rng.choice(grid.storage_types, n_random)
+    }
+    for name, (start, stop, _) in zip(grid.axis_names, grid.axes):
+        rows[name] = rng.uniform(start, stop, n_random)
+    random_rows = pd.DataFrame(rows)
+
+    data = pd.read_csv('data/food_shelf_life.csv').drop('remaining_shelf_life', axis=1)
+    return pd.concat([data, random_rows], ignore_index=True)[
+        ['food_type', 'temperature', 'humidity', 'storage_type', 'days_stored']
+    ]
+
+
+def build_grid(models_dir, axes, n_random):
+    print("="*80)
+    print("Building prediction grid")
+    print("="*80)
+
+    bundle = load_model_bundle(models_dir)
+    pipeline = InferencePipeline(
+        bundle.preprocessor, FeatureEngineer(), bundle.predictor, RuleBasedInterpreter(),
+        model_version=bundle.version
+    )
+    print(f"Model version: {bundle.version}")
+
+    start = time.perf_counter()
+    grid = PredictionGrid.build(pipeline, axes)
+    print(f"Grid shape {grid.values.shape} ({grid.values.nbytes / 1024 / 1024:.1f} MB) "
+          f"built in {time.perf_counter() - start:.1f}s")
+    for name, (axis_start, axis_stop, step) in zip(grid.axis_names, grid.axes):
+        print(f"  {name:<12} {axis_start:>7.1f} .. {axis_stop:<7.1f} step {step}")
+
+    print("\nEvaluating interpolation error on held-out points...")
+    error = grid.evaluate_error(pipeline, held_out_rows(grid, n_random))
+    print(f"  Rows in grid:    {error['rows_in_grid']} / {error['rows']}")
+    print(f"  Max abs error:   {error['max_abs_error']:.3f} days")
+    print(f"  Mean abs error:  {error['mean_abs_error']:.3f} days")
+    print(f"  P99 abs error:   {error['p99_abs_error']:.3f} days")
+
+    directory = grid.save(os.path.join(models_dir, BUNDLE_DIRNAME, GRID_DIRNAME))
+    print(f"\nPrediction grid saved to: {directory}")
+    print("Start the API with PREDICTION_GRID=1 to serve from the grid.")
+    max_error = float(os.getenv('PREDICTION_GRID_MAX_ERROR') or DEFAULT_MAX_GRID_ERROR)
+    if not error['max_abs_error'] <= max_error:
+        print(f"Warning: the API will refuse this grid, its max error is above {max_error} days "
+              f"(PREDICTION_GRID_MAX_ERROR). Use finer steps on the axes where it is largest.")
+    return grid
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute model predictions over an input lattice')
+    parser.add_argument('--models-dir', default='models')
+    for name, (axis_start, axis_stop, step) in DEFAULT_AXES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", nargs=3, type=float, metavar=('MIN', 'MAX', 'STEP'),
+                            default=[axis_start, axis_stop, step])
+    parser.add_argument('--held-out', type=int, default=20000, help='random points used to measure the error')
+    args = parser.parse_args()
+
+    build_grid(
+        args.models_dir,
+        {name: tuple(getattr(args, name)) for name in DEFAULT_AXES},
+        args.held_out
+    )
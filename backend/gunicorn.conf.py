@@ -0,0 +1,42 @@
+import gc
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py
+# The app is built once in the master and forked, so the model, sklearn and
+# pandas pages are shared copy-on-write between workers.
+wsgi_app = 'api:create_app(forking=True)'
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(multiprocessing.cpu_count(), 4))))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+backlog = 2048
+
+# Voice and chat requests wait on upstream APIs, so allow them a while.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+# On SIGTERM workers stop accepting and get this long to finish in-flight requests.
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    # Objects allocated before the fork are moved out of the collector's
+    # reach, so a collection in a worker does not touch (and copy) their pages.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import api
+    api.start_services()
+
+
+def worker_exit(server, worker):
+    import api
+    api.stop_services()
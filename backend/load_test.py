@@ -0,0 +1,99 @@
+import argparse
+import random
+import threading
+import time
+import requests
+import numpy as np
+
+FOOD_TYPES = ['dairy', 'meat', 'vegetables', 'fruits', 'bakery', 'seafood']
+STORAGE_TYPES = ['refrigerator', 'freezer', 'pantry']
+
+
+def random_item(rng):
+    return {
+        'food_type': rng.choice(FOOD_TYPES),
+        'temperature': round(rng.uniform(-20, 35), 1),
+        'humidity': round(rng.uniform(20, 95), 1),
+        'storage_type': rng.choice(STORAGE_TYPES),
+        'days_stored': rng.randint(0, 30)
+    }
+
+
+def run_client(url, deadline, seed, latencies, errors, first_bytes):
+    rng = random.Random(seed)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        first_byte = None
+        try:
+            # Streamed so that time to first byte can be told apart from the
+            # full response time on endpoints that send chunked audio.
+            with session.post(url, json=random_item(rng), timeout=30, stream=True) as response:
+                for chunk in response.iter_content(16384):
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+            first_bytes.append(first_byte if first_byte is not None else latencies[-1])
+        else:
+            errors.append(1)
+
+
+def load_test(base_url, endpoint='/predict', concurrency=16, duration=20.0, warmup=2.0):
+    url = base_url.rstrip('/') + endpoint
+    print("="*80)
+    print(f"Load test: {url}, {concurrency} clients, {duration:.0f}s")
+    print("="*80)
+
+    run_client(url, time.perf_counter() + warmup, 0, [], [], [])
+
+    latencies = []
+    errors = []
+    first_bytes = []
+    deadline = time.perf_counter() + duration
+    clients = [
+        threading.Thread(target=run_client, args=(url, deadline, seed, latencies, errors, first_bytes))
+        for seed in range(1, concurrency + 1)
+    ]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print(f"No successful requests ({len(errors)} errors)")
+        return None
+
+    ms = np.array(latencies) * 1000
+    ttfb_ms = np.array(first_bytes) * 1000
+    summary = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'ttfb_p50_ms': float(np.percentile(ttfb_ms, 50)),
+        'ttfb_p95_ms': float(np.percentile(ttfb_ms, 95))
+    }
+    print(f"Requests:    {summary['requests']} ({summary['errors']} errors)")
+    print(f"Throughput:  {summary['throughput']:.0f} req/s")
+    print(f"Latency:     p50 {summary['p50_ms']:.1f}ms  p95 {summary['p95_ms']:.1f}ms  p99 {summary['p99_ms']:.1f}ms")
+    print(f"First byte:  p50 {summary['ttfb_p50_ms']:.1f}ms  p95 {summary['ttfb_p95_ms']:.1f}ms")
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure throughput and latency of a running API server')
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--endpoint', default='/predict')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    load_test(args.url, args.endpoint, args.concurrency, args.duration)
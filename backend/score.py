@@ -0,0 +1,284 @@
+import sys
+import os
+import argparse
+import glob
+import json
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from src.models.bundle import load_model_bundle
+from src.feature_engineering.engineer import FeatureEngineer
+from src.rules.interpreter import RuleBasedInterpreter
+from src.inference.pipeline import InferencePipeline
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+INPUT_COLUMNS = ['food_type', 'temperature', 'humidity', 'storage_type', 'days_stored']
+OUTPUT_COLUMNS = INPUT_COLUMNS + [
+    'predicted_remaining_days', 'raw_prediction', 'safety_classification', 'severity', 'issue_mask',
+    'recommendation_mask', 'interval_lower', 'interval_upper', 'interval_std', 'issues', 'recommendations'
+]
+MANIFEST_FILENAME = '_scoring.json'
+SUCCESS_FILENAME = '_SUCCESS'
+
+worker_pipeline = None
+
+
+def load_scoring_pipeline(models_dir):
+    bundle = load_model_bundle(models_dir)
+    return InferencePipeline(
+        bundle.preprocessor, FeatureEngineer(), bundle.predictor, RuleBasedInterpreter(),
+        model_version=bundle.version
+    )
+
+
+def init_worker(models_dir):
+    global worker_pipeline
+    # Loaded once per worker; the compiled arrays are memory-mapped, so all
+    # workers share the same pages.
+    worker_pipeline = load_scoring_pipeline(models_dir)
+
+
+def require_pyarrow(path):
+    if not HAS_PYARROW:
+        raise SystemExit(f"pyarrow is required for Parquet files ({path}); pip install -r requirements.txt, or use CSV with --format csv")
+
+
+def read_chunks(path, chunk_size):
+    if path.endswith('.parquet'):
+        require_pyarrow(path)
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_size):
+            yield chunk
+
+
+def read_columns(path):
+    if path.endswith('.parquet'):
+        require_pyarrow(path)
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def check_columns(input_path, keep_columns):
+    # Checked before any chunk is scored, so a bad file fails with a clear
+    # message instead of a KeyError from the first worker.
+    columns = read_columns(input_path)
+    missing = [column for column in INPUT_COLUMNS + list(keep_columns) if column not in columns]
+    if missing:
+        raise SystemExit(f"{input_path} is missing column(s): {', '.join(missing)} (found: {', '.join(columns)})")
+
+    clashing = [column for column in keep_columns if column in OUTPUT_COLUMNS]
+    if clashing:
+        raise SystemExit(f"--keep-columns cannot include output column(s): {', '.join(clashing)}")
+
+
+def part_path(output_dir, index, output_format):
+    return os.path.join(output_dir, f"part-{index:06d}.{output_format}")
+
+
+def build_frame(pipeline, chunk, batch, keep_columns, render):
+    interpreter = pipeline.rule_interpreter
+
+    frame = {column: chunk[column].to_numpy() for column in keep_columns}
+    frame.update({
+        'food_type': pd.Categorical(batch['food_type'], categories=interpreter.food_types),
+        'storage_type': pd.Categorical(batch['storage_type'], categories=interpreter.storage_types),
+        'temperature': batch['temperature'].astype(np.float32),
+        'humidity': batch['humidity'].astype(np.float32),
+        'days_stored': batch['days_stored'].astype(np.float32),
+        'predicted_remaining_days': batch['predicted_remaining_days'].astype(np.float32),
+        'raw_prediction': batch['raw_prediction'].astype(np.float32),
+        'safety_classification': pd.Categorical(batch['safety_classification'], categories=interpreter.safety_classes),
+        'severity': pd.Categorical(batch['severity'], categories=interpreter.severity_levels),
+        # Bit masks over RuleBasedInterpreter.issue_messages and
+        # recommendation_messages; render them only when asked.
+        'issue_mask': batch['issue_mask'].astype(np.uint8),
+        'recommendation_mask': batch['recommendation_mask'].astype(np.uint8)
+    })
+
+    if 'interval_lower' in batch:
+        frame['interval_lower'] = batch['interval_lower'].astype(np.float32)
+        frame['interval_upper'] = batch['interval_upper'].astype(np.float32)
+        frame['interval_std'] = batch['interval_std'].astype(np.float32)
+
+    if render:
+        frame['issues'] = [
+            '; '.join(interpreter.render_issues(mask, code, t, h))
+            for mask, code, t, h in zip(batch['issue_mask'].tolist(), batch['food_code'].tolist(),
+                                        batch['temperature'].tolist(), batch['humidity'].tolist())
+        ]
+        frame['recommendations'] = [
+            '; '.join(interpreter.render_recommendations(mask)) for mask in batch['recommendation_mask'].tolist()
+        ]
+
+    return pd.DataFrame(frame)
+
+
+def score_chunk(index, chunk, output_dir, output_format, keep_columns, with_interval, render):
+    pipeline = worker_pipeline
+    batch = pipeline.predict_batch(chunk[INPUT_COLUMNS], with_interval=with_interval)
+    frame = build_frame(pipeline, chunk, batch, keep_columns, render)
+
+    # Written under a temporary name and renamed, so a part file that exists
+    # is always complete and a resumed run can trust it.
+    path = part_path(output_dir, index, output_format)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if output_format == 'parquet':
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    return index, len(frame)
+
+
+def prepare_output(output_dir, manifest, restart):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+
+    if restart:
+        stale = glob.glob(os.path.join(output_dir, 'part-*'))
+        stale += [path for path in (manifest_path, os.path.join(output_dir, SUCCESS_FILENAME)) if os.path.exists(path)]
+        for path in stale:
+            os.remove(path)
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        # Chunk indices only line up with the same input, chunking and model.
+        for key in ('input', 'chunk_size', 'model_version', 'format', 'interval', 'keep_columns', 'render'):
+            if previous.get(key) != manifest.get(key):
+                raise SystemExit(
+                    f"{output_dir} holds a run with a different {key} "
+                    f"({previous.get(key)!r} != {manifest.get(key)!r}); use --restart to start over"
+                )
+    else:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    for path in glob.glob(os.path.join(output_dir, 'part-*.tmp-*')):
+        os.remove(path)
+
+    done = set()
+    for path in glob.glob(os.path.join(output_dir, f"part-*.{manifest['format']}")):
+        done.add(int(os.path.basename(path).split('-')[1].split('.')[0]))
+    return done
+
+
+def score(input_path, output_dir, models_dir='models', chunk_size=50000, workers=None, output_format='parquet',
+          keep_columns=(), with_interval=False, render=False, restart=False):
+    print("="*80)
+    print("Bulk scoring")
+    print("="*80)
+
+    if output_format == 'parquet':
+        require_pyarrow(output_dir)
+    check_columns(input_path, keep_columns)
+
+    pipeline = load_scoring_pipeline(models_dir)
+    if with_interval and not pipeline.supports_intervals:
+        raise SystemExit("The model does not support prediction intervals")
+
+    manifest = {
+        'input': os.path.abspath(input_path),
+        'chunk_size': chunk_size,
+        'model_version': pipeline.model_version,
+        'format': output_format,
+        'interval': with_interval,
+        'keep_columns': list(keep_columns),
+        'render': render
+    }
+    done = prepare_output(output_dir, manifest, restart)
+
+    workers = os.cpu_count() if workers is None else workers
+    print(f"Input:         {input_path}")
+    print(f"Output:        {output_dir} ({output_format})")
+    print(f"Model version: {pipeline.model_version}")
+    print(f"Chunk size:    {chunk_size}, workers: {workers or 'in-process'}")
+    if done:
+        print(f"Resuming: {len(done)} chunks already scored")
+
+    args = (output_dir, output_format, list(keep_columns), with_interval, render)
+    start = time.perf_counter()
+    scored_rows = 0
+    scored_chunks = 0
+    skipped_rows = 0
+
+    def report(index, rows):
+        nonlocal scored_rows, scored_chunks
+        scored_rows += rows
+        scored_chunks += 1
+        elapsed = time.perf_counter() - start
+        print(f"  chunk {index:>6}  {scored_rows:>12,} rows  {scored_rows / elapsed:>10,.0f} rows/s")
+
+    chunks = enumerate(read_chunks(input_path, chunk_size))
+    if workers == 0:
+        global worker_pipeline
+        worker_pipeline = pipeline
+        for index, chunk in chunks:
+            if index in done:
+                skipped_rows += len(chunk)
+                continue
+            report(*score_chunk(index, chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(models_dir,)) as pool:
+            pending = set()
+            for index, chunk in chunks:
+                if index in done:
+                    skipped_rows += len(chunk)
+                    continue
+                # Keep only a couple of chunks per worker in flight, so the
+                # reader never runs far ahead of the pool.
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        report(*future.result())
+                pending.add(pool.submit(score_chunk, index, chunk, *args))
+
+            for future in wait(pending).done:
+                report(*future.result())
+
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(output_dir, SUCCESS_FILENAME), 'w') as f:
+        json.dump({'rows_scored': scored_rows, 'rows_skipped': skipped_rows, 'seconds': round(elapsed, 3)}, f)
+
+    print(f"\nScored {scored_rows:,} rows in {scored_chunks} chunks in {elapsed:.1f}s "
+          f"({scored_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    if skipped_rows:
+        print(f"Skipped {skipped_rows:,} rows from earlier runs")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score an inventory export with the trained shelf life model')
+    parser.add_argument('input', help='CSV or Parquet file with food_type, temperature, humidity, storage_type, days_stored')
+    parser.add_argument('output', help='output directory for part files')
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (0 scores in-process)')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--keep-columns', default='', help='comma-separated input columns copied to the output')
+    parser.add_argument('--interval', action='store_true', help='add prediction interval columns')
+    parser.add_argument('--render', action='store_true', help='add issue and recommendation text columns')
+    parser.add_argument('--restart', action='store_true', help='discard earlier part files')
+    args = parser.parse_args()
+
+    score(
+        args.input, args.output,
+        models_dir=args.models_dir,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        output_format=args.format,
+        keep_columns=[column for column in args.keep_columns.split(',') if column],
+        with_interval=args.interval,
+        render=args.render,
+        restart=args.restart
+    )
@@ -12,7 +12,24 @@ class FeatureEngineer:
             'bakery': {'refrigerator': 10, 'freezer': 180, 'pantry': 7},
             'seafood': {'refrigerator': 2, 'freezer': 180, 'pantry': 0}
         }
+        self.food_types = ['bakery', 'dairy', 'fruits', 'meat', 'seafood', 'vegetables']
+        self.storage_types = ['freezer', 'pantry', 'refrigerator']
+        self.storage_temp_targets = {'refrigerator': 4, 'freezer': -18, 'pantry': 20}
         self.is_fitted = False
+        self.compile_tables()
+
+    def compile_tables(self):
+        self.default_food_code = self.food_types.index('dairy')
+        self.default_storage_code = self.storage_types.index('refrigerator')
+
+        self._base_shelf_table = np.array([
+            [self.food_type_base_shelf.get(food, {}).get(storage, 7) for storage in self.storage_types]
+            for food in self.food_types
+        ], dtype=np.int64)
+
+        self._temp_target = np.array([
+            self.storage_temp_targets.get(storage, np.nan) for storage in self.storage_types
+        ], dtype=float)
 
     def _get_food_type_label(self, food_type_encoded):
         food_types = ['bakery', 'dairy', 'fruits', 'meat', 'seafood', 'vegetables']
@@ -26,74 +43,129 @@ class FeatureEngineer:
             return storage_types[storage_type_encoded]
         return 'refrigerator'
 
-    def transform(self, X):
-        X = X.copy()
+    def _codes(self, encoded, n_codes, default_code):
+        encoded = np.asarray(encoded).astype(np.intp)
+        return np.where(encoded < n_codes, encoded, default_code)
 
-        if 'food_type' in X.columns and 'storage_type' in X.columns:
-            X['food_type_decoded'] = X['food_type'].apply(self._get_food_type_label)
-            X['storage_type_decoded'] = X['storage_type'].apply(self._get_storage_type_label)
-        else:
-            X['food_type_decoded'] = 'dairy'
-            X['storage_type_decoded'] = 'refrigerator'
+    def compute_features(self, food_code, storage_code, temperature, humidity, days_stored):
+        food_code = self._codes(food_code, len(self.food_types), self.default_food_code)
+        storage_code = self._codes(storage_code, len(self.storage_types), self.default_storage_code)
+        temperature = np.asarray(temperature)
+        humidity = np.asarray(humidity)
+        days_stored = np.asarray(days_stored)
 
-        base_shelf = X.apply(
-            lambda row: self.food_type_base_shelf.get(row['food_type_decoded'], {}).get(row['storage_type_decoded'], 7),
-            axis=1
-        )
-        X['base_shelf_life'] = base_shelf
-
-        X['temp_deviation'] = np.where(
-            X['storage_type_decoded'] == 'refrigerator',
-            np.abs(X['temperature'] - 4),
-            np.where(
-                X['storage_type_decoded'] == 'freezer',
-                np.abs(X['temperature'] - (-18)),
-                np.where(
-                    X['storage_type_decoded'] == 'pantry',
-                    np.abs(X['temperature'] - 20),
-                    0
-                )
-            )
-        )
+        base_shelf = self._base_shelf_table[food_code, storage_code]
+        has_base_shelf = base_shelf > 0
+        safe_base_shelf = np.where(has_base_shelf, base_shelf, 1)
 
-        X['humidity_deviation'] = np.abs(X['humidity'] - 65)
+        is_refrigerator = storage_code == self.storage_types.index('refrigerator')
+        is_freezer = storage_code == self.storage_types.index('freezer')
+        is_pantry = storage_code == self.storage_types.index('pantry')
 
-        X['storage_progress'] = np.where(
-            base_shelf > 0,
-            X['days_stored'] / base_shelf,
-            1.0
-        )
-        X['storage_progress'] = np.clip(X['storage_progress'], 0, 2)
+        temp_target = self._temp_target[storage_code]
+        temp_deviation = np.where(np.isnan(temp_target), 0, np.abs(temperature - temp_target))
+        humidity_deviation = np.abs(humidity - 65)
 
-        X['degradation_factor'] = (
-            (X['temp_deviation'] / 10) * 0.5 +
-            (X['humidity_deviation'] / 20) * 0.3 +
-            (X['storage_progress'] * 0.2)
-        )
+        storage_days_ratio = np.where(has_base_shelf, days_stored / safe_base_shelf, 1.0)
+        storage_progress = np.clip(storage_days_ratio, 0, 2)
 
-        X['temp_humidity_interaction'] = X['temperature'] * X['humidity'] / 100
+        degradation_factor = (
+            (temp_deviation / 10) * 0.5 +
+            (humidity_deviation / 20) * 0.3 +
+            (storage_progress * 0.2)
+        )
 
-        X['is_extreme_temp'] = (
-            (X['storage_type_decoded'] == 'refrigerator') & (X['temperature'] > 10) |
-            (X['storage_type_decoded'] == 'refrigerator') & (X['temperature'] < 0) |
-            (X['storage_type_decoded'] == 'freezer') & (X['temperature'] > -5) |
-            (X['storage_type_decoded'] == 'pantry') & (X['temperature'] > 30)
+        is_extreme_temp = (
+            is_refrigerator & (temperature > 10) |
+            is_refrigerator & (temperature < 0) |
+            is_freezer & (temperature > -5) |
+            is_pantry & (temperature > 30)
         ).astype(int)
 
-        X['is_extreme_humidity'] = (X['humidity'] > 90).astype(int)
+        return {
+            'base_shelf_life': base_shelf,
+            'temp_deviation': temp_deviation,
+            'humidity_deviation': humidity_deviation,
+            'storage_progress': storage_progress,
+            'degradation_factor': degradation_factor,
+            'temp_humidity_interaction': temperature * humidity / 100,
+            'is_extreme_temp': is_extreme_temp,
+            'is_extreme_humidity': (humidity > 90).astype(int),
+            'days_remaining_ratio': np.where(has_base_shelf, (base_shelf - days_stored) / safe_base_shelf, 0),
+            'temp_squared': temperature ** 2,
+            'humidity_squared': humidity ** 2,
+            'temp_humidity_product': temperature * humidity,
+            'storage_days_ratio': storage_days_ratio
+        }
+
+    def transform_row(self, food_code, storage_code, temperature, humidity, days_stored):
+        if not 0 <= food_code < len(self.food_types):
+            food_code = self.default_food_code
+        if not 0 <= storage_code < len(self.storage_types):
+            storage_code = self.default_storage_code
+
+        storage_type = self.storage_types[storage_code]
+        base_shelf = int(self._base_shelf_table[food_code, storage_code])
+
+        temp_target = self.storage_temp_targets.get(storage_type)
+        temp_deviation = 0 if temp_target is None else abs(temperature - temp_target)
+        humidity_deviation = abs(humidity - 65)
+
+        storage_days_ratio = days_stored / base_shelf if base_shelf > 0 else 1.0
+        storage_progress = min(max(storage_days_ratio, 0), 2)
 
-        X['days_remaining_ratio'] = np.where(
-            base_shelf > 0,
-            (base_shelf - X['days_stored']) / base_shelf,
-            0
+        degradation_factor = (
+            (temp_deviation / 10) * 0.5 +
+            (humidity_deviation / 20) * 0.3 +
+            (storage_progress * 0.2)
         )
 
-        X['temp_squared'] = X['temperature'] ** 2
-        X['humidity_squared'] = X['humidity'] ** 2
-        X['temp_humidity_product'] = X['temperature'] * X['humidity']
-        X['storage_days_ratio'] = np.where(base_shelf > 0, X['days_stored'] / base_shelf, 1.0)
+        is_extreme_temp = int(
+            storage_type == 'refrigerator' and (temperature > 10 or temperature < 0) or
+            storage_type == 'freezer' and temperature > -5 or
+            storage_type == 'pantry' and temperature > 30
+        )
+
+        return {
+            'food_type': food_code,
+            'storage_type': storage_code,
+            'temperature': temperature,
+            'humidity': humidity,
+            'days_stored': days_stored,
+            'base_shelf_life': base_shelf,
+            'temp_deviation': temp_deviation,
+            'humidity_deviation': humidity_deviation,
+            'storage_progress': storage_progress,
+            'degradation_factor': degradation_factor,
+            'temp_humidity_interaction': temperature * humidity / 100,
+            'is_extreme_temp': is_extreme_temp,
+            'is_extreme_humidity': int(humidity > 90),
+            'days_remaining_ratio': (base_shelf - days_stored) / base_shelf if base_shelf > 0 else 0,
+            'temp_squared': temperature * temperature,
+            'humidity_squared': humidity * humidity,
+            'temp_humidity_product': temperature * humidity,
+            'storage_days_ratio': storage_days_ratio
+        }
 
-        X = X.drop(['food_type_decoded', 'storage_type_decoded'], axis=1, errors='ignore')
+    def transform(self, X):
+        X = X.copy()
+
+        if 'food_type' in X.columns and 'storage_type' in X.columns:
+            food_code = X['food_type'].to_numpy()
+            storage_code = X['storage_type'].to_numpy()
+        else:
+            food_code = np.full(len(X), self.default_food_code)
+            storage_code = np.full(len(X), self.default_storage_code)
+
+        features = self.compute_features(
+            food_code,
+            storage_code,
+            X['temperature'].to_numpy(),
+            X['humidity'].to_numpy(),
+            X['days_stored'].to_numpy()
+        )
+        for name, values in features.items():
+            X[name] = values
 
         self.is_fitted = True
         return X
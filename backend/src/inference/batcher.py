@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+
+class Histogram:
+    def __init__(self, max_value):
+        self.bounds = [1]
+        while self.bounds[-1] < max_value:
+            self.bounds.append(self.bounds[-1] * 2)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'mean': round(self.total / self.count, 3) if self.count else 0.0,
+                'bounds': list(self.bounds),
+                'counts': list(self.counts)
+            }
+
+
+class MicroBatcher:
+    def __init__(self, get_pipeline, max_batch_size=64, max_wait_ms=2.0, timeout=30.0):
+        self.get_pipeline = get_pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+
+        self.batch_sizes = Histogram(max_batch_size)
+        self.queue_depths = Histogram(max_batch_size * 4)
+        self.flushes = {'size': 0, 'deadline': 0}
+        self.fallbacks = 0
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker.start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker.join()
+                self._worker = None
+
+    def submit(self, item, pipeline=None):
+        if self._worker is None:
+            self.start()
+
+        # The caller's pipeline travels with the row, so a result is always
+        # computed by the model version the caller keys its cache on, even
+        # when a reload swaps the pipeline while the row is queued.
+        if pipeline is None:
+            pipeline = self.get_pipeline()
+
+        future = Future()
+        self.queue_depths.observe(self._queue.qsize())
+        self._queue.put((item, pipeline, future))
+        return future.result(timeout=self.timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)
+                break
+            batch.append(entry)
+
+        self.flushes['size' if len(batch) == self.max_batch_size else 'deadline'] += 1
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            self.batch_sizes.observe(len(batch))
+
+            groups = {}
+            for item, pipeline, future in batch:
+                groups.setdefault(id(pipeline), (pipeline, []))[1].append((item, future))
+            for pipeline, entries in groups.values():
+                self._flush(pipeline, entries)
+
+    def _flush(self, pipeline, batch):
+        items = [item for item, _ in batch]
+
+        # Only the model runs batched; callers apply the rules to their own
+        # readings, as they do with cached model output.
+        try:
+            results = pipeline.model_outputs(items)
+        except Exception:
+            traceback.print_exc()
+            results = None
+
+        if results is None:
+            # One bad row must not fail the requests it was batched with.
+            self.fallbacks += 1
+            for item, future in batch:
+                try:
+                    future.set_result(pipeline.model_output(**item))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize(),
+            'queue_depth_histogram': self.queue_depths.snapshot(),
+            'batch_size_histogram': self.batch_sizes.snapshot(),
+            'flushes': dict(self.flushes),
+            'fallbacks': self.fallbacks
+        }
@@ -0,0 +1,239 @@
+import copy
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class MemoryBackend:
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        key = (version,) + key
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+        # Callers get their own copy, so editing a result cannot change what
+        # the next hit returns.
+        return copy.deepcopy(entry[0])
+
+    def put(self, key, version, result):
+        key = (version,) + key
+        result = copy.deepcopy(result)
+        size = estimate_size(key) + estimate_size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+
+            self.entries[key] = (result, size)
+            self.bytes += size
+
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self.entries), 'bytes': self.bytes, 'evictions': self.evictions}
+
+
+class SqliteBackend:
+    def __init__(self, path, max_entries, max_bytes):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One file shared by every worker process; WAL lets readers in other
+        # processes proceed while one of them writes.
+        self.conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS predictions ('
+            'key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL, '
+            'size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)')
+
+    def get(self, key, version):
+        key = json.dumps((version,) + key)
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT value FROM predictions WHERE key = ? AND version = ?', (key, version)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE predictions SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, version, result):
+        key = json.dumps((version,) + key)
+        value = json.dumps(result)
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO predictions (key, version, value, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, version, value, size, time.time())
+            )
+            self.writes += 1
+            # Enforcing the caps costs two aggregate queries, so only do it
+            # every so often; the table can overshoot by a few entries.
+            if self.writes % 64 == 0:
+                self._evict()
+
+    def _evict(self):
+        count, total = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM predictions').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        excess_entries = max(0, count - self.max_entries)
+        excess_bytes = max(0, total - self.max_bytes)
+        removed = 0
+        freed = 0
+        doomed = []
+        for key, size in self.conn.execute('SELECT key, size FROM predictions ORDER BY last_used'):
+            if removed >= excess_entries and freed >= excess_bytes:
+                break
+            doomed.append((key,))
+            removed += 1
+            freed += size
+
+        self.conn.executemany('DELETE FROM predictions WHERE key = ?', doomed)
+        self.evictions += removed
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def stats(self):
+        with self._lock:
+            count, total = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM predictions'
+            ).fetchone()
+        return {'backend': 'sqlite', 'path': self.path, 'entries': count, 'bytes': total, 'evictions': self.evictions}
+
+
+class PredictionCache:
+    def __init__(self, backend='memory', max_entries=100000, max_bytes=64 * 1024 * 1024,
+                 temperature_step=0.5, humidity_step=0.5, days_step=0.5, path='cache/predictions.sqlite3'):
+        if backend == 'memory':
+            self.backend = MemoryBackend(max_entries, max_bytes)
+        elif backend == 'sqlite':
+            self.backend = SqliteBackend(path, max_entries, max_bytes)
+        else:
+            raise ValueError(f"Unknown prediction cache backend: {backend}")
+
+        self.temperature_step = temperature_step
+        self.humidity_step = humidity_step
+        self.days_step = days_step
+
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.version_changes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _quantize(value, step):
+        if not step:
+            return float(value)
+        return round(round(float(value) / step) * step, 6)
+
+    def quantize(self, item):
+        return {
+            'food_type': str(item['food_type']),
+            'temperature': self._quantize(item['temperature'], self.temperature_step),
+            'humidity': self._quantize(item['humidity'], self.humidity_step),
+            'storage_type': str(item['storage_type']),
+            'days_stored': self._quantize(item['days_stored'], self.days_step)
+        }
+
+    def _check_version(self, version):
+        # Entries are keyed on the model version, so nothing is deleted when
+        # it changes: other workers sharing the sqlite file may still be on
+        # the previous version mid-reload, and stale entries age out by LRU.
+        if version == self.version:
+            return
+
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.version_changes += 1
+                self.version = version
+
+    def get_or_compute(self, item, version, compute, kind='prediction'):
+        self._check_version(version)
+
+        item = self.quantize(item)
+        key = (kind, item['food_type'], item['storage_type'], item['temperature'], item['humidity'],
+               item['days_stored'])
+
+        result = self.backend.get(key, version)
+        if result is not None:
+            with self._lock:
+                self.hits += 1
+            return result
+
+        with self._lock:
+            self.misses += 1
+
+        # Only model output is cached, computed on the quantized inputs so a
+        # key always maps to the same answer no matter which raw value filled
+        # it first. Callers apply the rules to the exact readings.
+        result = compute(item)
+        self.backend.put(key, version, result)
+        return result
+
+    def close(self):
+        if isinstance(self.backend, SqliteBackend):
+            self.backend.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'version_changes': self.version_changes,
+            'model_version': self.version,
+            'max_entries': self.backend.max_entries,
+            'max_bytes': self.backend.max_bytes
+        }
+        stats.update(self.backend.stats())
+        return stats
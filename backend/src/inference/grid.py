@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+from src.models.compiled import file_sha256, json_default
+
+GRID_DIRNAME = 'grid'
+GRID_FORMAT_VERSION = 1
+# Largest measured interpolation error, in days, a grid may have and still
+# be served; safety classes are only a few days wide.
+DEFAULT_MAX_GRID_ERROR = 1.0
+
+DEFAULT_AXES = {
+    'temperature': (-20.0, 40.0, 1.0),
+    'humidity': (0.0, 100.0, 2.0),
+    'days_stored': (0.0, 60.0, 1.0)
+}
+
+
+class PredictionGrid:
+    axis_names = ['temperature', 'humidity', 'days_stored']
+
+    def __init__(self, values, food_types, storage_types, axes, model_version=None, error=None):
+        self.values = values
+        self.food_types = list(food_types)
+        self.storage_types = list(storage_types)
+        self.axes = [tuple(float(v) for v in axes[name]) for name in self.axis_names]
+        self.model_version = model_version
+        self.error = error or {}
+
+        self.food_index = {name: i for i, name in enumerate(self.food_types)}
+        self.storage_index = {name: i for i, name in enumerate(self.storage_types)}
+        self.counts = list(values.shape[2:])
+
+    @staticmethod
+    def axis_points(start, stop, step):
+        count = int(round((stop - start) / step)) + 1
+        if count < 2:
+            raise ValueError(f"Grid axis {start}..{stop} step {step} needs at least two points")
+        return start + step * np.arange(count)
+
+    @classmethod
+    def build(cls, pipeline, axes=None, food_types=None, storage_types=None):
+        axes = dict(DEFAULT_AXES, **(axes or {}))
+        food_types = food_types or pipeline.rule_interpreter.food_types
+        storage_types = storage_types or pipeline.rule_interpreter.storage_types
+
+        points = [cls.axis_points(*axes[name]) for name in cls.axis_names]
+        shape = (len(food_types), len(storage_types)) + tuple(len(p) for p in points)
+        values = np.empty(shape, dtype=np.float32)
+
+        temperature, humidity, days_stored = [a.ravel() for a in np.meshgrid(*points, indexing='ij')]
+        for f, food_type in enumerate(food_types):
+            for s, storage_type in enumerate(storage_types):
+                cell = pd.DataFrame({
+                    'food_type': food_type,
+                    'temperature': temperature,
+                    'humidity': humidity,
+                    'storage_type': storage_type,
+                    'days_stored': days_stored
+                })
+                values[f, s] = pipeline.predict_raw(cell).reshape(shape[2:])
+
+        axes = {name: (float(points[i][0]), float(points[i][-1]), float(axes[name][2]))
+                for i, name in enumerate(cls.axis_names)}
+        return cls(values, food_types, storage_types, axes, pipeline.model_version)
+
+    def _locate(self, axis, values):
+        start, _, step = self.axes[axis]
+        count = self.counts[axis]
+        position = (values - start) / step
+        inside = (position >= 0) & (position <= count - 1)
+
+        index = np.clip(np.floor(np.where(inside, position, 0)).astype(np.intp), 0, count - 2)
+        return index, np.where(inside, position - index, 0.0), inside
+
+    def interpolate(self, food_type, storage_type, temperature, humidity, days_stored):
+        food_code = np.array([self.food_index.get(v, -1) for v in np.asarray(food_type, dtype=object).tolist()])
+        storage_code = np.array([self.storage_index.get(v, -1) for v in np.asarray(storage_type, dtype=object).tolist()])
+
+        inside = (food_code >= 0) & (storage_code >= 0)
+        located = []
+        for axis, values in enumerate((temperature, humidity, days_stored)):
+            index, fraction, axis_inside = self._locate(axis, np.asarray(values, dtype=float))
+            located.append((index, fraction))
+            inside &= axis_inside
+
+        f = np.where(inside, food_code, 0)
+        s = np.where(inside, storage_code, 0)
+        (i, ft), (j, fh), (k, fd) = located
+
+        result = np.zeros(len(f))
+        for di in (0, 1):
+            wt = ft if di else 1.0 - ft
+            for dj in (0, 1):
+                wh = fh if dj else 1.0 - fh
+                for dk in (0, 1):
+                    wd = fd if dk else 1.0 - fd
+                    result += wt * wh * wd * self.values[f, s, i + di, j + dj, k + dk]
+
+        result[~inside] = np.nan
+        return result, inside
+
+    def lookup(self, food_type, storage_type, temperature, humidity, days_stored):
+        f = self.food_index.get(food_type)
+        s = self.storage_index.get(storage_type)
+        if f is None or s is None:
+            return None
+
+        corners = []
+        for (start, _, step), count, value in zip(self.axes, self.counts, (temperature, humidity, days_stored)):
+            position = (value - start) / step
+            # Written so that NaN also falls outside the grid.
+            if not 0 <= position <= count - 1:
+                return None
+            index = min(int(position), count - 2)
+            corners.append((index, position - index))
+
+        (i, ft), (j, fh), (k, fd) = corners
+        v = self.values.item
+
+        c00 = v(f, s, i, j, k) * (1 - fd) + v(f, s, i, j, k + 1) * fd
+        c01 = v(f, s, i, j + 1, k) * (1 - fd) + v(f, s, i, j + 1, k + 1) * fd
+        c10 = v(f, s, i + 1, j, k) * (1 - fd) + v(f, s, i + 1, j, k + 1) * fd
+        c11 = v(f, s, i + 1, j + 1, k) * (1 - fd) + v(f, s, i + 1, j + 1, k + 1) * fd
+
+        c0 = c00 * (1 - fh) + c01 * fh
+        c1 = c10 * (1 - fh) + c11 * fh
+        return c0 * (1 - ft) + c1 * ft
+
+    def evaluate_error(self, pipeline, held_out):
+        exact = pipeline.predict_raw(held_out)
+        approx, inside = self.interpolate(
+            held_out['food_type'].to_numpy(),
+            held_out['storage_type'].to_numpy(),
+            held_out['temperature'].to_numpy(),
+            held_out['humidity'].to_numpy(),
+            held_out['days_stored'].to_numpy()
+        )
+
+        errors = np.abs(approx[inside] - exact[inside])
+        self.error = {
+            'rows': int(len(held_out)),
+            'rows_in_grid': int(inside.sum()),
+            'max_abs_error': float(errors.max()) if len(errors) else 0.0,
+            'mean_abs_error': float(errors.mean()) if len(errors) else 0.0,
+            'p99_abs_error': float(np.percentile(errors, 99)) if len(errors) else 0.0
+        }
+        return self.error
+
+    def save(self, directory):
+        tmp_directory = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        np.save(os.path.join(tmp_directory, 'values.npy'), np.ascontiguousarray(self.values), allow_pickle=False)
+        manifest = {
+            'format_version': GRID_FORMAT_VERSION,
+            'model_version': self.model_version,
+            'food_types': self.food_types,
+            'storage_types': self.storage_types,
+            'axes': {name: list(axis) for name, axis in zip(self.axis_names, self.axes)},
+            'shape': list(self.values.shape),
+            'sha256': file_sha256(os.path.join(tmp_directory, 'values.npy')),
+            'error': self.error
+        }
+        with open(os.path.join(tmp_directory, 'grid.json'), 'w') as f:
+            json.dump(manifest, f, indent=2, default=json_default)
+
+        old_directory = f"{directory}.old-{os.getpid()}"
+        if os.path.exists(directory):
+            os.rename(directory, old_directory)
+        os.rename(tmp_directory, directory)
+        shutil.rmtree(old_directory, ignore_errors=True)
+        return directory
+
+    @classmethod
+    def load(cls, directory, model_version=None, mmap_mode='r'):
+        with open(os.path.join(directory, 'grid.json')) as f:
+            manifest = json.load(f)
+
+        if manifest.get('format_version') != GRID_FORMAT_VERSION:
+            raise ValueError(f"Unsupported prediction grid format: {manifest.get('format_version')}")
+        if model_version is not None and manifest['model_version'] != model_version:
+            raise ValueError(f"Prediction grid was built for model {manifest['model_version']}, not {model_version}")
+
+        path = os.path.join(directory, 'values.npy')
+        if file_sha256(path) != manifest['sha256']:
+            raise ValueError("Checksum mismatch for prediction grid values")
+
+        values = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        if list(values.shape) != manifest['shape']:
+            raise ValueError("Prediction grid values do not match their manifest")
+
+        return cls(values, manifest['food_types'], manifest['storage_types'], manifest['axes'],
+                   manifest['model_version'], manifest.get('error'))
+
+    def status(self):
+        return {
+            'shape': list(self.values.shape),
+            'axes': {name: list(axis) for name, axis in zip(self.axis_names, self.axes)},
+            'error': self.error
+        }
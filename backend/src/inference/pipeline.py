@@ -1,16 +1,32 @@
 import numpy as np
 import pandas as pd
 import os
+import threading
 
 
 class InferencePipeline:
-    def __init__(self, preprocessor, feature_engineer, model, rule_interpreter):
+    def __init__(self, preprocessor, feature_engineer, model, rule_interpreter, model_version=None):
         self.preprocessor = preprocessor
         self.feature_engineer = feature_engineer
         self.model = model
         self.rule_interpreter = rule_interpreter
+        self.model_version = model_version
+        self.grid = None
+        self.interval_quantiles = (0.1, 0.9)
+        self.safety_on_lower_bound = False
+        self.feature_importance = self.model.get_feature_importance(5)
+        self.feature_columns = self.model.get_feature_columns() or self.feature_engineer.get_feature_names()
+        self._buffers = threading.local()
 
-    def predict(self, input_data):
+    @property
+    def can_explain(self):
+        return getattr(self.model, 'compiled', None) is not None
+
+    @property
+    def supports_intervals(self):
+        return getattr(self.model, 'supports_intervals', False)
+
+    def _to_frame(self, input_data):
         if isinstance(input_data, dict):
             df = pd.DataFrame([input_data])
         elif isinstance(input_data, list):
@@ -23,70 +39,299 @@ class InferencePipeline:
             if col not in df.columns:
                 df[col] = 0
 
+        return df
+
+    def predict_raw(self, df):
         df_processed = self.preprocessor.transform(df)
         df_featured = self.feature_engineer.transform(df_processed)
 
-        predictions = self.model.predict(df_featured)
+        return np.asarray(self.model.predict(df_featured), dtype=float)
 
-        results = []
+    def predict_values(self, df):
+        if self.grid is None:
+            return self.predict_raw(df)
 
-        for i, pred in enumerate(predictions):
-            food_type_str = str(df['food_type'].iloc[i])
-            storage_type_str = str(df['storage_type'].iloc[i])
-            
-            food_type = food_type_str if food_type_str in ['dairy', 'meat', 'vegetables', 'fruits', 'bakery', 'seafood'] else 'dairy'
-            storage_type = storage_type_str if storage_type_str in ['refrigerator', 'freezer', 'pantry'] else 'refrigerator'
-            
-            temperature = df['temperature'].iloc[i]
-            humidity = df['humidity'].iloc[i]
-            days_stored = df['days_stored'].iloc[i]
-
-            issues, severity = self.rule_interpreter.check_extreme_conditions(
-                food_type, storage_type, temperature, humidity, days_stored
-            )
+        predictions, in_grid = self.grid.interpolate(
+            df['food_type'].to_numpy(),
+            df['storage_type'].to_numpy(),
+            df['temperature'].to_numpy(),
+            df['humidity'].to_numpy(),
+            df['days_stored'].to_numpy()
+        )
+        if not in_grid.all():
+            predictions[~in_grid] = self.predict_raw(df[~in_grid])
+        return predictions
 
-            adjusted_prediction = self.rule_interpreter.adjust_prediction(
-                pred, issues, severity, days_stored
-            )
+    def predict_interval_raw(self, df):
+        df_processed = self.preprocessor.transform(df)
+        df_featured = self.feature_engineer.transform(df_processed)
 
-            safety_class = self.rule_interpreter.classify_safety(
-                adjusted_prediction, days_stored, issues
-            )
+        return self.point_interval(*self.model.predict_interval(df_featured, self.interval_quantiles))
 
-            recommendations = self.rule_interpreter.get_recommendations(
-                food_type, storage_type, temperature, humidity, adjusted_prediction
-            )
+    def point_interval(self, mean, spread, bounds):
+        # The trees of a skewed forest can put both quantiles on one side of
+        # their mean; the reported band always contains the point estimate.
+        bounds = np.vstack([np.minimum(bounds[0], mean), np.maximum(bounds[-1], mean)])
+        return mean, spread, bounds
+
+    def explain_raw(self, df):
+        df_processed = self.preprocessor.transform(df)
+        df_featured = self.feature_engineer.transform(df_processed)
+
+        return self.model.explain(df_featured)
 
-            result = {
+    def top_contributions(self, contributions, top_n=5):
+        order = np.argsort(-np.abs(contributions), axis=1)[:, :top_n]
+        names = self.feature_columns
+        return [
+            {names[j]: round(value, 4) for j, value in zip(columns, row[columns].tolist())}
+            for row, columns in zip(contributions, order)
+        ]
+
+    def predict_batch(self, input_data, with_contributions=False, with_interval=False):
+        df = self._to_frame(input_data)
+        with_interval = with_interval or self.safety_on_lower_bound
+
+        contributions = None
+        bounds = None
+        # Contributions and intervals describe the exact model, so both
+        # bypass the grid.
+        if with_contributions:
+            predictions, expected_value, contributions = self.explain_raw(df)
+            if with_interval:
+                _, spread, bounds = self.predict_interval_raw(df)
+        elif with_interval:
+            predictions, spread, bounds = self.predict_interval_raw(df)
+        else:
+            predictions = self.predict_values(df)
+
+        rules = self.rule_interpreter.evaluate(
+            df['food_type'].to_numpy(),
+            df['storage_type'].to_numpy(),
+            df['temperature'].to_numpy(),
+            df['humidity'].to_numpy(),
+            df['days_stored'].to_numpy(),
+            predictions,
+            safety_basis=bounds[0] if bounds is not None and self.safety_on_lower_bound else None
+        )
+
+        food_types = np.array(self.rule_interpreter.food_types, dtype=object)
+        storage_types = np.array(self.rule_interpreter.storage_types, dtype=object)
+        severity_levels = np.array(self.rule_interpreter.severity_levels, dtype=object)
+        safety_classes = np.array(self.rule_interpreter.safety_classes, dtype=object)
+
+        batch = {
+            'food_type': food_types[rules['food_code']],
+            'storage_type': storage_types[rules['storage_code']],
+            'temperature': df['temperature'].to_numpy(),
+            'humidity': df['humidity'].to_numpy(),
+            'days_stored': df['days_stored'].to_numpy(),
+            'predicted_remaining_days': rules['adjusted_days'],
+            'raw_prediction': predictions,
+            'safety_classification': safety_classes[rules['safety_code']],
+            'severity': severity_levels[rules['severity_code']],
+            'food_code': rules['food_code'],
+            'issue_mask': rules['issue_mask'],
+            'recommendation_mask': rules['recommendation_mask']
+        }
+        if contributions is not None:
+            batch['expected_value'] = expected_value
+            batch['contributions'] = contributions
+        if bounds is not None:
+            # Shift the band by the same rule adjustment as the point estimate.
+            factor = rules['adjustment_factor']
+            batch['interval_lower'] = np.maximum(bounds[0] * factor, 0.0)
+            batch['interval_upper'] = np.maximum(bounds[-1] * factor, 0.0)
+            batch['interval_std'] = spread * factor
+        return batch
+
+    def build_results(self, batch, include_feature_importance=True, top_n_contributions=5):
+        results = []
+
+        contributions = None
+        if 'contributions' in batch:
+            contributions = self.top_contributions(batch['contributions'], top_n_contributions)
+            expected_value = round(float(batch['expected_value']), 4)
+
+        rows = zip(
+            batch['food_type'].tolist(),
+            batch['storage_type'].tolist(),
+            batch['temperature'].tolist(),
+            batch['humidity'].tolist(),
+            batch['days_stored'].tolist(),
+            batch['predicted_remaining_days'].tolist(),
+            batch['raw_prediction'].tolist(),
+            batch['safety_classification'].tolist(),
+            batch['severity'].tolist(),
+            batch['food_code'].tolist(),
+            batch['issue_mask'].tolist(),
+            batch['recommendation_mask'].tolist()
+        )
+
+        for (food_type, storage_type, temperature, humidity, days_stored, adjusted, pred,
+             safety_class, severity, food_code, issue_mask, recommendation_mask) in rows:
+            results.append({
                 'food_type': food_type,
                 'storage_type': storage_type,
                 'temperature': temperature,
                 'humidity': humidity,
                 'days_stored': days_stored,
-                'predicted_remaining_days': round(float(adjusted_prediction), 2),
-                'raw_prediction': round(float(pred), 2),
+                'predicted_remaining_days': round(adjusted, 2),
+                'raw_prediction': round(pred, 2),
                 'safety_classification': safety_class,
-                'issues': issues,
+                'issues': self.rule_interpreter.render_issues(issue_mask, food_code, temperature, humidity),
                 'severity': severity,
-                'recommendations': recommendations,
-                'feature_importance': self.model.get_feature_importance(5)
-            }
+                'recommendations': self.rule_interpreter.render_recommendations(recommendation_mask)
+            })
+            if include_feature_importance:
+                results[-1]['feature_importance'] = dict(self.feature_importance)
 
-            results.append(result)
+        if contributions is not None:
+            for result, row_contributions in zip(results, contributions):
+                result['expected_value'] = expected_value
+                result['contributions'] = row_contributions
+
+        if 'interval_lower' in batch:
+            quantiles = list(self.interval_quantiles)
+            intervals = zip(
+                batch['interval_lower'].tolist(), batch['interval_upper'].tolist(), batch['interval_std'].tolist()
+            )
+            for result, (lower, upper, std) in zip(results, intervals):
+                result['prediction_interval'] = {
+                    'lower': round(lower, 2),
+                    'upper': round(upper, 2),
+                    'std': round(std, 2),
+                    'quantiles': quantiles
+                }
+
+        return results
+
+    def predict(self, input_data, include_feature_importance=True, with_interval=False):
+        batch = self.predict_batch(input_data, with_interval=with_interval)
+        results = self.build_results(batch, include_feature_importance)
 
         if len(results) == 1:
             return results[0]
         return results
 
-    def predict_single(self, food_type, temperature, humidity, storage_type, days_stored):
-        input_data = {
+    def explain_contributions(self, food_type, temperature, humidity, storage_type, days_stored, top_n=5):
+        df = self._to_frame({
             'food_type': food_type,
             'temperature': temperature,
             'humidity': humidity,
             'storage_type': storage_type,
             'days_stored': days_stored
+        })
+        _, expected_value, contributions = self.explain_raw(df)
+
+        return {
+            'expected_value': round(float(expected_value), 4),
+            'contributions': self.top_contributions(contributions, top_n)[0]
         }
-        return self.predict(input_data)
+
+    def _row_buffer(self):
+        buffer = getattr(self._buffers, 'row', None)
+        if buffer is None:
+            buffer = np.zeros((1, len(self.feature_columns)))
+            self._buffers.row = buffer
+        return buffer
+
+    def predict_single(self, food_type, temperature, humidity, storage_type, days_stored, with_interval=False):
+        output = self.model_output(food_type, temperature, humidity, storage_type, days_stored, with_interval)
+        return self.finish_single(food_type, temperature, humidity, storage_type, days_stored, **output)
+
+    def model_output(self, food_type, temperature, humidity, storage_type, days_stored, with_interval=False):
+        # Everything finish_single needs from the model, before any rule runs.
+        if with_interval or self.safety_on_lower_bound:
+            buffer = self.fill_row_buffer(food_type, temperature, humidity, storage_type, days_stored)
+            mean, spread, bounds = self.point_interval(*self.model.predict_interval(buffer, self.interval_quantiles))
+            return {
+                'pred': float(mean[0]),
+                'interval': [float(bounds[0, 0]), float(bounds[-1, 0]), float(spread[0])]
+            }
+
+        pred = None
+        if self.grid is not None:
+            pred = self.grid.lookup(food_type, storage_type, temperature, humidity, days_stored)
+        if pred is None:
+            pred = self.predict_single_raw(food_type, temperature, humidity, storage_type, days_stored)
+        return {'pred': pred}
+
+    def model_outputs(self, input_data):
+        df = self._to_frame(input_data)
+        if self.safety_on_lower_bound:
+            predictions, spread, bounds = self.predict_interval_raw(df)
+            rows = zip(predictions.tolist(), bounds[0].tolist(), bounds[-1].tolist(), spread.tolist())
+            return [{'pred': pred, 'interval': [lower, upper, std]} for pred, lower, upper, std in rows]
+        return [{'pred': pred} for pred in self.predict_values(df).tolist()]
+
+    def predict_single_raw(self, food_type, temperature, humidity, storage_type, days_stored):
+        buffer = self.fill_row_buffer(food_type, temperature, humidity, storage_type, days_stored)
+        return float(self.model.predict(buffer)[0])
+
+    def fill_row_buffer(self, food_type, temperature, humidity, storage_type, days_stored):
+        food_code, temp_scaled, humidity_scaled, storage_code, days_scaled = self.preprocessor.transform_row(
+            food_type, temperature, humidity, storage_type, days_stored
+        )
+        features = self.feature_engineer.transform_row(
+            food_code, storage_code, temp_scaled, humidity_scaled, days_scaled
+        )
+
+        buffer = self._row_buffer()
+        for i, column in enumerate(self.feature_columns):
+            buffer[0, i] = features[column]
+        return buffer
+
+    def finish_single(self, food_type, temperature, humidity, storage_type, days_stored, pred, interval=None):
+        food_type = str(food_type)
+        if food_type not in self.rule_interpreter.food_rules:
+            food_type = 'dairy'
+        storage_type = str(storage_type)
+        if storage_type not in self.rule_interpreter.storage_rules:
+            storage_type = 'refrigerator'
+
+        issues, severity = self.rule_interpreter.check_extreme_conditions(
+            food_type, storage_type, temperature, humidity, days_stored
+        )
+        adjusted_prediction = self.rule_interpreter.adjust_prediction(pred, issues, severity, days_stored)
+
+        adjusted_interval = None
+        if interval is not None:
+            adjusted_interval = [
+                self.rule_interpreter.adjust_prediction(value, issues, severity, days_stored) for value in interval
+            ]
+
+        safety_class = self.rule_interpreter.classify_safety(
+            adjusted_prediction, days_stored, issues,
+            lower_bound=adjusted_interval[0] if adjusted_interval is not None and self.safety_on_lower_bound else None
+        )
+        recommendations = self.rule_interpreter.get_recommendations(
+            food_type, storage_type, temperature, humidity, adjusted_prediction
+        )
+
+        result = {
+            'food_type': food_type,
+            'storage_type': storage_type,
+            'temperature': temperature,
+            'humidity': humidity,
+            'days_stored': days_stored,
+            'predicted_remaining_days': round(float(adjusted_prediction), 2),
+            'raw_prediction': round(pred, 2),
+            'safety_classification': safety_class,
+            'issues': issues,
+            'severity': severity,
+            'recommendations': recommendations,
+            'feature_importance': dict(self.feature_importance)
+        }
+        if adjusted_interval is not None:
+            lower, upper, std = adjusted_interval
+            result['prediction_interval'] = {
+                'lower': round(float(lower), 2),
+                'upper': round(float(upper), 2),
+                'std': round(float(std), 2),
+                'quantiles': list(self.interval_quantiles)
+            }
+        return result
 
     def explain_prediction(self, result):
         explanation = []
@@ -105,6 +350,11 @@ class InferencePipeline:
             for issue in result['issues']:
                 explanation.append(f"  - {issue}")
 
+        if result.get('contributions'):
+            explanation.append(f"\nMain factors (days, relative to a typical item):")
+            for feature, contribution in result['contributions'].items():
+                explanation.append(f"  - {feature}: {contribution:+.2f}")
+
         if result['recommendations']:
             explanation.append(f"\nRecommendations:")
             for rec in result['recommendations']:
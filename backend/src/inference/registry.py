@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+from src.models.bundle import (
+    load_model_bundle, BUNDLE_DIRNAME, LEGACY_MODEL_FILENAME, LEGACY_PREPROCESSOR_FILENAME
+)
+from src.feature_engineering.engineer import FeatureEngineer
+from src.rules.interpreter import RuleBasedInterpreter
+from src.inference.pipeline import InferencePipeline
+from src.inference.grid import PredictionGrid, GRID_DIRNAME, DEFAULT_MAX_GRID_ERROR
+
+
+class ModelRegistry:
+    def __init__(self, models_dir='models', on_swap=None, poll_interval=5.0, use_grid=False,
+                 max_grid_error=DEFAULT_MAX_GRID_ERROR, safety_on_lower_bound=False):
+        self.models_dir = models_dir
+        self.on_swap = on_swap
+        self.poll_interval = poll_interval
+        self.use_grid = use_grid
+        self.max_grid_error = max_grid_error
+        self.safety_on_lower_bound = safety_on_lower_bound
+
+        self.pipeline = None
+        self.bundle = None
+        self.version = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.last_error = None
+        self.reloading = False
+
+        self._reload_lock = threading.Lock()
+        self._fingerprint = None
+        self._watcher = None
+        self._stop = threading.Event()
+
+        self.warmup_rows = [
+            {'food_type': 'dairy', 'temperature': 4.0, 'humidity': 60.0,
+             'storage_type': 'refrigerator', 'days_stored': 2.0},
+            {'food_type': 'meat', 'temperature': -18.0, 'humidity': 50.0,
+             'storage_type': 'freezer', 'days_stored': 10.0},
+            {'food_type': 'bakery', 'temperature': 22.0, 'humidity': 55.0,
+             'storage_type': 'pantry', 'days_stored': 1.0}
+        ]
+
+    def fingerprint(self):
+        paths = [
+            os.path.join(self.models_dir, BUNDLE_DIRNAME, 'manifest.json'),
+            os.path.join(self.models_dir, BUNDLE_DIRNAME, GRID_DIRNAME, 'grid.json'),
+            os.path.join(self.models_dir, LEGACY_MODEL_FILENAME),
+            os.path.join(self.models_dir, LEGACY_PREPROCESSOR_FILENAME)
+        ]
+
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def build_pipeline(self, bundle):
+        pipeline = InferencePipeline(
+            bundle.preprocessor, FeatureEngineer(), bundle.predictor, RuleBasedInterpreter(),
+            model_version=bundle.version
+        )
+
+        if self.safety_on_lower_bound:
+            if pipeline.supports_intervals:
+                pipeline.safety_on_lower_bound = True
+            else:
+                print("Model has no per-tree intervals, classifying safety on the point prediction")
+
+        if self.use_grid:
+            try:
+                grid = PredictionGrid.load(
+                    os.path.join(self.models_dir, BUNDLE_DIRNAME, GRID_DIRNAME), model_version=bundle.version
+                )
+                max_error = grid.error.get('max_abs_error', float('inf'))
+                if not max_error <= self.max_grid_error:
+                    raise ValueError(f"max interpolation error {max_error:.3f} exceeds {self.max_grid_error}")
+                pipeline.grid = grid
+                print(f"Prediction grid loaded (max interpolation error {max_error:.3f} days)")
+            except Exception as e:
+                print(f"Prediction grid not used, falling back to the exact model: {e}")
+
+        # Touch every code path once so the first real request does not pay
+        # for page faults on the mapped arrays or lazily built tables.
+        for row in self.warmup_rows:
+            pipeline.predict_single(**row)
+        pipeline.predict(self.warmup_rows)
+
+        return pipeline
+
+    def reload(self, wait=False):
+        # The watcher skips a reload that is already running; an explicit
+        # request waits for it and then loads the files again.
+        if not self._reload_lock.acquire(blocking=wait):
+            return False
+
+        self.reloading = True
+        try:
+            start = time.perf_counter()
+            bundle = load_model_bundle(self.models_dir)
+            pipeline = self.build_pipeline(bundle)
+            load_seconds = time.perf_counter() - start
+
+            # A single reference assignment: requests that already picked up
+            # the old pipeline finish on it, new requests see the new one.
+            self.pipeline = pipeline
+            self.bundle = bundle
+            self.version = bundle.version
+            self.loaded_at = datetime.now(timezone.utc).isoformat()
+            self.load_seconds = round(load_seconds, 3)
+            self.last_error = None
+            # Loading a legacy pickle upgrades it into a bundle, so take the
+            # fingerprint again to avoid reloading our own output.
+            self._fingerprint = self.fingerprint()
+
+            if self.on_swap is not None:
+                self.on_swap(pipeline)
+
+            print(f"Model version {self.version} loaded in {self.load_seconds:.3f}s")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Error reloading model: {e}")
+            traceback.print_exc()
+            return False
+        finally:
+            self.reloading = False
+            self._reload_lock.release()
+
+    def reload_async(self):
+        if self.reloading:
+            return False
+
+        thread = threading.Thread(target=self.reload, name='model-reload', daemon=True)
+        thread.start()
+        return True
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.poll_interval):
+            fingerprint = self.fingerprint()
+            if fingerprint == self._fingerprint:
+                pending = None
+                continue
+
+            # Only load once the files have stopped changing for a full poll,
+            # so a pickle still being written is not picked up half-way.
+            if fingerprint != pending:
+                pending = fingerprint
+                continue
+
+            print(f"Model files changed in {self.models_dir}, reloading...")
+            if not self.reload():
+                self._fingerprint = fingerprint
+            pending = None
+
+    def start_watcher(self):
+        if self._watcher is not None or not self.poll_interval:
+            return
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def status(self):
+        grid = self.pipeline.grid if self.pipeline is not None else None
+        return {
+            'model_version': self.version,
+            'model_loaded_at': self.loaded_at,
+            'model_load_seconds': self.load_seconds,
+            'model_reloading': self.reloading,
+            'model_error': self.last_error,
+            'prediction_grid': grid.status() if grid is not None else None
+        }
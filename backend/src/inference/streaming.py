@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+import math
+import traceback
+
+NUMERIC_FIELDS = ('temperature', 'humidity', 'days_stored')
+
+
+def _to_number(value):
+    if value is None or value == '':
+        return float('nan')
+    return float(value)
+
+
+def _finite(value):
+    # Blank CSV cells come through as NaN; NDJSON has no token for it.
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+
+def encode_line(value):
+    return json.dumps(_finite(value), allow_nan=False) + '\n'
+
+
+def iter_ndjson_records(stream):
+    for line in io.TextIOWrapper(stream, encoding='utf-8'):
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_csv_records(stream):
+    for row in csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8', newline='')):
+        for field in NUMERIC_FIELDS:
+            if field in row:
+                row[field] = _to_number(row[field])
+        yield row
+
+
+def iter_chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_predictions(pipeline, records, chunk_size=5000, with_interval=False):
+    # Only one chunk of inputs and one chunk of encoded results are alive at a
+    # time, so memory does not grow with the size of the upload.
+    start = 0
+    try:
+        for chunk in iter_chunks(records, chunk_size):
+            try:
+                batch = pipeline.predict_batch(chunk, with_interval=with_interval)
+                results = pipeline.build_results(batch, include_feature_importance=False)
+                yield ''.join(encode_line(result) for result in results)
+            except Exception as e:
+                traceback.print_exc()
+                yield encode_line({'error': str(e), 'rows': [start, start + len(chunk)]})
+            start += len(chunk)
+    except (ValueError, csv.Error) as e:
+        # A malformed line ends the stream; rows before this chunk were already sent.
+        yield encode_line({'error': f"Invalid input in the chunk starting at row {start}: {e}"})
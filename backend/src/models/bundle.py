@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+from src.models.predictor import ShelfLifePredictor, file_signature
+from src.models.compiled import file_sha256, json_default
+from src.preprocessing.preprocessor import DataPreprocessor
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_DIRNAME = 'shelf_life_model'
+LEGACY_MODEL_FILENAME = 'shelf_life_predictor.pkl'
+LEGACY_PREPROCESSOR_FILENAME = 'preprocessor.pkl'
+
+
+class ModelBundle:
+    def __init__(self, predictor, preprocessor, manifest):
+        self.predictor = predictor
+        self.preprocessor = preprocessor
+        self.manifest = manifest
+
+    @property
+    def version(self):
+        return self.manifest['model_version']
+
+    @property
+    def feature_columns(self):
+        return self.manifest['feature_columns']
+
+    @property
+    def metrics(self):
+        return self.manifest.get('metrics', {})
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model bundle format: {manifest.get('format_version')}")
+
+        files = manifest['files']
+        predictor = ShelfLifePredictor().load(os.path.join(directory, files['estimator']), mmap=mmap)
+        preprocessor = DataPreprocessor().load(os.path.join(directory, files['preprocessor']))
+
+        if predictor.get_feature_columns() != manifest['feature_columns']:
+            raise ValueError("Model bundle feature columns do not match the estimator")
+
+        return cls(predictor, preprocessor, manifest)
+
+
+def save_model_bundle(model, preprocessor, feature_columns, metrics=None, directory=None, source=None):
+    if directory is None:
+        directory = os.path.join('models', BUNDLE_DIRNAME)
+
+    if isinstance(model, ShelfLifePredictor):
+        predictor = model
+    else:
+        predictor = ShelfLifePredictor().use_estimator(model)
+
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    files = {
+        'estimator': 'estimator.pkl',
+        'preprocessor': 'preprocessor.pkl'
+    }
+    predictor.save(os.path.join(tmp_directory, files['estimator']))
+    preprocessor.save(os.path.join(tmp_directory, files['preprocessor']))
+    if predictor.compiled is not None:
+        files['compiled'] = 'estimator.compiled'
+
+    estimator_hash = file_sha256(os.path.join(tmp_directory, files['estimator']))
+    created_at = datetime.now(timezone.utc)
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model_version': f"{created_at.strftime('%Y%m%d%H%M%S')}-{estimator_hash[:12]}",
+        'created_at': created_at.isoformat(),
+        'estimator_type': type(predictor.model).__name__,
+        'feature_columns': [str(column) for column in feature_columns],
+        'metrics': metrics or {},
+        'files': files,
+        'source': source
+    }
+    with open(os.path.join(tmp_directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, default=json_default)
+
+    old_directory = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.rename(directory, old_directory)
+    os.rename(tmp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+    return ModelBundle(predictor, preprocessor, manifest)
+
+
+def upgrade_legacy_model(models_dir='models'):
+    model_path = os.path.join(models_dir, LEGACY_MODEL_FILENAME)
+    preprocessor_path = os.path.join(models_dir, LEGACY_PREPROCESSOR_FILENAME)
+
+    predictor = ShelfLifePredictor().load(model_path, mmap=False)
+    preprocessor = DataPreprocessor().load(preprocessor_path)
+
+    print(f"Upgrading legacy model {model_path} to a model bundle...")
+    return save_model_bundle(
+        predictor,
+        preprocessor,
+        predictor.get_feature_columns(),
+        directory=os.path.join(models_dir, BUNDLE_DIRNAME),
+        source=file_signature(model_path)
+    )
+
+
+def load_model_bundle(models_dir='models', mmap=True):
+    bundle_dir = os.path.join(models_dir, BUNDLE_DIRNAME)
+    manifest_path = os.path.join(bundle_dir, 'manifest.json')
+    legacy_path = os.path.join(models_dir, LEGACY_MODEL_FILENAME)
+
+    has_bundle = os.path.exists(manifest_path)
+    has_legacy = os.path.exists(legacy_path)
+
+    # A legacy pickle written after the bundle (by an older training script)
+    # wins, and is upgraded so the next start loads it directly.
+    legacy_is_newer = (
+        has_bundle and has_legacy and
+        os.path.getmtime(legacy_path) > os.path.getmtime(manifest_path)
+    )
+
+    errors = []
+    if has_bundle and not legacy_is_newer:
+        try:
+            return ModelBundle.load(bundle_dir, mmap=mmap)
+        except Exception as e:
+            errors.append(f"{bundle_dir}: {e}")
+
+    if has_legacy:
+        try:
+            bundle = upgrade_legacy_model(models_dir)
+            return ModelBundle.load(bundle_dir, mmap=mmap) if mmap else bundle
+        except Exception as e:
+            errors.append(f"{legacy_path}: {e}")
+
+    if has_bundle and legacy_is_newer:
+        try:
+            return ModelBundle.load(bundle_dir, mmap=mmap)
+        except Exception as e:
+            errors.append(f"{bundle_dir}: {e}")
+
+    if not errors:
+        errors.append(f"no model bundle or legacy model found in {models_dir}")
+    raise ValueError("Could not load model: " + "; ".join(errors))
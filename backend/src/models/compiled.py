@@ -0,0 +1,327 @@
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+from sklearn.ensemble import (
+    RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor,
+    VotingRegressor, StackingRegressor
+)
+from sklearn.tree import DecisionTreeRegressor
+
+
+class CompiledTreeEnsemble:
+    array_names = ['feature', 'threshold', 'children', 'value', 'roots', 'tree_depths', 'tree_weights']
+    format_version = 1
+
+    def __init__(self, feature, threshold, children, value, roots, tree_depths, tree_weights, bias,
+                 denominator=1.0, feature_names=None, averaging=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.tree_depths = tree_depths
+        self.tree_weights = tree_weights
+        self.bias = float(bias)
+        self.denominator = float(denominator)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.averaging = bool(averaging)
+        self.max_chunk_nodes = 1 << 18
+        self.metadata = {}
+
+        self.max_depth = int(tree_depths.max()) if len(tree_depths) else 0
+        self.active_trees = [int((tree_depths > level).sum()) for level in range(self.max_depth)]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_estimator(cls, estimator, feature_names=None):
+        trees = []
+        bias = cls._collect(estimator, 1.0, trees)
+        # Deepest trees first, so the trees still descending at any level form
+        # a prefix of the node array.
+        trees.sort(key=lambda item: item[0].max_depth, reverse=True)
+
+        n_nodes = sum(tree.node_count for tree, _ in trees)
+        feature = np.zeros(n_nodes, dtype=np.int32)
+        threshold = np.zeros(n_nodes, dtype=np.float32)
+        children = np.zeros(n_nodes, dtype=np.int32)
+        value = np.zeros(n_nodes, dtype=np.float64)
+        roots = np.zeros(len(trees), dtype=np.int32)
+        tree_depths = np.zeros(len(trees), dtype=np.int32)
+        tree_weights = np.zeros(len(trees), dtype=np.float64)
+
+        offset = 0
+        for i, (tree, weight) in enumerate(trees):
+            slot, is_leaf, internal = cls._sibling_layout(tree)
+            nodes = offset + slot
+
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, np.inf, cls._float32_thresholds(tree.threshold))
+            children[nodes] = nodes
+            children[nodes[internal]] = offset + slot[tree.children_left[internal]]
+            value[nodes] = tree.value[:, 0, 0]
+
+            roots[i] = offset
+            tree_depths[i] = tree.max_depth
+            tree_weights[i] = weight
+            offset += tree.node_count
+
+        if feature_names is None and hasattr(estimator, 'feature_names_in_'):
+            feature_names = estimator.feature_names_in_
+
+        # Plain forests are summed and divided once, as sklearn does, so that
+        # averages landing on rounding boundaries come out the same.
+        averaging = isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor))
+        denominator = 1.0
+        if averaging:
+            denominator = float(len(trees))
+            tree_weights[:] = 1.0
+
+        return cls(feature, threshold, children, value, roots, tree_depths, tree_weights, bias,
+                   denominator, feature_names, averaging)
+
+    @staticmethod
+    def _sibling_layout(tree):
+        # Renumber nodes so that every right child sits directly after its left
+        # sibling; traversal then only needs the left child index.
+        is_leaf = tree.children_left == -1
+        internal = np.flatnonzero(~is_leaf)
+        rank = np.arange(len(internal))
+
+        slot = np.zeros(tree.node_count, dtype=np.int64)
+        slot[tree.children_left[internal]] = 1 + 2 * rank
+        slot[tree.children_right[internal]] = 2 + 2 * rank
+        return slot, is_leaf, internal
+
+    @staticmethod
+    def _float32_thresholds(threshold):
+        # sklearn compares float32 inputs against float64 thresholds; rounding
+        # each threshold down to the nearest float32 keeps the same decisions.
+        rounded = threshold.astype(np.float32)
+        too_high = rounded.astype(np.float64) > threshold
+        rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+        return rounded
+
+    @classmethod
+    def _collect(cls, estimator, weight, trees):
+        if isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor)):
+            n_estimators = len(estimator.estimators_)
+            for tree in estimator.estimators_:
+                trees.append((tree.tree_, weight / n_estimators))
+            return 0.0
+
+        if isinstance(estimator, GradientBoostingRegressor):
+            if estimator.init_ == 'zero':
+                bias = 0.0
+            elif hasattr(estimator.init_, 'constant_'):
+                bias = float(np.ravel(estimator.init_.constant_)[0])
+            else:
+                raise ValueError(f"Unsupported GradientBoosting init estimator: {type(estimator.init_).__name__}")
+
+            for tree in estimator.estimators_[:, 0]:
+                trees.append((tree.tree_, weight * estimator.learning_rate))
+            return weight * bias
+
+        if isinstance(estimator, DecisionTreeRegressor):
+            trees.append((estimator.tree_, weight))
+            return 0.0
+
+        if isinstance(estimator, VotingRegressor):
+            weights = estimator._weights_not_none
+            if weights is None:
+                weights = np.ones(len(estimator.estimators_))
+            weights = np.asarray(weights, dtype=float) / np.sum(weights)
+
+            bias = 0.0
+            for sub_estimator, sub_weight in zip(estimator.estimators_, weights):
+                bias += cls._collect(sub_estimator, weight * sub_weight, trees)
+            return bias
+
+        if isinstance(estimator, StackingRegressor):
+            final_estimator = estimator.final_estimator_
+            if estimator.passthrough or not hasattr(final_estimator, 'coef_'):
+                raise ValueError("Only StackingRegressor with a linear final estimator and passthrough=False is supported")
+
+            coef = np.ravel(final_estimator.coef_)
+            bias = weight * float(np.ravel(final_estimator.intercept_)[0])
+            for sub_estimator, sub_weight in zip(estimator.estimators_, coef):
+                bias += cls._collect(sub_estimator, weight * sub_weight, trees)
+            return bias
+
+        raise ValueError(f"Unsupported estimator for compilation: {type(estimator).__name__}")
+
+    def _prepare(self, X):
+        if hasattr(X, 'columns'):
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            X = X.to_numpy()
+        return np.asarray(X, dtype=np.float32)
+
+    def leaf_values(self, X):
+        X = self._prepare(X)
+        n_rows = X.shape[0]
+        out = np.empty((self.n_trees, n_rows), dtype=np.float64)
+
+        chunk = max(1, self.max_chunk_nodes // max(1, self.n_trees))
+        for start in range(0, n_rows, chunk):
+            stop = min(start + chunk, n_rows)
+            out[:, start:stop] = self._traverse(X[start:stop])
+
+        return out
+
+    def _traverse(self, X, contributions=None):
+        n_rows = X.shape[0]
+        X_t = np.ascontiguousarray(X.T).ravel()
+        rows = np.tile(np.arange(n_rows, dtype=np.intp), self.n_trees)
+
+        if contributions is not None:
+            n_features = X.shape[1]
+            weights = np.repeat(self.tree_weights / self.denominator, n_rows)
+
+        node = np.repeat(self.roots.astype(np.intp), n_rows)
+        for n_active in self.active_trees:
+            end = n_active * n_rows
+            active = node[:end]
+            feature = self.feature.take(active)
+            x = X_t.take(feature * n_rows + rows[:end])
+            next_node = self.children.take(active) + (x > self.threshold.take(active))
+
+            if contributions is not None:
+                # Each split credits its feature with the change in node value
+                # along the decision path (Saabas); leaves loop onto themselves
+                # and add nothing.
+                delta = (self.value.take(next_node) - self.value.take(active)) * weights[:end]
+                contributions += np.bincount(
+                    rows[:end] * n_features + feature, weights=delta, minlength=n_rows * n_features
+                ).reshape(n_rows, n_features)
+
+            node[:end] = next_node
+
+        return self.value.take(node).reshape(self.n_trees, n_rows)
+
+    def predict(self, X):
+        return self.bias + (self.tree_weights @ self.leaf_values(X)) / self.denominator
+
+    def predict_distribution(self, X, quantiles=(0.1, 0.9)):
+        if not self.averaging:
+            raise ValueError("Prediction intervals need an averaging forest (RandomForest or ExtraTrees)")
+
+        # The mean, spread and quantiles all come from the one set of leaf
+        # values, so an interval costs a sort per row, not another pass.
+        leaves = self.leaf_values(X)
+        mean = self.bias + (self.tree_weights @ leaves) / self.denominator
+
+        # Linear interpolation between order statistics, as np.quantile does,
+        # without its fixed per-call overhead on single rows.
+        ordered = np.sort(leaves, axis=0)
+        position = np.asarray(quantiles, dtype=float) * (self.n_trees - 1)
+        lower = np.floor(position).astype(np.intp)
+        upper = np.minimum(lower + 1, self.n_trees - 1)
+        fraction = (position - lower)[:, None]
+        bounds = ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+        return mean, leaves.std(axis=0), bounds
+
+    def expected_value(self):
+        return self.bias + float(self.tree_weights @ self.value[self.roots]) / self.denominator
+
+    def explain(self, X):
+        X = self._prepare(X)
+        n_rows = X.shape[0]
+        predictions = np.empty(n_rows, dtype=np.float64)
+        contributions = np.zeros(X.shape, dtype=np.float64)
+
+        chunk = max(1, self.max_chunk_nodes // max(1, self.n_trees))
+        for start in range(0, n_rows, chunk):
+            stop = min(start + chunk, n_rows)
+            leaves = self._traverse(X[start:stop], contributions[start:stop])
+            predictions[start:stop] = self.bias + (self.tree_weights @ leaves) / self.denominator
+
+        return predictions, self.expected_value(), contributions
+
+    def save(self, directory, metadata=None):
+        tmp_directory = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        arrays = {}
+        for name in self.array_names:
+            array = np.ascontiguousarray(getattr(self, name))
+            filename = f"{name}.npy"
+            np.save(os.path.join(tmp_directory, filename), array, allow_pickle=False)
+            arrays[name] = {
+                'file': filename,
+                'dtype': str(array.dtype),
+                'shape': list(array.shape),
+                'sha256': file_sha256(os.path.join(tmp_directory, filename))
+            }
+
+        manifest = {
+            'format_version': self.format_version,
+            'feature_columns': self.feature_names,
+            'bias': self.bias,
+            'denominator': self.denominator,
+            'averaging': self.averaging,
+            'arrays': arrays,
+            'metadata': metadata if metadata is not None else self.metadata
+        }
+        with open(os.path.join(tmp_directory, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2, default=json_default)
+
+        # Swap the whole directory in, so readers never see a half-written
+        # artifact; processes still mapping the old files keep them alive.
+        old_directory = f"{directory}.old-{os.getpid()}"
+        if os.path.exists(directory):
+            os.rename(directory, old_directory)
+        os.rename(tmp_directory, directory)
+        shutil.rmtree(old_directory, ignore_errors=True)
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r', verify=True, feature_columns=None):
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        if manifest.get('format_version') != cls.format_version:
+            raise ValueError(f"Unsupported compiled model format: {manifest.get('format_version')}")
+
+        if feature_columns is not None and list(feature_columns) != manifest['feature_columns']:
+            raise ValueError("Compiled model feature columns do not match the expected columns")
+
+        arrays = {}
+        for name in cls.array_names:
+            spec = manifest['arrays'][name]
+            path = os.path.join(directory, spec['file'])
+            if verify and file_sha256(path) != spec['sha256']:
+                raise ValueError(f"Checksum mismatch for compiled array {spec['file']}")
+
+            array = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+            if str(array.dtype) != spec['dtype'] or list(array.shape) != spec['shape']:
+                raise ValueError(f"Compiled array {spec['file']} does not match its manifest entry")
+            arrays[name] = array
+
+        compiled = cls(
+            arrays['feature'], arrays['threshold'], arrays['children'], arrays['value'],
+            arrays['roots'], arrays['tree_depths'], arrays['tree_weights'],
+            manifest['bias'], manifest['denominator'], manifest['feature_columns'], manifest['averaging']
+        )
+        compiled.metadata = manifest.get('metadata') or {}
+        return compiled
+
+
+def json_default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
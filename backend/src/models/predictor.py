@@ -4,6 +4,11 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import numpy as np
 import joblib
 import os
+import threading
+import warnings
+from src.models.compiled import CompiledTreeEnsemble
+
+_estimator_load_lock = threading.Lock()
 
 
 class ShelfLifePredictor:
@@ -16,18 +21,99 @@ class ShelfLifePredictor:
         )
         self.is_trained = False
         self.feature_importance = None
+        self.sorted_feature_importance = []
         self.best_params = None
+        self.compiled = None
+        self.compiled_max_rows = 10000
+        self.estimator_path = None
+
+    def get_feature_columns(self):
+        if self.model is None and self.compiled is not None:
+            return self.compiled.feature_names
+        columns = getattr(self.model, 'feature_names_in_', None)
+        if columns is None and self.feature_importance:
+            columns = list(self.feature_importance.keys())
+        return list(columns) if columns is not None else None
 
     def train(self, X_train, y_train):
         self.model.fit(X_train, y_train)
         self.is_trained = True
-        self.feature_importance = dict(zip(X_train.columns, self.model.feature_importances_))
+        self.set_feature_importance(dict(zip(X_train.columns, self.model.feature_importances_)))
+        self.compile()
+        return self
+
+    def use_estimator(self, estimator):
+        self.model = estimator
+        self.is_trained = True
+
+        columns = getattr(estimator, 'feature_names_in_', None)
+        importances = getattr(estimator, 'feature_importances_', None)
+        if columns is not None and importances is not None:
+            self.set_feature_importance(dict(zip(columns, importances)))
+        else:
+            self.set_feature_importance({})
+
+        self.compile()
+        return self
+
+    def compile(self):
+        try:
+            self.compiled = CompiledTreeEnsemble.from_estimator(self.model, self.get_feature_columns())
+        except ValueError as e:
+            print(f"Model not compiled, using sklearn predict: {e}")
+            self.compiled = None
         return self
 
     def predict(self, X):
         if not self.is_trained:
             raise ValueError("Model must be trained before prediction")
-        return self.model.predict(X)
+        if self.compiled is not None and len(X) <= self.compiled_max_rows:
+            return self.compiled.predict(X)
+
+        model = self.sklearn_model()
+        if model is None:
+            return self.compiled.predict(X)
+        # The single-row path passes a plain array in training column order.
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+            return model.predict(X)
+
+    def sklearn_model(self):
+        # A memory-mapped load skips the pickle. It is read the first time a
+        # batch is large enough for sklearn to beat the compiled engine, and
+        # only if it is still the file the arrays were compiled from.
+        if self.model is None and self.estimator_path is not None:
+            with _estimator_load_lock:
+                if self.model is None and self.estimator_path is not None:
+                    path, self.estimator_path = self.estimator_path, None
+                    try:
+                        current = file_signature(path)
+                    except OSError:
+                        current = None
+                    if self.compiled.metadata.get('source') == current:
+                        model_data = joblib.load(path)
+                        self.model = model_data['model'] if isinstance(model_data, dict) else model_data
+                    else:
+                        print(f"Not loading {path} for large batches, it changed since it was compiled")
+        return self.model
+
+    @property
+    def supports_intervals(self):
+        return self.compiled is not None and self.compiled.averaging
+
+    def predict_interval(self, X, quantiles=(0.1, 0.9)):
+        if not self.is_trained:
+            raise ValueError("Model must be trained before prediction")
+        if self.compiled is None:
+            raise ValueError("Prediction intervals need a compiled tree ensemble")
+        return self.compiled.predict_distribution(X, quantiles)
+
+    def explain(self, X):
+        if not self.is_trained:
+            raise ValueError("Model must be trained before prediction")
+        if self.compiled is None:
+            raise ValueError("Per-prediction contributions need a compiled tree ensemble")
+        return self.compiled.explain(X)
 
     def evaluate(self, X_test, y_test):
         predictions = self.predict(X_test)
@@ -73,21 +159,26 @@ class ShelfLifePredictor:
         grid_search.fit(X_train, y_train)
         self.model = grid_search.best_estimator_
         self.is_trained = True
-        self.feature_importance = dict(zip(X_train.columns, self.model.feature_importances_))
+        self.set_feature_importance(dict(zip(X_train.columns, self.model.feature_importances_)))
         self.best_params = grid_search.best_params_
-        
+        self.compile()
+
         return self.best_params
 
+    def set_feature_importance(self, feature_importance):
+        self.feature_importance = feature_importance
+        # Sorted once here rather than on every get_feature_importance call.
+        self.sorted_feature_importance = sorted(
+            (feature_importance or {}).items(),
+            key=lambda x: x[1],
+            reverse=True
+        )
+
     def get_feature_importance(self, top_n=10):
         if not self.is_trained:
             raise ValueError("Model must be trained first")
 
-        sorted_importance = sorted(
-            self.feature_importance.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
-        return dict(sorted_importance[:top_n])
+        return dict(self.sorted_feature_importance[:top_n])
 
     def save(self, filepath):
         model_data = {
@@ -98,10 +189,61 @@ class ShelfLifePredictor:
         }
         joblib.dump(model_data, filepath)
 
-    def load(self, filepath):
+        if self.compiled is not None:
+            self.save_compiled(filepath)
+
+    def save_compiled(self, filepath):
+        metadata = {
+            'feature_importance': self.feature_importance,
+            'best_params': self.best_params,
+            'source': file_signature(filepath)
+        }
+        return self.compiled.save(compiled_path(filepath), metadata)
+
+    def load(self, filepath, mmap=True):
+        if mmap and self.load_compiled(filepath):
+            return self
+
         model_data = joblib.load(filepath)
+        if not isinstance(model_data, dict):
+            return self.use_estimator(model_data)
+
         self.model = model_data['model']
         self.is_trained = model_data['is_trained']
-        self.feature_importance = model_data['feature_importance']
+        self.set_feature_importance(model_data['feature_importance'])
         self.best_params = model_data['best_params']
+        if self.is_trained:
+            self.compile()
         return self
+
+    def load_compiled(self, filepath):
+        directory = compiled_path(filepath)
+        if not os.path.exists(os.path.join(directory, 'manifest.json')):
+            return False
+
+        try:
+            compiled = CompiledTreeEnsemble.load(directory)
+        except (ValueError, OSError, KeyError) as e:
+            print(f"Ignoring compiled model at {directory}: {e}")
+            return False
+
+        if compiled.metadata.get('source') != file_signature(filepath):
+            print(f"Ignoring stale compiled model at {directory}")
+            return False
+
+        self.model = None
+        self.estimator_path = filepath
+        self.compiled = compiled
+        self.is_trained = True
+        self.set_feature_importance(compiled.metadata.get('feature_importance'))
+        self.best_params = compiled.metadata.get('best_params')
+        return True
+
+
+def compiled_path(filepath):
+    return os.path.splitext(filepath)[0] + '.compiled'
+
+
+def file_signature(filepath):
+    stat = os.stat(filepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
@@ -12,14 +12,15 @@ class DataPreprocessor:
         self.scaler = StandardScaler()
         self.imputer = SimpleImputer(strategy='median')
         self.feature_columns = None
+        self.categorical_cols = ['food_type', 'storage_type']
+        self.numerical_cols = ['temperature', 'humidity', 'days_stored']
         self.is_fitted = False
 
     def fit(self, X):
         self.feature_columns = X.columns.tolist()
-        categorical_cols = ['food_type', 'storage_type']
-        numerical_cols = ['temperature', 'humidity', 'days_stored']
+        numerical_cols = self.numerical_cols
 
-        for col in categorical_cols:
+        for col in self.categorical_cols:
             if col in X.columns:
                 le = LabelEncoder()
                 X[col] = X[col].astype(str)
@@ -30,40 +31,91 @@ class DataPreprocessor:
         X[numerical_cols] = self.imputer.fit_transform(X[numerical_cols])
         self.scaler.fit(X[numerical_cols])
         self.is_fitted = True
+        self.compile()
         return self
 
+    def compile(self, compiled=None):
+        if compiled is None:
+            compiled = {
+                'categories': {col: [str(label) for label in le.classes_] for col, le in self.label_encoders.items()},
+                'numerical_cols': list(self.numerical_cols),
+                'fill_values': self.imputer.statistics_,
+                'means': self.scaler.mean_,
+                'scales': self.scaler.scale_
+            }
+
+        self.numerical_cols = list(compiled['numerical_cols'])
+        self.category_codes = {
+            col: {label: code for code, label in enumerate(labels)}
+            for col, labels in compiled['categories'].items()
+        }
+        self.category_index = {col: pd.Index(labels) for col, labels in compiled['categories'].items()}
+        self.fill_values = np.ascontiguousarray(compiled['fill_values'], dtype=float)
+        self.means = np.ascontiguousarray(compiled['means'], dtype=float)
+        self.scales = np.ascontiguousarray(compiled['scales'], dtype=float)
+        self._row_params = list(zip(self.fill_values.tolist(), self.means.tolist(), self.scales.tolist()))
+        return self
+
+    def transform_row(self, food_type, temperature, humidity, storage_type, days_stored):
+        if not self.is_fitted:
+            raise ValueError("Preprocessor must be fitted before transform")
+
+        numeric = []
+        for value, (fill_value, mean, scale) in zip((temperature, humidity, days_stored), self._row_params):
+            value = float(value)
+            if value != value:
+                value = fill_value
+            numeric.append((value - mean) / scale)
+
+        food_code = self.category_codes['food_type'].get(str(food_type), 0)
+        storage_code = self.category_codes['storage_type'].get(str(storage_type), 0)
+
+        return food_code, numeric[0], numeric[1], storage_code, numeric[2]
+
     def transform(self, X):
         if not self.is_fitted:
             raise ValueError("Preprocessor must be fitted before transform")
 
         X = X.copy()
-        categorical_cols = ['food_type', 'storage_type']
-        numerical_cols = ['temperature', 'humidity', 'days_stored']
 
-        for col in categorical_cols:
-            if col in X.columns and col in self.label_encoders:
-                X[col] = X[col].astype(str)
-                le = self.label_encoders[col]
-                unseen_mask = ~X[col].isin(le.classes_)
-                if unseen_mask.any():
-                    X.loc[unseen_mask, col] = le.classes_[0]
-                X[col] = le.transform(X[col])
+        for col in self.categorical_cols:
+            if col in X.columns and col in self.category_index:
+                X[col] = self.encode_column(col, X[col].to_numpy())
 
-        X[numerical_cols] = self.imputer.transform(X[numerical_cols])
-        X[numerical_cols] = self.scaler.transform(X[numerical_cols])
+        block = np.array(X[self.numerical_cols].to_numpy(dtype=float), order='C')
+        np.copyto(block, self.fill_values, where=np.isnan(block))
+        block -= self.means
+        block /= self.scales
+        X[self.numerical_cols] = block
 
         return X
 
+    def encode_column(self, col, values):
+        if values.dtype.kind not in 'OUS':
+            values = values.astype(str)
+        codes = self.category_index[col].get_indexer(values)
+        return np.where(codes < 0, 0, codes)
+
     def fit_transform(self, X):
         return self.fit(X).transform(X)
 
+    def get_compiled(self):
+        return {
+            'categories': {col: list(codes.keys()) for col, codes in self.category_codes.items()},
+            'numerical_cols': list(self.numerical_cols),
+            'fill_values': self.fill_values,
+            'means': self.means,
+            'scales': self.scales
+        }
+
     def save(self, filepath):
         joblib.dump({
             'label_encoders': self.label_encoders,
             'scaler': self.scaler,
             'imputer': self.imputer,
             'feature_columns': self.feature_columns,
-            'is_fitted': self.is_fitted
+            'is_fitted': self.is_fitted,
+            'compiled': self.get_compiled() if self.is_fitted else None
         }, filepath)
 
     def load(self, filepath):
@@ -73,6 +125,8 @@ class DataPreprocessor:
         self.imputer = data['imputer']
         self.feature_columns = data['feature_columns']
         self.is_fitted = data['is_fitted']
+        if self.is_fitted:
+            self.compile(data.get('compiled'))
         return self
 
 
@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 
 
 class RuleBasedInterpreter:
@@ -42,6 +43,153 @@ class RuleBasedInterpreter:
             'pantry': {'ideal_temp': 20, 'ideal_humidity': 50}
         }
 
+        self.severity_levels = ['none', 'medium', 'high', 'critical']
+        self.safety_classes = ['Safe', 'Consume Soon', 'Expired']
+
+        self.issue_messages = [
+            'Temperature ({temperature}°C) exceeds danger zone threshold ({danger_zone_temp}°C)',
+            'Temperature ({temperature}°C) above recommended maximum ({max_temp}°C)',
+            'Humidity ({humidity}%) above recommended maximum ({max_humidity}%)',
+            'Refrigerator temperature too high - rapid bacterial growth risk',
+            'Freezer temperature too high - food not properly frozen',
+            'High pantry humidity - mold growth risk'
+        ]
+        self.issue_severity = [3, 2, 2, 3, 2, 1]
+
+        self.recommendation_messages = [
+            'Consume immediately or discard',
+            'Lower refrigerator temperature to 2-4°C',
+            'Reduce humidity to prevent mold growth',
+            'Move to cooler location or refrigerate',
+            'Monitor closely for signs of spoilage'
+        ]
+
+        self.compile_rules()
+
+    def compile_rules(self):
+        self.food_types = list(self.food_rules.keys())
+        self.storage_types = list(self.storage_rules.keys())
+        self.default_food_code = self.food_types.index('dairy')
+        self.default_storage_code = self.storage_types.index('refrigerator')
+
+        self._food_index = pd.Index(self.food_types)
+        self._storage_index = pd.Index(self.storage_types)
+
+        self._max_temp = np.array([self.food_rules[f]['max_temp'] for f in self.food_types], dtype=float)
+        self._max_humidity = np.array([self.food_rules[f]['max_humidity'] for f in self.food_types], dtype=float)
+        self._danger_zone_temp = np.array([self.food_rules[f]['danger_zone_temp'] for f in self.food_types], dtype=float)
+
+        storage_temp_limit = {'refrigerator': (8, 1 << 3), 'freezer': (-5, 1 << 4)}
+        storage_humidity_limit = {'pantry': (70, 1 << 5)}
+        storage_advice_temp_limit = {'refrigerator': (10, 1 << 1), 'pantry': (25, 1 << 3)}
+
+        self._storage_temp_limit, self._storage_temp_bit = self._storage_table(storage_temp_limit)
+        self._storage_humidity_limit, self._storage_humidity_bit = self._storage_table(storage_humidity_limit)
+        self._storage_advice_temp_limit, self._storage_advice_temp_bit = self._storage_table(storage_advice_temp_limit)
+
+        n_issue_masks = 1 << len(self.issue_messages)
+        self._severity_lut = np.zeros(n_issue_masks, dtype=np.int8)
+        for mask in range(n_issue_masks):
+            for bit, severity in enumerate(self.issue_severity):
+                if mask & (1 << bit):
+                    self._severity_lut[mask] = max(self._severity_lut[mask], severity)
+
+        self._adjustment_lut = np.array([1.0, 0.7, 0.5, 0.3])
+
+    def _storage_table(self, limits):
+        limit = np.full(len(self.storage_types), np.inf)
+        bit = np.zeros(len(self.storage_types), dtype=np.uint8)
+        for storage_type, (value, flag) in limits.items():
+            code = self.storage_types.index(storage_type)
+            limit[code] = value
+            bit[code] = flag
+        return limit, bit
+
+    def _encode(self, values, index, default_code):
+        # Values are labels, never codes: like check_extreme_conditions on the
+        # single path, anything that is not a known label gets the default.
+        values = np.asarray(values)
+        if values.dtype.kind not in 'OUS':
+            values = values.astype(str)
+        codes = index.get_indexer(values.ravel()).reshape(values.shape)
+        return np.where(codes >= 0, codes, default_code)
+
+    def encode_food_types(self, food_type):
+        return self._encode(food_type, self._food_index, self.default_food_code)
+
+    def encode_storage_types(self, storage_type):
+        return self._encode(storage_type, self._storage_index, self.default_storage_code)
+
+    def evaluate(self, food_type, storage_type, temperature, humidity, days_stored, predicted_days, safety_basis=None):
+        food_code = self.encode_food_types(food_type)
+        storage_code = self.encode_storage_types(storage_type)
+        temperature = np.asarray(temperature, dtype=float)
+        humidity = np.asarray(humidity, dtype=float)
+        predicted_days = np.asarray(predicted_days, dtype=float)
+
+        temp_danger = temperature > self._danger_zone_temp[food_code]
+        temp_high = ~temp_danger & (temperature > self._max_temp[food_code])
+        humidity_high = humidity > self._max_humidity[food_code]
+
+        issue_mask = (
+            temp_danger * np.uint8(1 << 0) |
+            temp_high * np.uint8(1 << 1) |
+            humidity_high * np.uint8(1 << 2) |
+            (temperature > self._storage_temp_limit[storage_code]) * self._storage_temp_bit[storage_code] |
+            (humidity > self._storage_humidity_limit[storage_code]) * self._storage_humidity_bit[storage_code]
+        ).astype(np.uint8)
+
+        severity_code = self._severity_lut[issue_mask]
+
+        adjustment_factor = self._adjustment_lut[severity_code]
+        adjusted_days = predicted_days * adjustment_factor
+        adjusted_days = np.where(adjusted_days > 0, adjusted_days, 0.0)
+
+        if safety_basis is None:
+            safety_code = self.classify_safety_codes(adjusted_days)
+        else:
+            safety_days = np.asarray(safety_basis, dtype=float) * adjustment_factor
+            safety_code = self.classify_safety_codes(np.where(safety_days > 0, safety_days, 0.0))
+
+        recommendation_mask = (
+            (adjusted_days <= 2) * np.uint8(1 << 0) |
+            (temperature > self._storage_advice_temp_limit[storage_code]) * self._storage_advice_temp_bit[storage_code] |
+            (humidity > 80) * np.uint8(1 << 2) |
+            ((adjusted_days > 0) & (adjusted_days <= 5)) * np.uint8(1 << 4)
+        ).astype(np.uint8)
+
+        return {
+            'food_code': food_code,
+            'storage_code': storage_code,
+            'issue_mask': issue_mask,
+            'severity_code': severity_code,
+            'adjusted_days': adjusted_days,
+            'adjustment_factor': adjustment_factor,
+            'safety_code': safety_code,
+            'recommendation_mask': recommendation_mask
+        }
+
+    def classify_safety_codes(self, remaining_days):
+        remaining_days = np.asarray(remaining_days, dtype=float)
+        return np.select([remaining_days <= 0, remaining_days <= 7], [2, 1], 0).astype(np.int8)
+
+    def render_issues(self, issue_mask, food_code, temperature, humidity):
+        issues = []
+        if not issue_mask:
+            return issues
+
+        rules = self.food_rules[self.food_types[food_code]]
+        for bit, message in enumerate(self.issue_messages):
+            if issue_mask & (1 << bit):
+                issues.append(message.format(temperature=temperature, humidity=humidity, **rules))
+        return issues
+
+    def render_recommendations(self, recommendation_mask):
+        return [
+            message for bit, message in enumerate(self.recommendation_messages)
+            if recommendation_mask & (1 << bit)
+        ]
+
     def get_food_type_label(self, food_type_encoded):
         food_types = ['bakery', 'dairy', 'fruits', 'meat', 'seafood', 'vegetables']
         if food_type_encoded < len(food_types):
@@ -101,7 +249,10 @@ class RuleBasedInterpreter:
 
         return adjusted_days
 
-    def classify_safety(self, remaining_days, days_stored, issues):
+    def classify_safety(self, remaining_days, days_stored, issues, lower_bound=None):
+        if lower_bound is not None:
+            remaining_days = lower_bound
+
         if remaining_days <= 0:
             return 'Expired'
         elif remaining_days <= 2:
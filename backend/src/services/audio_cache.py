@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class AudioCache:
+    def __init__(self, directory='cache/audio', max_memory_bytes=16 * 1024 * 1024,
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_bytes = sum(size for _, size, _ in self._scan())
+
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = {'memory': 0, 'disk': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(payload):
+        # Content addressed: the key covers everything that changes the audio
+        # (text, voice and model settings), so entries never go stale.
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _scan(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.mp3'):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        with self._lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.hits['memory'] += 1
+                self.bytes_saved += len(data)
+                return 'memory', data
+
+        path = self.path(key)
+        data = None
+        try:
+            size = os.path.getsize(path)
+            # The file's mtime is the disk tier's LRU clock; it is shared by
+            # every process using the directory and survives restarts.
+            os.utime(path)
+            # A hit that fits is promoted to the memory tier and returned as
+            # bytes, so it cannot be evicted from under the caller. Larger
+            # files are returned as a path to be sent without copying.
+            if size <= self.max_memory_bytes:
+                with open(path, 'rb') as f:
+                    data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits['disk'] += 1
+            self.bytes_saved += size
+        if data is None:
+            return 'disk', path
+        self._remember(key, data)
+        return 'disk', data
+
+    def writer(self, key):
+        return AudioCacheWriter(self, key)
+
+    def put(self, key, data):
+        writer = self.writer(key)
+        writer.write(data)
+        writer.commit()
+
+        self._remember(key, data)
+
+    def _remember(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self.memory.pop(key, None)
+            if previous is not None:
+                self.memory_bytes -= len(previous)
+            self.memory[key] = data
+            self.memory_bytes += len(data)
+            while self.memory_bytes > self.max_memory_bytes:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= len(evicted)
+                self.evictions['memory'] += 1
+
+    def _added_to_disk(self, size):
+        with self._lock:
+            self.disk_bytes += size
+            evict_disk = self.disk_bytes > self.max_disk_bytes
+        if evict_disk:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Other processes write to the same directory, so the running total
+        # is only an estimate; rescan and trim to 90% of the budget so this
+        # does not run on every write.
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.9
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self.disk_bytes = total
+            self.evictions['disk'] += evicted
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits['memory'] + self.hits['disk']
+            lookups = hits + self.misses
+            return {
+                'hits': dict(self.hits),
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'memory_entries': len(self.memory),
+                'memory_bytes': self.memory_bytes,
+                'max_memory_bytes': self.max_memory_bytes,
+                'disk_bytes': self.disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                'evictions': dict(self.evictions)
+            }
+
+
+class AudioCacheWriter:
+    # Builds an entry incrementally in a temporary file. Nothing is visible
+    # under the key until commit(), so an aborted stream leaves no partial
+    # MP3 behind.
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.path = cache.path(key)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.tmp_path = f"{self.path}.tmp-{os.getpid()}-{id(self)}"
+        self.file = open(self.tmp_path, 'wb')
+        self.size = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        self.cache._added_to_disk(self.size)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
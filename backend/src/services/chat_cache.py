@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+
+class ChatResponseCache:
+    def __init__(self, path='cache/chat.sqlite3', ttl=86400.0, max_entries=10000, max_bytes=32 * 1024 * 1024,
+                 temperature_step=1.0, humidity_step=5.0, days_step=1.0):
+        self.path = path or ':memory:'
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.temperature_step = temperature_step
+        self.humidity_step = humidity_step
+        self.days_step = days_step
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._in_flight_async = {}
+
+        directory = os.path.dirname(self.path) if path else ''
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # As with the prediction cache, one file is shared by every worker
+        # and survives restarts; without a path the table lives in memory.
+        self.conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+
+    @staticmethod
+    def make_key(request_data):
+        # The prompts are built from indented templates, so whitespace is
+        # collapsed before hashing; model, system prompt and sampling
+        # settings are all part of request_data.
+        normalized = dict(request_data)
+        normalized['messages'] = [
+            dict(message, content=re.sub(r'\s+', ' ', message['content']).strip())
+            for message in request_data['messages']
+        ]
+        encoded = json.dumps(normalized, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    @staticmethod
+    def bucket(value, step):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return value
+        if not step:
+            return number
+        return round(round(number / step) * step, 6)
+
+    def get(self, key, record=True):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += record
+                return None
+            self.conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+            self.hits += record
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        value = json.dumps(response)
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, created, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, value, size, now, now)
+            )
+            self.writes += 1
+            if self.writes % 64 == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        cursor = self.conn.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+        self.expired += cursor.rowcount
+
+        count, total = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        excess_entries = max(0, count - self.max_entries)
+        excess_bytes = max(0, total - self.max_bytes)
+        removed = 0
+        freed = 0
+        doomed = []
+        for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY last_used'):
+            if removed >= excess_entries and freed >= excess_bytes:
+                break
+            doomed.append((key,))
+            removed += 1
+            freed += size
+
+        self.conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+        self.evictions += removed
+
+    def get_or_fetch(self, key, fetch):
+        response = self.get(key)
+        if response is not None:
+            return response
+
+        # Single flight: concurrent requests for the same prompt wait for the
+        # first one's upstream call instead of making their own.
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            # The previous leader may have stored it between our lookup and
+            # registering as leader.
+            response = self.get(key, record=False)
+            if response is None:
+                response = fetch()
+                if response.get('success'):
+                    self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    async def _fetch_and_store(self, key, fetch):
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(None, self.get, key, False)
+            if response is None:
+                response = await fetch()
+                if response.get('success'):
+                    await loop.run_in_executor(None, self.put, key, response)
+            return response
+        finally:
+            del self._in_flight_async[key]
+
+    async def get_or_fetch_async(self, key, fetch):
+        response = await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+        if response is not None:
+            return response
+
+        task = self._in_flight_async.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._in_flight_async[key] = task
+        else:
+            with self._lock:
+                self.coalesced += 1
+        # The upstream call runs as its own task, so a caller that gives up
+        # (an explanation deadline) neither cancels it for the others nor
+        # keeps its answer out of the cache.
+        return await asyncio.shield(task)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def stats(self):
+        with self._lock:
+            count, total = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': count,
+                'bytes': total,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'ttl_seconds': self.ttl,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
@@ -1,118 +1,299 @@
-import requests
 import os
+import re
+import json
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from dotenv import load_dotenv
+from src.services.upstream import get_upstream_client
+from src.services.chat_cache import ChatResponseCache
 
 load_dotenv()
 
 
 class OpenRouterChatService:
+    PREDICTION_QUESTIONS = [
+        "What are the main factors affecting this prediction?",
+        "What should I do with this food item?",
+        "How can I extend the shelf life of similar items?"
+    ]
+
     def __init__(self):
         self.api_key = os.getenv('OPENROUTER_API_KEY')
-        self.base_url = 'https://openrouter.ai/api/v1'
+        self.base_url = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
         self.model = 'anthropic/claude-3-haiku'
+        # 'parallel' asks the questions concurrently, 'packed' asks them all in one call.
+        self.explanation_mode = os.getenv('CHAT_EXPLANATION_MODE', 'parallel').lower()
+        self.explanation_deadline = float(os.getenv('CHAT_EXPLANATION_DEADLINE', '15'))
+        self.client = get_upstream_client('openrouter', max_concurrency=256)
+        self._executor = None
+        # Caps questions running or queued on the fan-out threads across all
+        # requests, so a slow upstream cannot pile up work nobody waits for.
+        self._fanout_slots = threading.BoundedSemaphore(int(os.getenv('CHAT_FANOUT_MAX_PENDING', '64')))
+        self.response_cache = None
+
+    def _build_chat_request(self, message, context=None, max_tokens=500):
+        system_prompt = """You are a food safety and storage expert AI assistant. 
+        Help users with questions about food storage, safety, and shelf life predictions.
+        Provide clear, practical advice based on food safety guidelines.
+        Always prioritize safety - when in doubt, recommend discarding food.
+        Keep responses concise and actionable."""
+
+        messages = [
+            {'role': 'system', 'content': system_prompt}
+        ]
+
+        if context:
+            messages.append({
+                'role': 'user',
+                'content': f"Context: {context}\n\nQuestion: {message}"
+            })
+        else:
+            messages.append({
+                'role': 'user',
+                'content': message
+            })
+
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'HTTP-Referer': 'http://localhost:3000',
+            'X-Title': 'Food Shelf Life Predictor'
+        }
+
+        data = {
+            'model': self.model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': 0.7
+        }
 
-    def chat(self, message, context=None):
+        return f'{self.base_url}/chat/completions', headers, data
+
+    def _parse_chat_response(self, status_code, text):
+        if status_code == 200:
+            result = json.loads(text)
+            return {
+                'success': True,
+                'response': result['choices'][0]['message']['content']
+            }
+        else:
+            return {
+                'error': f'API request failed with status {status_code}',
+                'message': text
+            }
+
+    def chat(self, message, context=None, max_tokens=500, timeout=30):
         if not self.api_key:
             return {'error': 'OpenRouter API key not configured'}
 
         try:
-            system_prompt = """You are a food safety and storage expert AI assistant. 
-            Help users with questions about food storage, safety, and shelf life predictions.
-            Provide clear, practical advice based on food safety guidelines.
-            Always prioritize safety - when in doubt, recommend discarding food.
-            Keep responses concise and actionable."""
-
-            messages = [
-                {'role': 'system', 'content': system_prompt}
-            ]
-
-            if context:
-                messages.append({
-                    'role': 'user',
-                    'content': f"Context: {context}\n\nQuestion: {message}"
-                })
-            else:
-                messages.append({
-                    'role': 'user',
-                    'content': message
-                })
+            url, headers, data = self._build_chat_request(message, context, max_tokens)
+            response = self.client.post(url, headers=headers, json=data, timeout=timeout)
+            return self._parse_chat_response(response.status_code, response.text)
 
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json',
-                'HTTP-Referer': 'http://localhost:3000',
-                'X-Title': 'Food Shelf Life Predictor'
-            }
+        except Exception as e:
+            return {'error': str(e)}
 
-            data = {
-                'model': self.model,
-                'messages': messages,
-                'max_tokens': 500,
-                'temperature': 0.7
-            }
+    async def chat_async(self, message, context=None, max_tokens=500, timeout=30):
+        if not self.api_key:
+            return {'error': 'OpenRouter API key not configured'}
 
-            response = requests.post(
-                f'{self.base_url}/chat/completions',
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'response': result['choices'][0]['message']['content']
-                }
-            else:
-                return {
-                    'error': f'API request failed with status {response.status_code}',
-                    'message': response.text
-                }
+        try:
+            url, headers, data = self._build_chat_request(message, context, max_tokens)
+            response = await self.client.post_async(url, headers=headers, json=data, timeout=timeout)
+            return self._parse_chat_response(response.status_code, response.text)
 
         except Exception as e:
             return {'error': str(e)}
 
-    def get_prediction_explanation(self, prediction_result):
-        context = f"""
+    async def close_async(self):
+        await self.client.close_async()
+
+    def _chat_cache_key(self, message, context=None, max_tokens=500):
+        _, _, data = self._build_chat_request(message, context, max_tokens)
+        return ChatResponseCache.make_key(data)
+
+    def cached_chat(self, message, context=None, max_tokens=500, timeout=30):
+        if self.response_cache is None:
+            return self.chat(message, context, max_tokens, timeout)
+
+        return self.response_cache.get_or_fetch(
+            self._chat_cache_key(message, context, max_tokens),
+            lambda: self.chat(message, context, max_tokens, timeout)
+        )
+
+    async def cached_chat_async(self, message, context=None, max_tokens=500, timeout=30):
+        if self.response_cache is None:
+            return await self.chat_async(message, context, max_tokens, timeout)
+
+        return await self.response_cache.get_or_fetch_async(
+            self._chat_cache_key(message, context, max_tokens),
+            lambda: self.chat_async(message, context, max_tokens, timeout)
+        )
+
+    def _bucket(self, value, step_name):
+        # With the cache on, prompts are built from bucketed readings so that
+        # nearby conditions share one answer, the same way the prediction
+        # cache computes on quantized inputs.
+        if self.response_cache is None:
+            return value
+        return self.response_cache.bucket(value, getattr(self.response_cache, step_name))
+
+    def _prediction_context(self, prediction_result):
+        return f"""
         Food Type: {prediction_result['food_type']}
         Storage Type: {prediction_result['storage_type']}
-        Temperature: {prediction_result['temperature']}°C
-        Humidity: {prediction_result['humidity']}%
-        Days Stored: {prediction_result['days_stored']}
-        Predicted Remaining Days: {prediction_result['predicted_remaining_days']}
+        Temperature: {self._bucket(prediction_result['temperature'], 'temperature_step')}°C
+        Humidity: {self._bucket(prediction_result['humidity'], 'humidity_step')}%
+        Days Stored: {self._bucket(prediction_result['days_stored'], 'days_step')}
+        Predicted Remaining Days: {self._bucket(prediction_result['predicted_remaining_days'], 'days_step')}
         Safety Classification: {prediction_result['safety_classification']}
         """
 
-        questions = [
-            "What are the main factors affecting this prediction?",
-            "What should I do with this food item?",
-            "How can I extend the shelf life of similar items?"
-        ]
+    def _packed_question(self):
+        questions = '\n'.join(f"{i}. {question}" for i, question in enumerate(self.PREDICTION_QUESTIONS, 1))
+        return (
+            "Answer each of the following questions about this food item, concisely and in order. "
+            'Reply with only a JSON object of the form {"answers": ["...", "...", "..."]}.\n\n'
+            f"{questions}"
+        )
 
+    def _split_packed_answers(self, text):
+        start, end = text.find('{'), text.rfind('}')
+        if start != -1 and end > start:
+            try:
+                answers = json.loads(text[start:end + 1])
+            except ValueError:
+                answers = None
+            if isinstance(answers, dict) and isinstance(answers.get('answers'), list):
+                return [str(answer).strip() for answer in answers['answers']]
+
+        # Models sometimes ignore the format and reply with a numbered list.
+        parts = re.split(r'(?m)^\s*\d+[.)]\s+', text)
+        return [part.strip() for part in parts[1:]]
+
+    def _collect_explanation(self, responses):
         explanation = []
-        for question in questions:
-            response = self.chat(question, context)
-            if response.get('success'):
+        for question, response in zip(self.PREDICTION_QUESTIONS, responses):
+            if response is not None and response.get('success'):
                 explanation.append({
                     'question': question,
                     'answer': response['response']
                 })
-
         return explanation
 
-    def get_storage_advice(self, food_type, storage_conditions):
+    def _collect_packed_explanation(self, response):
+        if not response.get('success'):
+            return []
+
+        answers = self._split_packed_answers(response['response'])
+        responses = [{'success': True, 'response': answer} if answer else None for answer in answers]
+        return self._collect_explanation(responses)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='chat-fanout')
+        return self._executor
+
+    def _submit_question(self, question, context, deadline_at, max_tokens=500):
+        if not self._fanout_slots.acquire(timeout=max(0.0, deadline_at - time.monotonic())):
+            return None
+        future = self._get_executor().submit(
+            self.cached_chat, question, context, max_tokens=max_tokens, timeout=self._question_timeout()
+        )
+        future.add_done_callback(lambda _: self._fanout_slots.release())
+        return future
+
+    def _question_timeout(self):
+        # With the cache on, a question that misses the deadline is still
+        # worth finishing: its answer is stored and the next request for the
+        # same prediction gets it. It runs for at most this long, in either
+        # mode and on either server.
+        if self.response_cache is None:
+            return self.explanation_deadline
+        return max(self.explanation_deadline, 30)
+
+    def get_prediction_explanation(self, prediction_result):
+        context = self._prediction_context(prediction_result)
+        deadline = self.explanation_deadline
+
+        deadline_at = time.monotonic() + deadline
+
+        if self.explanation_mode == 'packed':
+            # Run on the fan-out pool too, so waiting on another request's
+            # call through the cache cannot hold this one past the deadline.
+            max_tokens = 500 * len(self.PREDICTION_QUESTIONS)
+            future = self._submit_question(self._packed_question(), context, deadline_at, max_tokens)
+            if future is None:
+                return []
+            try:
+                response = future.result(timeout=max(0.0, deadline_at - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                return []
+            return self._collect_packed_explanation(response)
+
+        # Whatever has not answered by the deadline is left out. Questions
+        # still queued are cancelled; running ones finish on their own once
+        # the question timeout expires.
+        futures = [self._submit_question(question, context, deadline_at) for question in self.PREDICTION_QUESTIONS]
+        submitted = [future for future in futures if future is not None]
+        wait(submitted, timeout=max(0.0, deadline_at - time.monotonic()))
+        for future in submitted:
+            future.cancel()
+        return self._collect_explanation([
+            future.result() if future is not None and future.done() and not future.cancelled() else None
+            for future in futures
+        ])
+
+    async def get_prediction_explanation_async(self, prediction_result):
+        context = self._prediction_context(prediction_result)
+        deadline = self.explanation_deadline
+
+        if self.explanation_mode == 'packed':
+            max_tokens = 500 * len(self.PREDICTION_QUESTIONS)
+            task = asyncio.ensure_future(self.cached_chat_async(
+                self._packed_question(), context, max_tokens=max_tokens, timeout=self._question_timeout()
+            ))
+            done, _ = await asyncio.wait([task], timeout=deadline)
+            if not done:
+                task.cancel()
+                return []
+            return self._collect_packed_explanation(task.result())
+
+        tasks = [
+            asyncio.ensure_future(self.cached_chat_async(question, context, timeout=self._question_timeout()))
+            for question in self.PREDICTION_QUESTIONS
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        # Cancelling only gives up this request's wait. With the cache on the
+        # upstream call is a shielded task of its own (get_or_fetch_async),
+        # which keeps running, up to the question timeout, and stores its
+        # answer; without the cache the call is abandoned with the request.
+        for task in pending:
+            task.cancel()
+        return self._collect_explanation([task.result() if task in done else None for task in tasks])
+
+    def _storage_advice_message(self, food_type, storage_conditions):
         message = f"What are the best storage practices for {food_type}?"
 
         context = f"""
         Current storage conditions:
         - Storage type: {storage_conditions.get('storage_type', 'unknown')}
-        - Temperature: {storage_conditions.get('temperature', 'unknown')}°C
-        - Humidity: {storage_conditions.get('humidity', 'unknown')}%
+        - Temperature: {self._bucket(storage_conditions.get('temperature', 'unknown'), 'temperature_step')}°C
+        - Humidity: {self._bucket(storage_conditions.get('humidity', 'unknown'), 'humidity_step')}%
         """
 
-        return self.chat(message, context)
+        return message, context
+
+    def get_storage_advice(self, food_type, storage_conditions):
+        return self.cached_chat(*self._storage_advice_message(food_type, storage_conditions))
+
+    async def get_storage_advice_async(self, food_type, storage_conditions):
+        return await self.cached_chat_async(*self._storage_advice_message(food_type, storage_conditions))
 
     def get_safety_guidelines(self, food_type):
         message = f"What are the key safety guidelines for storing {food_type}? How can I tell if it has gone bad?"
-        return self.chat(message)
+        return self.cached_chat(message)
@@ -0,0 +1,102 @@
+MPEG_VERSIONS = {0: '2.5', 2: '2', 3: '1'}
+
+LAYER3_BITRATES = {
+    '1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    '2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+
+SAMPLE_RATES = {
+    '1': [44100, 48000, 32000],
+    '2': [22050, 24000, 16000],
+    '2.5': [11025, 12000, 8000]
+}
+
+
+def skip_id3(data):
+    # ID3v2 tags put their size in four 7-bit bytes after the 6-byte header.
+    if data[:3] != b'ID3' or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_frame_header(data, offset):
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = MPEG_VERSIONS.get((b1 >> 3) & 0x03)
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version is None or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = LAYER3_BITRATES['1' if version == '1' else '2'][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    channel_mode = b3 >> 6
+    length = (144 if version == '1' else 72) * bitrate // sample_rate + padding
+    return {
+        'version': version,
+        'sample_rate': sample_rate,
+        'channels': 1 if channel_mode == 3 else 2,
+        'length': length
+    }
+
+
+def is_info_frame(data, offset, header):
+    # Encoders put a Xing/Info (or VBRI) frame first, holding the frame count
+    # of the whole file. It is silent, but left in a stitched file it tells
+    # players the wrong duration.
+    if header['version'] == '1':
+        side_info = 17 if header['channels'] == 1 else 32
+    else:
+        side_info = 9 if header['channels'] == 1 else 17
+    tag = data[offset + 4 + side_info:offset + 8 + side_info]
+    return tag in (b'Xing', b'Info') or data[offset + 36:offset + 40] == b'VBRI'
+
+
+def audio_frames(data):
+    offset = skip_id3(data)
+    frames = []
+    stream_format = None
+    while True:
+        header = parse_frame_header(data, offset)
+        if header is None or offset + header['length'] > len(data):
+            # Anything after the last whole frame (an ID3v1 tag, a truncated
+            # frame) is not audio.
+            break
+        frame_format = (header['version'], header['sample_rate'], header['channels'])
+        if stream_format is None:
+            stream_format = frame_format
+            if is_info_frame(data, offset, header):
+                offset += header['length']
+                continue
+        elif frame_format != stream_format:
+            raise ValueError(f"Mixed MP3 formats in one clip: {stream_format} and {frame_format}")
+        frames.append(data[offset:offset + header['length']])
+        offset += header['length']
+
+    if not frames:
+        raise ValueError("No MPEG layer III frames found")
+    return stream_format, frames
+
+
+def concat_mp3(clips):
+    # The first frame of each clip starts with an empty bit reservoir, so
+    # clips with the same sample rate and channel count can be joined frame
+    # by frame without re-encoding.
+    stream_format = None
+    parts = []
+    for clip in clips:
+        clip_format, frames = audio_frames(clip)
+        if stream_format is None:
+            stream_format = clip_format
+        elif clip_format != stream_format:
+            raise ValueError(f"Cannot join MP3 clips with formats {stream_format} and {clip_format}")
+        parts.extend(frames)
+    return b''.join(parts)
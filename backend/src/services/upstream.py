@@ -0,0 +1,386 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from src.inference.batcher import Histogram
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class UpstreamUnavailable(Exception):
+    pass
+
+
+class UpstreamResponse:
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class UpstreamStream:
+    # A 200 response whose body is read as it arrives. It keeps its
+    # connection and concurrency slot until the body is consumed or closed;
+    # its latency is recorded when the headers arrive.
+    def __init__(self, client, raw, status_code, headers, release):
+        self.client = client
+        self.raw = raw
+        self.status_code = status_code
+        self.headers = headers
+        self._release = release
+
+    def iter_chunks(self, chunk_size=16384):
+        try:
+            for chunk in self.raw.iter_content(chunk_size):
+                yield chunk
+        except requests.RequestException as e:
+            self.client._record(type(e).__name__)
+            raise
+        finally:
+            self.close()
+
+    async def iter_chunks_async(self, chunk_size=16384):
+        try:
+            async for chunk in self.raw.content.iter_chunked(chunk_size):
+                yield chunk
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.client._record(type(e).__name__)
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        if self._release is not None:
+            self._release()
+            self._release = None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_started = None
+            # Half open: a single trial request decides whether to close again.
+            # A trial that never reports back is replaced after reset_timeout.
+            if self.state == 'half_open' and (self._trial_started is None
+                                              or now - self._trial_started >= self.reset_timeout):
+                self._trial_started = now
+                return True
+            return False
+
+    def retry_in(self):
+        if self.state != 'open':
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opens += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self._trial_started = None
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opens': self.opens,
+            'retry_in_seconds': round(self.retry_in(), 1)
+        }
+
+
+class UpstreamClient:
+    def __init__(self, name, max_concurrency=64, retries=2, backoff=0.5, max_backoff=8.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.latency_ms = Histogram(32768)
+        self.outcomes = {}
+        self.retried = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+        # All created on first use, so nothing here is shared across a fork
+        # and the aiohttp objects bind to the loop that actually uses them.
+        self._session = None
+        self._semaphore = None
+        self._async_session = None
+        self._async_semaphore = None
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    def _get_semaphore(self):
+        with self._lock:
+            if self._semaphore is None:
+                self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+            return self._semaphore
+
+    def _get_async_session(self):
+        if not HAS_AIOHTTP:
+            raise RuntimeError(f"aiohttp is required for async calls to {self.name}")
+        if self._async_session is None:
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+            )
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._async_session
+
+    def _record(self, outcome, elapsed=None):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        if elapsed is not None:
+            self.latency_ms.observe(elapsed * 1000.0)
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self._record('rejected')
+            raise UpstreamUnavailable(
+                f"{self.name} is unavailable (circuit open, retry in {self.breaker.retry_in():.0f}s)"
+            )
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        # Full jitter keeps many clients from retrying in lockstep.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _finish(self, response, elapsed):
+        status = response.status_code
+        self._record(f"{status // 100}xx", elapsed)
+        # A 429 is the upstream pushing back, so it counts towards opening
+        # the circuit like a server error.
+        if status >= 500 or status == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return status in RETRY_STATUSES
+
+    def _fail(self, error, elapsed):
+        self._record(type(error).__name__, elapsed)
+        self.breaker.record_failure()
+
+    def _release_slot(self, semaphore, close_raw=None):
+        if close_raw is not None:
+            close_raw()
+        with self._lock:
+            self.in_flight -= 1
+        semaphore.release()
+
+    def request(self, method, url, timeout=30, stream=False, **kwargs):
+        # timeout is the budget for the whole call, retries included. Each
+        # attempt gets what is left, so an attempt that times out leaves
+        # nothing to retry with and a POST the upstream may still be working
+        # on (and billing for) is not sent twice.
+        deadline = time.monotonic() + timeout
+        semaphore = self._get_semaphore()
+        for attempt in range(self.retries + 1):
+            self._check_breaker()
+            if not semaphore.acquire(timeout=remaining_time(deadline)):
+                self._record('rejected')
+                raise UpstreamUnavailable(f"Too many concurrent requests to {self.name}")
+
+            with self._lock:
+                self.in_flight += 1
+            start = time.perf_counter()
+            streaming = False
+            error = None
+            try:
+                raw = self._get_session().request(
+                    method, url, timeout=remaining_time(deadline), stream=stream, **kwargs
+                )
+                if stream and raw.status_code == 200:
+                    streaming = True
+                    response = UpstreamStream(self, raw, raw.status_code, raw.headers,
+                                              lambda: self._release_slot(semaphore, raw.close))
+                else:
+                    response = UpstreamResponse(raw.status_code, raw.content, raw.headers)
+            except requests.RequestException as e:
+                self._fail(e, time.perf_counter() - start)
+                error = e
+                response = None
+            finally:
+                if not streaming:
+                    self._release_slot(semaphore)
+
+            if response is not None and not self._finish(response, time.perf_counter() - start):
+                return response
+
+            delay = self._retry_delay(attempt, response)
+            if attempt == self.retries or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return response
+
+            with self._lock:
+                self.retried += 1
+            time.sleep(delay)
+
+    async def request_async(self, method, url, timeout=30, stream=False, **kwargs):
+        deadline = time.monotonic() + timeout
+        session = self._get_async_session()
+        for attempt in range(self.retries + 1):
+            self._check_breaker()
+            try:
+                await asyncio.wait_for(self._async_semaphore.acquire(), remaining_time(deadline))
+            except asyncio.TimeoutError:
+                self._record('rejected')
+                raise UpstreamUnavailable(f"Too many concurrent requests to {self.name}")
+
+            with self._lock:
+                self.in_flight += 1
+            start = time.perf_counter()
+            streaming = False
+            error = None
+            try:
+                raw = await session.request(
+                    method, url, timeout=aiohttp.ClientTimeout(total=remaining_time(deadline)), **kwargs
+                )
+                if stream and raw.status == 200:
+                    streaming = True
+                    semaphore = self._async_semaphore
+                    response = UpstreamStream(self, raw, raw.status, raw.headers,
+                                              lambda: self._release_slot(semaphore, raw.release))
+                else:
+                    try:
+                        response = UpstreamResponse(raw.status, await raw.read(), raw.headers)
+                    finally:
+                        raw.release()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._fail(e, time.perf_counter() - start)
+                error = e
+                response = None
+            finally:
+                if not streaming:
+                    self._release_slot(self._async_semaphore)
+
+            if response is not None and not self._finish(response, time.perf_counter() - start):
+                return response
+
+            delay = self._retry_delay(attempt, response)
+            if attempt == self.retries or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return response
+
+            with self._lock:
+                self.retried += 1
+            await asyncio.sleep(delay)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    async def post_async(self, url, **kwargs):
+        return await self.request_async('POST', url, **kwargs)
+
+    async def close_async(self):
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+            self._async_semaphore = None
+
+    def stats(self):
+        with self._lock:
+            outcomes = dict(self.outcomes)
+        return {
+            'in_flight': self.in_flight,
+            'max_concurrency': self.max_concurrency,
+            'outcomes': outcomes,
+            'retries': self.retried,
+            'circuit': self.breaker.stats(),
+            'latency_ms_histogram': self.latency_ms.snapshot()
+        }
+
+
+def remaining_time(deadline):
+    # Never zero: requests and aiohttp reject a zero timeout, and a call
+    # with nothing left should fail as a timeout rather than a ValueError.
+    return max(deadline - time.monotonic(), 0.001)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_upstream_client(name, max_concurrency=64):
+    # One client per upstream, shared by every service that calls it, so the
+    # pool, the concurrency bound and the breaker all see the same traffic.
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            prefix = name.upper()
+            client = UpstreamClient(
+                name,
+                max_concurrency=int(os.getenv(f'{prefix}_MAX_CONCURRENCY', str(max_concurrency))),
+                retries=int(os.getenv('UPSTREAM_RETRIES', '2')),
+                backoff=float(os.getenv('UPSTREAM_BACKOFF', '0.5')),
+                failure_threshold=int(os.getenv('UPSTREAM_BREAKER_THRESHOLD', '5')),
+                reset_timeout=float(os.getenv('UPSTREAM_BREAKER_RESET', '30'))
+            )
+            _clients[name] = client
+        return client
+
+
+def upstream_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.stats() for client in clients}
@@ -1,80 +1,351 @@
-import requests
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from src.services.upstream import get_upstream_client
+from src.services.audio_cache import AudioCache
+from src.services.mp3 import concat_mp3
 
 load_dotenv()
 
 
+class AudioRelay:
+    # Passes upstream audio on as it arrives and tees it into the cache. The
+    # upstream is only read as fast as the client takes the audio, so at most
+    # one chunk per stream is buffered here. The servers call close() when
+    # the response ends, even if it was never iterated.
+    def __init__(self, stream, writer=None):
+        self.stream = stream
+        self.writer = writer
+
+    def __iter__(self):
+        try:
+            for chunk in self.stream.iter_chunks():
+                if self.writer is not None:
+                    self.writer.write(chunk)
+                yield chunk
+            if self.writer is not None:
+                self.writer.commit()
+                self.writer = None
+        finally:
+            self.close()
+
+    def __aiter__(self):
+        return self._iter_async()
+
+    async def _iter_async(self):
+        try:
+            async for chunk in self.stream.iter_chunks_async():
+                if self.writer is not None:
+                    self.writer.write(chunk)
+                yield chunk
+            if self.writer is not None:
+                # Committing may trigger a disk eviction scan.
+                await asyncio.get_running_loop().run_in_executor(None, self.writer.commit)
+                self.writer = None
+        finally:
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+        self.stream.close()
+
+
 class ElevenLabsVoiceService:
+    SAFETY_SENTENCES = {
+        'Safe': "The food is safe to consume.",
+        'Consume Soon': "You should consume this food soon.",
+        'Expired': "This food has likely expired and should be discarded."
+    }
+
     def __init__(self):
         self.api_key = os.getenv('ELEVENLABS_API_KEY')
-        self.base_url = 'https://api.elevenlabs.io/v1'
+        self.base_url = os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io/v1')
         self.voice_id = '21m00Tcm4TlvDq8ikWAM'
+        self.client = get_upstream_client('elevenlabs', max_concurrency=16)
+        self.audio_cache = None
+        self.segmented = os.getenv('VOICE_SEGMENTED', '').lower() in ('1', 'true', 'yes')
+        self.streaming = os.getenv('VOICE_STREAMING', '').lower() in ('1', 'true', 'yes')
+        self._executor = None
+
+    def _build_tts_request(self, text, voice_id=None, stream=False):
+        url = f'{self.base_url}/text-to-speech/{voice_id or self.voice_id}'
+        if stream:
+            url += '/stream'
+        headers = {
+            'Accept': 'audio/mpeg',
+            'Content-Type': 'application/json',
+            'xi-api-key': self.api_key
+        }
+        data = {
+            'text': text,
+            'model_id': 'eleven_monolingual_v1',
+            'voice_settings': {
+                'stability': 0.5,
+                'similarity_boost': 0.75
+            }
+        }
+        return url, headers, data
+
+    def _parse_tts_response(self, status_code, content):
+        if status_code == 200:
+            return {
+                'success': True,
+                'audio_data': content
+            }
+        else:
+            return {
+                'error': f'API request failed with status {status_code}',
+                'message': content.decode('utf-8', errors='replace')
+            }
 
     def text_to_speech(self, text, voice_id=None):
         if not self.api_key:
             return {'error': 'ElevenLabs API key not configured'}
 
         try:
-            url = f'{self.base_url}/text-to-speech/{voice_id or self.voice_id}'
-            headers = {
-                'Accept': 'audio/mpeg',
-                'Content-Type': 'application/json',
-                'xi-api-key': self.api_key
-            }
-            data = {
-                'text': text,
-                'model_id': 'eleven_monolingual_v1',
-                'voice_settings': {
-                    'stability': 0.5,
-                    'similarity_boost': 0.75
-                }
-            }
+            url, headers, data = self._build_tts_request(text, voice_id)
+            response = self.client.post(url, headers=headers, json=data, timeout=30)
+            return self._parse_tts_response(response.status_code, response.content)
 
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+        except Exception as e:
+            return {'error': str(e)}
 
-            if response.status_code == 200:
-                return {
-                    'success': True,
-                    'audio_data': response.content
-                }
-            else:
-                return {
-                    'error': f'API request failed with status {response.status_code}',
-                    'message': response.text
-                }
+    async def text_to_speech_async(self, text, voice_id=None):
+        if not self.api_key:
+            return {'error': 'ElevenLabs API key not configured'}
+
+        try:
+            url, headers, data = self._build_tts_request(text, voice_id)
+            response = await self.client.post_async(url, headers=headers, json=data, timeout=30)
+            return self._parse_tts_response(response.status_code, response.content)
 
         except Exception as e:
             return {'error': str(e)}
 
+    async def close_async(self):
+        await self.client.close_async()
+
+    def _audio_cache_key(self, text, voice_id=None):
+        _, _, data = self._build_tts_request(text, voice_id)
+        return AudioCache.make_key(dict(data, voice_id=voice_id or self.voice_id))
+
+    def _cached_audio(self, key):
+        hit = self.audio_cache.get(key)
+        if hit is None:
+            return None
+
+        tier, value = hit
+        result = {'success': True, 'cache': tier, 'cache_key': key}
+        # Files too large for the memory tier come back as a path, so they
+        # can be sent without reading them into Python.
+        result['audio_path' if isinstance(value, str) else 'audio_data'] = value
+        return result
+
+    async def _cached_audio_async(self, key):
+        # A disk hit stats and touches the file, so the lookup runs off the
+        # event loop.
+        return await asyncio.get_running_loop().run_in_executor(None, self._cached_audio, key)
+
+    def cached_text_to_speech(self, text, voice_id=None):
+        if self.audio_cache is None:
+            return self.text_to_speech(text, voice_id)
+
+        key = self._audio_cache_key(text, voice_id)
+        cached = self._cached_audio(key)
+        if cached is not None:
+            return cached
+
+        result = self.text_to_speech(text, voice_id)
+        if result.get('success'):
+            self.audio_cache.put(key, result['audio_data'])
+            result.update(cache='miss', cache_key=key)
+        return result
+
+    async def cached_text_to_speech_async(self, text, voice_id=None):
+        if self.audio_cache is None:
+            return await self.text_to_speech_async(text, voice_id)
+
+        key = self._audio_cache_key(text, voice_id)
+        cached = await self._cached_audio_async(key)
+        if cached is not None:
+            return cached
+
+        result = await self.text_to_speech_async(text, voice_id)
+        if result.get('success'):
+            await asyncio.get_running_loop().run_in_executor(None, self.audio_cache.put, key, result['audio_data'])
+            result.update(cache='miss', cache_key=key)
+        return result
+
+    def _open_stream_result(self, stream, key):
+        if stream.status_code != 200:
+            return self._parse_tts_response(stream.status_code, stream.content)
+
+        writer = self.audio_cache.writer(key) if key is not None else None
+        result = {'success': True, 'audio_stream': AudioRelay(stream, writer)}
+        if key is not None:
+            result.update(cache='miss', cache_key=key)
+        return result
+
+    def stream_text_to_speech(self, text, voice_id=None):
+        if not self.api_key:
+            return {'error': 'ElevenLabs API key not configured'}
+
+        key = None
+        if self.audio_cache is not None:
+            key = self._audio_cache_key(text, voice_id)
+            cached = self._cached_audio(key)
+            if cached is not None:
+                return cached
+
+        try:
+            url, headers, data = self._build_tts_request(text, voice_id, stream=True)
+            stream = self.client.post(url, headers=headers, json=data, timeout=30, stream=True)
+            return self._open_stream_result(stream, key)
+
+        except Exception as e:
+            return {'error': str(e)}
+
+    async def stream_text_to_speech_async(self, text, voice_id=None):
+        if not self.api_key:
+            return {'error': 'ElevenLabs API key not configured'}
+
+        key = None
+        if self.audio_cache is not None:
+            key = self._audio_cache_key(text, voice_id)
+            cached = await self._cached_audio_async(key)
+            if cached is not None:
+                return cached
+
+        try:
+            url, headers, data = self._build_tts_request(text, voice_id, stream=True)
+            stream = await self.client.post_async(url, headers=headers, json=data, timeout=30, stream=True)
+            # Opening the cache's temporary file touches the disk too.
+            return await asyncio.get_running_loop().run_in_executor(None, self._open_stream_result, stream, key)
+
+        except Exception as e:
+            return {'error': str(e)}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='tts-segments')
+        return self._executor
+
+    def _read_audio(self, result):
+        if 'audio_data' in result:
+            return result['audio_data']
+        with open(result['audio_path'], 'rb') as f:
+            return f.read()
+
+    def _stitched_cache_key(self, segments, voice_id=None):
+        return AudioCache.make_key({'stitched': [self._audio_cache_key(segment, voice_id) for segment in segments]})
+
+    def _stitch(self, key, results):
+        errors = [result for result in results if not result.get('success')]
+        if errors:
+            return errors[0]
+
+        audio_data = concat_mp3([self._read_audio(result) for result in results])
+        self.audio_cache.put(key, audio_data)
+        return {
+            'success': True,
+            'audio_data': audio_data,
+            'cache': 'stitched',
+            'cache_key': key,
+            'segment_misses': sum(result.get('cache') == 'miss' for result in results),
+            'segments': len(results)
+        }
+
+    def segmented_text_to_speech(self, segments, voice_id=None):
+        # Each phrase is synthesized and cached on its own, so the template
+        # phrases shared by every explanation are paid for once and only the
+        # sentence with the readings goes to the upstream.
+        key = self._stitched_cache_key(segments, voice_id)
+        cached = self._cached_audio(key)
+        if cached is not None:
+            return cached
+
+        results = list(self._get_executor().map(
+            lambda segment: self.cached_text_to_speech(segment, voice_id), segments
+        ))
+        try:
+            return self._stitch(key, results)
+        except (ValueError, OSError) as e:
+            print(f"Could not stitch explanation audio, synthesizing it whole: {e}")
+            return self.cached_text_to_speech(' '.join(segments), voice_id)
+
+    async def segmented_text_to_speech_async(self, segments, voice_id=None):
+        key = self._stitched_cache_key(segments, voice_id)
+        cached = await self._cached_audio_async(key)
+        if cached is not None:
+            return cached
+
+        results = await asyncio.gather(*[
+            self.cached_text_to_speech_async(segment, voice_id) for segment in segments
+        ])
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, self._stitch, key, results)
+        except (ValueError, OSError) as e:
+            print(f"Could not stitch explanation audio, synthesizing it whole: {e}")
+            return await self.cached_text_to_speech_async(' '.join(segments), voice_id)
+
     def generate_explanation_audio(self, prediction_result):
-        explanation_text = self._format_explanation(prediction_result)
-        return self.text_to_speech(explanation_text)
+        segments = self._explanation_segments(prediction_result)
+        if self.segmented and self.audio_cache is not None:
+            return self.segmented_text_to_speech(segments)
+        if self.streaming:
+            return self.stream_text_to_speech(' '.join(segments))
+        return self.cached_text_to_speech(' '.join(segments))
 
-    def _format_explanation(self, result):
-        text = f"For your {result['food_type']} stored in the {result['storage_type']}, "
-        text += f"at {result['temperature']} degrees Celsius and {result['humidity']} percent humidity, "
-        text += f"after {result['days_stored']} days, "
-        text += f"the predicted remaining shelf life is {result['predicted_remaining_days']} days. "
-
-        if result['safety_classification'] == 'Safe':
-            text += "The food is safe to consume. "
-        elif result['safety_classification'] == 'Consume Soon':
-            text += "You should consume this food soon. "
-        else:
-            text += "This food has likely expired and should be discarded. "
+    async def generate_explanation_audio_async(self, prediction_result):
+        segments = self._explanation_segments(prediction_result)
+        if self.segmented and self.audio_cache is not None:
+            return await self.segmented_text_to_speech_async(segments)
+        if self.streaming:
+            return await self.stream_text_to_speech_async(' '.join(segments))
+        return await self.cached_text_to_speech_async(' '.join(segments))
+
+    def _explanation_segments(self, result):
+        # Everything except the second segment comes from a small fixed set
+        # of phrases; see explanation_phrases.
+        segments = [
+            f"For your {result['food_type']} stored in the {result['storage_type']},",
+            f"at {result['temperature']} degrees Celsius and {result['humidity']} percent humidity, "
+            f"after {result['days_stored']} days, "
+            f"the predicted remaining shelf life is {result['predicted_remaining_days']} days.",
+            self.SAFETY_SENTENCES.get(result['safety_classification'], self.SAFETY_SENTENCES['Expired'])
+        ]
 
         if result['issues']:
-            text += f"I've detected {len(result['issues'])} issues: "
+            segments.append(f"I've detected {len(result['issues'])} issues:")
             for issue in result['issues'][:2]:
-                text += f"{issue}. "
+                segments.append(f"{issue}.")
 
         if result['recommendations']:
-            text += "My recommendations are: "
+            segments.append("My recommendations are:")
             for rec in result['recommendations'][:2]:
-                text += f"{rec}. "
+                segments.append(f"{rec}.")
+
+        return segments
+
+    def _format_explanation(self, result):
+        return ' '.join(self._explanation_segments(result))
 
-        return text
+    def explanation_phrases(self, interpreter):
+        phrases = [
+            f"For your {food_type} stored in the {storage_type},"
+            for food_type in interpreter.food_types
+            for storage_type in interpreter.storage_types
+        ]
+        phrases.extend(self.SAFETY_SENTENCES.values())
+        phrases.extend(f"I've detected {n} issues:" for n in range(1, len(interpreter.issue_messages) + 1))
+        # Issues that quote the reading are synthesized with the explanation.
+        phrases.extend(f"{issue}." for issue in interpreter.issue_messages if '{' not in issue)
+        phrases.append("My recommendations are:")
+        phrases.extend(f"{rec}." for rec in interpreter.recommendation_messages)
+        return phrases
 
     def get_available_voices(self):
         if not self.api_key:
@@ -86,7 +357,7 @@ class ElevenLabsVoiceService:
                 'xi-api-key': self.api_key
             }
 
-            response = requests.get(url, headers=headers)
+            response = self.client.get(url, headers=headers)
 
             if response.status_code == 200:
                 return {'voices': response.json().get('voices', [])}
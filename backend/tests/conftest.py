@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from src.preprocessing.preprocessor import DataPreprocessor
+from src.feature_engineering.engineer import FeatureEngineer
+from src.models.predictor import ShelfLifePredictor
+from src.rules.interpreter import RuleBasedInterpreter
+from src.inference.pipeline import InferencePipeline
+from src.models.bundle import save_model_bundle, BUNDLE_DIRNAME
+
+
+@pytest.fixture(scope='session')
+def training_data():
+    df = pd.read_csv(os.path.join(BACKEND_DIR, 'data', 'food_shelf_life.csv'))
+    return df.drop('remaining_shelf_life', axis=1), df['remaining_shelf_life']
+
+
+@pytest.fixture(scope='session')
+def pipeline(training_data):
+    X, y = training_data
+    preprocessor = DataPreprocessor()
+    feature_engineer = FeatureEngineer()
+    X_featured = feature_engineer.transform(preprocessor.fit_transform(X.copy()))
+    predictor = ShelfLifePredictor(n_estimators=20, max_depth=6).train(X_featured, y)
+    return InferencePipeline(preprocessor, feature_engineer, predictor, RuleBasedInterpreter(), model_version='test')
+
+
+@pytest.fixture(scope='session')
+def models_dir(pipeline, training_data, tmp_path_factory):
+    directory = tmp_path_factory.mktemp('models')
+    save_model_bundle(
+        pipeline.model, pipeline.preprocessor, pipeline.model.get_feature_columns(),
+        directory=os.path.join(directory, BUNDLE_DIRNAME)
+    )
+    return str(directory)
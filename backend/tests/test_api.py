@@ -0,0 +1,43 @@
+import pytest
+
+import api
+from src.inference.pipeline import InferencePipeline
+
+ITEM = {'food_type': 'meat', 'temperature': 5.0, 'humidity': 60.0, 'storage_type': 'refrigerator', 'days_stored': 2.0}
+
+
+class SwappingPipeline(InferencePipeline):
+    # Simulates a hot reload landing while the request is being served.
+    def model_output(self, *args, **kwargs):
+        api.set_pipeline(self.reloaded)
+        return super().model_output(*args, **kwargs)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, 'prediction_cache', None)
+    monkeypatch.setattr(api, 'micro_batcher', None)
+    return api.app.test_client()
+
+
+def test_explain_uses_one_pipeline_across_a_reload(pipeline, client, monkeypatch):
+    reloaded = InferencePipeline(
+        pipeline.preprocessor, pipeline.feature_engineer, pipeline.model, pipeline.rule_interpreter,
+        model_version='reloaded'
+    )
+    reloaded.explain_prediction = lambda result: pytest.fail('explained with the reloaded pipeline')
+    reloaded.explain_contributions = lambda **row: pytest.fail('contributions from the reloaded pipeline')
+
+    active = SwappingPipeline(
+        pipeline.preprocessor, pipeline.feature_engineer, pipeline.model, pipeline.rule_interpreter,
+        model_version='active'
+    )
+    active.reloaded = reloaded
+    monkeypatch.setattr(api, 'pipeline', active)
+
+    response = client.post('/explain', json=ITEM)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['result']['predicted_remaining_days'] == pipeline.predict_single(**ITEM)['predicted_remaining_days']
+    assert 'Predicted Remaining Shelf Life' in body['explanation']
+    assert api.pipeline is reloaded
@@ -0,0 +1,137 @@
+import asyncio
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import api
+import async_api
+from src.services.audio_cache import AudioCache
+
+ITEM = {'food_type': 'meat', 'temperature': 5.0, 'humidity': 60.0, 'storage_type': 'refrigerator', 'days_stored': 2.0}
+
+
+def clip(key, size=100):
+    return key.encode() * (size // len(key))
+
+
+def test_put_fills_both_tiers(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_bytes=1000, max_disk_bytes=10000)
+    cache.put('aa11', clip('aa11'))
+
+    assert cache.get('aa11') == ('memory', clip('aa11'))
+    with open(cache.path('aa11'), 'rb') as f:
+        assert f.read() == clip('aa11')
+    assert cache.stats()['disk_bytes'] == 100
+
+
+def test_disk_hit_is_promoted_to_memory(tmp_path):
+    AudioCache(str(tmp_path)).put('aa11', clip('aa11'))
+    restarted = AudioCache(str(tmp_path))
+
+    assert restarted.get('aa11') == ('disk', clip('aa11'))
+    assert restarted.get('aa11') == ('memory', clip('aa11'))
+    stats = restarted.stats()
+    assert stats['hits'] == {'memory': 1, 'disk': 1}
+    assert stats['memory_bytes'] == 100
+    assert stats['bytes_saved'] == 200
+
+
+def test_clips_larger_than_the_memory_tier_are_returned_as_a_path(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_bytes=50)
+    cache.put('aa11', clip('aa11'))
+
+    assert cache.get('aa11') == ('disk', cache.path('aa11'))
+    assert cache.stats()['memory_entries'] == 0
+
+
+def test_memory_tier_evicts_the_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_bytes=250)
+    cache.put('aa11', clip('aa11'))
+    cache.put('bb22', clip('bb22'))
+    cache.get('aa11')
+    cache.put('cc33', clip('cc33'))
+
+    assert list(cache.memory) == ['aa11', 'cc33']
+    assert cache.stats()['evictions']['memory'] == 1
+    # Still on disk, and promoted again on the next hit.
+    assert cache.get('bb22') == ('disk', clip('bb22'))
+
+
+def test_disk_budget_evicts_the_least_recently_used_files(tmp_path):
+    # No memory tier, so every hit touches the file.
+    cache = AudioCache(str(tmp_path), max_memory_bytes=0, max_disk_bytes=1000)
+    for age, key in enumerate(['aa11', 'bb22', 'cc33']):
+        cache.put(key, clip(key, 300))
+        os.utime(cache.path(key), (1000 + age, 1000 + age))
+    assert cache.get('aa11') is not None
+
+    cache.put('dd44', clip('dd44', 300))
+
+    assert [os.path.exists(cache.path(key)) for key in ['aa11', 'bb22', 'cc33', 'dd44']] == [True, False, True, True]
+    stats = cache.stats()
+    assert stats['disk_bytes'] == 900
+    assert stats['evictions']['disk'] == 1
+    assert cache.get('bb22') is None
+    assert cache.stats()['misses'] == 1
+
+
+class EvictedFirstVoice:
+    # The first lookup hits a disk entry that is gone by the time it is sent.
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def generate_explanation_audio(self, result):
+        self.calls += 1
+        if self.calls == 1:
+            return {'success': True, 'cache': 'disk', 'cache_key': 'aa11', 'audio_path': self.path}
+        return {'success': True, 'cache': 'miss', 'cache_key': 'aa11', 'audio_data': b'fresh audio'}
+
+    async def generate_explanation_audio_async(self, result):
+        return self.generate_explanation_audio(result)
+
+
+@pytest.fixture
+def evicted_voice(pipeline, tmp_path, monkeypatch):
+    voice = EvictedFirstVoice(str(tmp_path / 'aa' / 'aa11.mp3'))
+    monkeypatch.setattr(api, 'pipeline', pipeline)
+    monkeypatch.setattr(api, 'prediction_cache', None)
+    monkeypatch.setattr(api, 'micro_batcher', None)
+    monkeypatch.setattr(api, 'voice_service', voice)
+    return voice
+
+
+def test_evicted_file_is_synthesized_again(evicted_voice):
+    response = api.app.test_client().post('/voice/explain', json=ITEM)
+
+    assert response.status_code == 200
+    assert response.data == b'fresh audio'
+    assert evicted_voice.calls == 2
+
+
+def async_explain():
+    app = web.Application()
+    app.router.add_post('/voice/explain', async_api.voice_explain)
+
+    async def explain():
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post('/voice/explain', json=ITEM)
+            return response.status, response.content_length, await response.read()
+
+    return asyncio.run(explain())
+
+
+def test_async_evicted_file_is_synthesized_again(evicted_voice):
+    assert async_explain() == (200, len(b'fresh audio'), b'fresh audio')
+    assert evicted_voice.calls == 2
+
+
+def test_async_serves_large_clips_from_the_file(evicted_voice):
+    os.makedirs(os.path.dirname(evicted_voice.path))
+    with open(evicted_voice.path, 'wb') as f:
+        f.write(clip('aa11', 4000))
+
+    assert async_explain() == (200, 4000, clip('aa11', 4000))
+    assert evicted_voice.calls == 1
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from src.inference.batcher import MicroBatcher
+from src.inference.pipeline import InferencePipeline
+
+ITEM = {'food_type': 'dairy', 'temperature': 4.0, 'humidity': 60.0, 'storage_type': 'refrigerator', 'days_stored': 2.0}
+
+
+class OffsetModel:
+    def __init__(self, model, offset):
+        self.model = model
+        self.offset = offset
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def predict(self, X):
+        return self.model.predict(X) + self.offset
+
+
+def test_rows_are_computed_by_the_pipeline_they_were_submitted_with(pipeline):
+    reloaded = InferencePipeline(
+        pipeline.preprocessor, pipeline.feature_engineer, OffsetModel(pipeline.model, 100.0),
+        pipeline.rule_interpreter, model_version='reloaded'
+    )
+    current = [reloaded]
+    batcher = MicroBatcher(lambda: current[0], max_batch_size=8, max_wait_ms=50.0).start()
+    try:
+        results = {}
+
+        def submit(name, active):
+            results[name] = batcher.submit(ITEM, active)
+
+        threads = [
+            threading.Thread(target=submit, args=(name, active))
+            for name, active in [('old', pipeline), ('new', reloaded), ('old2', pipeline)]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected = pipeline.model_output(**ITEM)['pred']
+        assert results['old']['pred'] == pytest.approx(expected)
+        assert results['old2']['pred'] == pytest.approx(expected)
+        assert results['new']['pred'] == pytest.approx(expected + 100.0)
+        assert batcher.submit(ITEM)['pred'] == pytest.approx(expected + 100.0)
+    finally:
+        batcher.stop()
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pytest
+
+from src.models.bundle import (
+    load_model_bundle, BUNDLE_DIRNAME, LEGACY_MODEL_FILENAME, LEGACY_PREPROCESSOR_FILENAME
+)
+
+
+@pytest.fixture
+def featured(pipeline, training_data):
+    X, _ = training_data
+    X_featured = pipeline.feature_engineer.transform(pipeline.preprocessor.transform(X.head(50).copy()))
+    return X_featured[pipeline.model.get_feature_columns()]
+
+
+def write_legacy(pipeline, directory):
+    # Older training scripts dumped the bare estimator next to the preprocessor.
+    joblib.dump(pipeline.model.model, os.path.join(directory, LEGACY_MODEL_FILENAME))
+    pipeline.preprocessor.save(os.path.join(directory, LEGACY_PREPROCESSOR_FILENAME))
+
+
+def copy_bundle(models_dir, tmp_path):
+    directory = tmp_path / 'models'
+    shutil.copytree(models_dir, directory)
+    return str(directory)
+
+
+def test_legacy_estimator_is_upgraded_to_a_bundle(pipeline, featured, tmp_path):
+    write_legacy(pipeline, tmp_path)
+
+    bundle = load_model_bundle(str(tmp_path))
+    manifest_path = os.path.join(tmp_path, BUNDLE_DIRNAME, 'manifest.json')
+    assert os.path.exists(manifest_path)
+    with open(manifest_path) as f:
+        assert json.load(f)['model_version'] == bundle.version
+    assert bundle.feature_columns == pipeline.model.get_feature_columns()
+    np.testing.assert_allclose(bundle.predictor.predict(featured), pipeline.model.predict(featured))
+
+    # The next load reads the bundle instead of upgrading again.
+    assert load_model_bundle(str(tmp_path)).version == bundle.version
+
+
+def test_bundle_loads_the_compiled_arrays_first(models_dir, pipeline, featured, tmp_path):
+    directory = copy_bundle(models_dir, tmp_path)
+
+    bundle = load_model_bundle(directory)
+    assert bundle.predictor.model is None
+    assert bundle.predictor.compiled is not None
+    np.testing.assert_allclose(bundle.predictor.predict(featured), pipeline.model.predict(featured))
+
+
+def test_checksum_mismatch_falls_back_to_the_pickle(models_dir, pipeline, featured, tmp_path):
+    directory = copy_bundle(models_dir, tmp_path)
+    compiled_dir = os.path.join(directory, BUNDLE_DIRNAME, 'estimator.compiled')
+    with open(os.path.join(compiled_dir, 'manifest.json')) as f:
+        threshold_file = json.load(f)['arrays']['threshold']['file']
+    with open(os.path.join(compiled_dir, threshold_file), 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    bundle = load_model_bundle(directory)
+    assert bundle.predictor.model is not None
+    np.testing.assert_allclose(bundle.predictor.predict(featured), pipeline.model.predict(featured))
+
+
+def test_broken_bundle_falls_back_to_the_legacy_model(models_dir, pipeline, featured, tmp_path):
+    directory = copy_bundle(models_dir, tmp_path)
+    write_legacy(pipeline, directory)
+    manifest_path = os.path.join(directory, BUNDLE_DIRNAME, 'manifest.json')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['format_version'] = 999
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    # Keep the manifest newer, so the bundle is tried before the legacy pickle.
+    os.utime(os.path.join(directory, LEGACY_MODEL_FILENAME), (0, 0))
+
+    bundle = load_model_bundle(directory)
+    assert bundle.manifest['format_version'] != 999
+    assert bundle.manifest['source'] is not None
+    np.testing.assert_allclose(bundle.predictor.predict(featured), pipeline.model.predict(featured))
+
+
+def test_legacy_model_newer_than_the_bundle_wins(models_dir, pipeline, tmp_path):
+    directory = copy_bundle(models_dir, tmp_path)
+    assert load_model_bundle(directory).manifest['source'] is None
+    write_legacy(pipeline, directory)
+    os.utime(os.path.join(directory, BUNDLE_DIRNAME, 'manifest.json'), (0, 0))
+
+    bundle = load_model_bundle(directory)
+    assert bundle.manifest['source'] is not None
+
+
+def test_missing_model_raises(tmp_path):
+    with pytest.raises(ValueError, match='no model bundle or legacy model'):
+        load_model_bundle(str(tmp_path))
@@ -0,0 +1,58 @@
+import pytest
+
+from src.inference.cache import PredictionCache
+
+# 4.2°C is above the seafood maximum of 4°C, but rounds to 4.0 in the key.
+ITEM = {'food_type': 'seafood', 'temperature': 4.2, 'humidity': 60.0, 'storage_type': 'refrigerator', 'days_stored': 1.0}
+
+
+def cached_prediction(cache, pipeline, item):
+    output = cache.get_or_compute(item, pipeline.model_version, lambda row: pipeline.model_output(**row))
+    return pipeline.finish_single(**item, **output)
+
+
+def test_rules_run_on_the_exact_readings(pipeline):
+    cache = PredictionCache(temperature_step=0.5)
+    exact = pipeline.predict_single(**ITEM)
+    assert exact['issues']
+
+    cold = dict(ITEM, temperature=3.9)
+    assert not cached_prediction(cache, pipeline, cold)['issues']
+    result = cached_prediction(cache, pipeline, ITEM)
+    assert cache.hits == 1
+
+    assert result['temperature'] == 4.2
+    assert result['issues'] == exact['issues']
+    assert result['severity'] == exact['severity']
+    assert result['safety_classification'] == exact['safety_classification']
+
+
+def test_memory_backend_returns_copies():
+    cache = PredictionCache()
+    compute = lambda row: {'pred': 5.0, 'interval': [4.0, 6.0, 0.5]}
+    first = cache.get_or_compute(ITEM, 'v1', compute)
+    first['interval'].append('mutated')
+    second = cache.get_or_compute(ITEM, 'v1', compute)
+    second['pred'] = 0.0
+    assert cache.get_or_compute(ITEM, 'v1', compute) == {'pred': 5.0, 'interval': [4.0, 6.0, 0.5]}
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_version_change_keeps_other_versions(backend, tmp_path):
+    path = str(tmp_path / 'predictions.sqlite3')
+    old_worker = PredictionCache(backend=backend, path=path)
+    new_worker = PredictionCache(backend=backend, path=path) if backend == 'sqlite' else old_worker
+    calls = []
+
+    def compute(version):
+        def run(row):
+            calls.append(version)
+            return {'pred': float(len(calls))}
+        return run
+
+    old_worker.get_or_compute(ITEM, 'v1', compute('v1'))
+    new_worker.get_or_compute(ITEM, 'v2', compute('v2'))
+    old_worker.get_or_compute(ITEM, 'v1', compute('v1'))
+    new_worker.get_or_compute(ITEM, 'v2', compute('v2'))
+    assert calls == ['v1', 'v2']
+    assert old_worker.get_or_compute(ITEM, 'v1', compute('v1')) == {'pred': 1.0}
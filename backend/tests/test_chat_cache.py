@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.services import chat_cache
+from src.services.chat_cache import ChatResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(chat_cache, 'time', clock)
+    return clock
+
+
+class CountingUpstream:
+    # Stands in for the OpenRouter call: counts calls, and holds each one
+    # long enough for concurrent requests to pile up behind it.
+    def __init__(self, delay=0.2, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def fetch(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {'success': True, 'response': f"answer {self.calls}"}
+
+    async def fetch_async(self):
+        with self.lock:
+            self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {'success': True, 'response': f"answer {self.calls}"}
+
+
+def answer(i):
+    return {'success': True, 'response': f"answer {i}"}
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ChatResponseCache(str(tmp_path / 'chat.sqlite3'), ttl=10)
+    cache.put('k', answer(1))
+
+    clock.now += 9
+    assert cache.get('k') == answer(1)
+    clock.now += 2
+    assert cache.get('k') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expired'], stats['entries']) == (1, 1, 1, 0)
+
+
+def test_entries_survive_a_restart(tmp_path):
+    ChatResponseCache(str(tmp_path / 'chat.sqlite3')).put('k', answer(1))
+    assert ChatResponseCache(str(tmp_path / 'chat.sqlite3')).get('k') == answer(1)
+
+
+def test_least_recently_used_entries_are_evicted_beyond_max_entries(clock):
+    cache = ChatResponseCache(None, max_entries=10)
+    for i in range(63):
+        clock.now += 1
+        cache.put(f"k{i}", answer(i))
+    clock.now += 1
+    assert cache.get('k0') == answer(0)
+
+    # Eviction runs every 64 writes.
+    clock.now += 1
+    cache.put('k63', answer(63))
+
+    assert cache.stats()['entries'] == 10
+    assert cache.stats()['evictions'] == 54
+    kept = [i for i in range(64) if cache.get(f"k{i}", record=False) is not None]
+    assert kept == [0] + list(range(55, 64))
+
+
+def test_least_recently_used_entries_are_evicted_beyond_max_bytes(clock):
+    size = len('k00') + len(chat_cache.json.dumps(answer(10)))
+    cache = ChatResponseCache(None, max_bytes=size * 5)
+    for i in range(10, 74):
+        clock.now += 1
+        cache.put(f"k{i}", answer(i))
+
+    stats = cache.stats()
+    assert stats['entries'] == 5
+    assert stats['bytes'] <= size * 5
+    assert [i for i in range(10, 74) if cache.get(f"k{i}", record=False) is not None] == list(range(69, 74))
+
+
+def test_oversized_responses_are_not_stored():
+    cache = ChatResponseCache(None, max_bytes=50)
+    cache.put('k', {'success': True, 'response': 'x' * 100})
+    assert cache.get('k') is None
+
+
+def test_concurrent_identical_prompts_make_one_upstream_call():
+    cache = ChatResponseCache(None)
+    upstream = CountingUpstream()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_fetch('k', upstream.fetch)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.calls == 1
+    assert results == [answer(1)] * 8
+    assert cache.stats()['coalesced'] + cache.stats()['hits'] == 7
+    assert cache.get_or_fetch('k', upstream.fetch) == answer(1)
+    assert upstream.calls == 1
+
+
+def test_leader_failure_reaches_every_waiter():
+    cache = ChatResponseCache(None)
+    upstream = CountingUpstream(error=RuntimeError('upstream down'))
+    errors = []
+
+    def ask():
+        try:
+            cache.get_or_fetch('k', upstream.fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.calls == 1
+    assert errors == ['upstream down'] * 8
+    assert cache._in_flight == {}
+
+    upstream.error = None
+    assert cache.get_or_fetch('k', upstream.fetch) == answer(2)
+
+
+def test_failed_answers_are_not_cached():
+    cache = ChatResponseCache(None)
+    assert cache.get_or_fetch('k', lambda: {'error': 'rate limited'}) == {'error': 'rate limited'}
+    assert cache.get_or_fetch('k', lambda: answer(1)) == answer(1)
+
+
+def test_async_concurrent_identical_prompts_make_one_upstream_call():
+    cache = ChatResponseCache(None)
+    upstream = CountingUpstream()
+
+    async def ask():
+        return await asyncio.gather(*[cache.get_or_fetch_async('k', upstream.fetch_async) for _ in range(8)])
+
+    assert asyncio.run(ask()) == [answer(1)] * 8
+    assert upstream.calls == 1
+    assert cache.stats()['coalesced'] == 7
+    assert cache.get('k') == answer(1)
+
+
+def test_async_leader_failure_reaches_every_waiter():
+    cache = ChatResponseCache(None)
+    upstream = CountingUpstream(error=RuntimeError('upstream down'))
+
+    async def ask():
+        return await asyncio.gather(
+            *[cache.get_or_fetch_async('k', upstream.fetch_async) for _ in range(8)], return_exceptions=True
+        )
+
+    results = asyncio.run(ask())
+    assert upstream.calls == 1
+    assert [str(result) for result in results] == ['upstream down'] * 8
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache._in_flight_async == {}
+    assert cache.get('k') is None
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services.chat_service import OpenRouterChatService
+from src.services.chat_cache import ChatResponseCache
+from src.services.upstream import UpstreamClient
+
+PREDICTION = {
+    'food_type': 'dairy', 'storage_type': 'refrigerator', 'temperature': 4.0, 'humidity': 60.0,
+    'days_stored': 2.0, 'predicted_remaining_days': 5.0, 'safety_classification': 'Consume Soon'
+}
+
+
+class FakeOpenRouter(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        question = body['messages'][-1]['content']
+        self.server.calls.append(question)
+        delay = self.server.delay(question)
+        if delay:
+            time.sleep(delay)
+
+        payload = json.dumps({'choices': [{'message': {'content': f"answer after {delay}s"}}]}).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOpenRouter)
+    server.daemon_threads = True
+    server.calls = []
+    server.delay = lambda question: 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def service(upstream):
+    service = OpenRouterChatService()
+    service.api_key = 'test'
+    service.base_url = f"http://127.0.0.1:{upstream.server_address[1]}/v1"
+    # Its own client, so the timeouts of one test do not trip the circuit
+    # breaker of the shared one for the next.
+    service.client = UpstreamClient('openrouter')
+    service.explanation_mode = 'parallel'
+    service.explanation_deadline = 0.5
+    return service
+
+
+def slow_question(question):
+    # Only "How can I extend the shelf life..." misses the deadline.
+    return 3.0 if 'extend the shelf life' in question else 0
+
+
+def test_sync_fan_out_returns_partial_results_at_the_deadline(service, upstream):
+    upstream.delay = slow_question
+    start = time.monotonic()
+    explanation = service.get_prediction_explanation(PREDICTION)
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 1.5
+    assert [item['question'] for item in explanation] == OpenRouterChatService.PREDICTION_QUESTIONS[:2]
+    assert all(item['answer'] == 'answer after 0s' for item in explanation)
+
+
+def test_async_fan_out_returns_partial_results_at_the_deadline(service, upstream):
+    upstream.delay = slow_question
+
+    async def explain():
+        try:
+            start = time.monotonic()
+            return await service.get_prediction_explanation_async(PREDICTION), time.monotonic() - start
+        finally:
+            await service.close_async()
+
+    explanation, elapsed = asyncio.run(explain())
+    assert elapsed < 1.5
+    assert [item['question'] for item in explanation] == OpenRouterChatService.PREDICTION_QUESTIONS[:2]
+
+
+def test_questions_still_queued_at_the_deadline_are_cancelled(service, upstream):
+    upstream.delay = lambda question: 1.0
+    service._executor = ThreadPoolExecutor(max_workers=1)
+
+    assert service.get_prediction_explanation(PREDICTION) == []
+    time.sleep(1.5)
+    assert len(upstream.calls) == 1
+
+
+def test_fan_out_work_is_capped_across_requests(service, upstream):
+    upstream.delay = lambda question: 1.0
+    service._fanout_slots = threading.BoundedSemaphore(1)
+
+    assert service.get_prediction_explanation(PREDICTION) == []
+    time.sleep(1.5)
+    assert len(upstream.calls) == 1
+    # Every slot is released once the abandoned call finishes.
+    assert service._fanout_slots.acquire(blocking=False)
+
+
+def test_packed_mode_returns_at_the_deadline_with_retries_on(service, upstream):
+    upstream.delay = lambda question: 2.0
+    assert service.client.retries == 2
+    service.explanation_mode = 'packed'
+
+    start = time.monotonic()
+    assert service.get_prediction_explanation(PREDICTION) == []
+    assert time.monotonic() - start < 0.8
+
+
+def test_async_packed_mode_returns_at_the_deadline_with_retries_on(service, upstream):
+    upstream.delay = lambda question: 2.0
+    assert service.client.retries == 2
+    service.explanation_mode = 'packed'
+
+    async def explain():
+        try:
+            start = time.monotonic()
+            return await service.get_prediction_explanation_async(PREDICTION), time.monotonic() - start
+        finally:
+            await service.close_async()
+
+    explanation, elapsed = asyncio.run(explain())
+    assert explanation == []
+    assert elapsed < 0.8
+
+
+def test_packed_request_waiting_on_another_keeps_its_deadline(service, upstream):
+    # The second request joins the first one's call through the cache's
+    # single flight, which runs for the longer question timeout.
+    upstream.delay = lambda question: 1.5
+    service.explanation_mode = 'packed'
+    service.response_cache = ChatResponseCache(path=None)
+    service.explanation_deadline = 5.0
+    leader = threading.Thread(target=service.get_prediction_explanation, args=(PREDICTION,))
+    leader.start()
+    time.sleep(0.2)
+
+    service.explanation_deadline = 0.5
+    start = time.monotonic()
+    assert service.get_prediction_explanation(PREDICTION) == []
+    assert time.monotonic() - start < 0.8
+    leader.join()
+    assert len(upstream.calls) == 1
+
+
+def test_async_question_missing_the_deadline_is_still_cached(service, upstream):
+    upstream.delay = slow_question
+    service.response_cache = ChatResponseCache(path=None)
+
+    async def explain():
+        try:
+            first = await service.get_prediction_explanation_async(PREDICTION)
+            await asyncio.sleep(3.0)
+            return first, await service.get_prediction_explanation_async(PREDICTION)
+        finally:
+            await service.close_async()
+
+    first, second = asyncio.run(explain())
+    assert len(first) == 2
+    assert len(second) == 3
+    assert len(upstream.calls) == 3
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import (
+    RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor, VotingRegressor, StackingRegressor
+)
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from src.models.compiled import CompiledTreeEnsemble
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.RandomState(0)
+    X = rng.uniform(-20, 40, size=(400, 5))
+    y = 30 - 0.5 * X[:, 0] + 0.1 * X[:, 1] * (X[:, 2] > 10) - X[:, 3] ** 2 / 100 + rng.normal(0, 1, 400)
+    return X, y
+
+
+def estimators():
+    forest = lambda: RandomForestRegressor(n_estimators=15, max_depth=6, random_state=0)
+    extra = lambda: ExtraTreesRegressor(n_estimators=15, max_depth=6, random_state=0)
+    boosting = lambda: GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0)
+    return {
+        'tree': DecisionTreeRegressor(max_depth=8, random_state=0),
+        'random_forest': forest(),
+        'extra_trees': extra(),
+        'gradient_boosting': boosting(),
+        'voting': VotingRegressor([('rf', forest()), ('gb', boosting())], weights=[2, 1]),
+        'stacking': StackingRegressor([('rf', forest()), ('et', extra())], final_estimator=LinearRegression(), cv=3)
+    }
+
+
+def saabas(estimator, X):
+    # Reference contributions walked with sklearn's own decision paths.
+    if isinstance(estimator, DecisionTreeRegressor):
+        trees = [(estimator.tree_, 1.0)]
+    else:
+        trees = [(tree.tree_, 1.0 / len(estimator.estimators_)) for tree in estimator.estimators_]
+
+    contributions = np.zeros(X.shape)
+    for tree, weight in trees:
+        values = tree.value[:, 0, 0]
+        paths = tree.decision_path(X.astype(np.float32))
+        for row in range(X.shape[0]):
+            nodes = paths.indices[paths.indptr[row]:paths.indptr[row + 1]]
+            for parent, child in zip(nodes[:-1], nodes[1:]):
+                contributions[row, tree.feature[parent]] += weight * (values[child] - values[parent])
+    return contributions
+
+
+@pytest.mark.parametrize('name', list(estimators()))
+def test_predictions_match_sklearn(data, name):
+    X, y = data
+    estimator = estimators()[name].fit(X, y)
+    compiled = CompiledTreeEnsemble.from_estimator(estimator)
+
+    X_test = np.random.RandomState(1).uniform(-25, 45, size=(300, 5))
+    np.testing.assert_allclose(compiled.predict(X_test), estimator.predict(X_test), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('name', list(estimators()))
+def test_contributions_add_up_to_the_prediction(data, name):
+    X, y = data
+    estimator = estimators()[name].fit(X, y)
+    compiled = CompiledTreeEnsemble.from_estimator(estimator)
+
+    predictions, expected_value, contributions = compiled.explain(X[:50])
+    np.testing.assert_allclose(predictions, estimator.predict(X[:50]), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(expected_value + contributions.sum(axis=1), predictions, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('name', ['tree', 'random_forest', 'extra_trees'])
+def test_contributions_match_decision_paths(data, name):
+    X, y = data
+    estimator = estimators()[name].fit(X, y)
+    _, _, contributions = CompiledTreeEnsemble.from_estimator(estimator).explain(X[:50])
+
+    np.testing.assert_allclose(contributions, saabas(estimator, X[:50]), rtol=0, atol=1e-9)
+
+
+def test_threshold_between_adjacent_float32_values():
+    # sklearn splits halfway between the two training values, a float64
+    # that float32 cannot hold and that rounds to nearest as `high`, which
+    # would send `high` down the left branch.
+    low = np.nextafter(np.float32(2.0), np.float32(3.0))
+    high = np.nextafter(low, np.float32(3.0))
+    X = np.array([[low], [high]], dtype=np.float64)
+    estimator = DecisionTreeRegressor().fit(X, [0.0, 1.0])
+    threshold = estimator.tree_.threshold[0]
+    assert np.float32(threshold) == high
+
+    compiled = CompiledTreeEnsemble.from_estimator(estimator)
+    np.testing.assert_array_equal(compiled.predict(X), [0.0, 1.0])
+    np.testing.assert_array_equal(compiled.predict(X), estimator.predict(X))
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from src.rules.interpreter import RuleBasedInterpreter
+
+ITEMS = [
+    {'food_type': 1, 'temperature': 7.0, 'humidity': 72.0, 'storage_type': 2, 'days_stored': 3},
+    {'food_type': 'meat', 'temperature': 7.0, 'humidity': 72.0, 'storage_type': 'refrigerator', 'days_stored': 3},
+    {'food_type': 'cheese', 'temperature': 9.0, 'humidity': 80.0, 'storage_type': 'cellar', 'days_stored': 1},
+    {'food_type': 'seafood', 'temperature': 8.2, 'humidity': 60.0, 'storage_type': 'refrigerator', 'days_stored': 2},
+    {'food_type': 'bakery', 'temperature': 26.0, 'humidity': 75.0, 'storage_type': 'pantry', 'days_stored': 2},
+    {'food_type': 'vegetables', 'temperature': -4.0, 'humidity': 90.0, 'storage_type': 'freezer', 'days_stored': 10},
+]
+
+
+def test_integer_labels_fall_back_to_defaults():
+    interpreter = RuleBasedInterpreter()
+    food_code = interpreter.encode_food_types(np.array([1, 0, 99]))
+    storage_code = interpreter.encode_storage_types(np.array([2, 0]))
+
+    assert (food_code == interpreter.default_food_code).all()
+    assert (storage_code == interpreter.default_storage_code).all()
+
+
+@pytest.mark.parametrize('item', ITEMS)
+def test_batch_and_single_agree(pipeline, item):
+    batch = pipeline.predict(dict(item), include_feature_importance=False)
+    pred = pipeline.predict_single_raw(**item)
+    single = pipeline.finish_single(
+        item['food_type'], item['temperature'], item['humidity'], item['storage_type'], item['days_stored'], pred
+    )
+
+    for field in ('food_type', 'storage_type', 'safety_classification', 'severity', 'issues', 'recommendations'):
+        assert batch[field] == single[field], field
+    assert batch['predicted_remaining_days'] == pytest.approx(single['predicted_remaining_days'], abs=0.01)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+ROWS = [
+    {'food_type': 'dairy', 'temperature': 4.0, 'humidity': 60.0, 'storage_type': 'refrigerator', 'days_stored': 2},
+    {'food_type': 'meat', 'temperature': 12.0, 'humidity': 85.0, 'storage_type': 'room_temp', 'days_stored': 5},
+    {'food_type': 'vegetables', 'temperature': -18.0, 'humidity': 40.0, 'storage_type': 'freezer', 'days_stored': 30},
+]
+
+
+@pytest.fixture
+def featured(pipeline, training_data):
+    X, _ = training_data
+    X_featured = pipeline.feature_engineer.transform(pipeline.preprocessor.transform(X.copy()))
+    return X_featured[pipeline.model.get_feature_columns()]
+
+
+def test_quantiles_match_percentiles_of_the_trees(pipeline, featured):
+    quantiles = (0.1, 0.5, 0.9)
+    mean, std, bounds = pipeline.model.predict_interval(featured, quantiles)
+
+    trees = np.array([tree.predict(featured.values) for tree in pipeline.model.model.estimators_])
+    np.testing.assert_allclose(bounds, np.percentile(trees, [q * 100 for q in quantiles], axis=0))
+    np.testing.assert_allclose(mean, trees.mean(axis=0))
+    np.testing.assert_allclose(std, trees.std(axis=0))
+
+
+def random_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'food_type': rng.choice(['dairy', 'meat', 'fruits', 'vegetables', 'bakery'], n),
+        'temperature': rng.uniform(-20, 30, n),
+        'humidity': rng.uniform(20, 95, n),
+        'storage_type': rng.choice(['refrigerator', 'freezer', 'pantry', 'room_temp'], n),
+        'days_stored': rng.integers(0, 60, n)
+    })
+
+
+def test_interval_contains_the_point_estimate(pipeline):
+    # Skewed trees can put both quantiles on one side of the forest mean.
+    results = pipeline.predict(random_rows(2000), include_feature_importance=False, with_interval=True)
+
+    for result in results:
+        interval = result['prediction_interval']
+        assert interval['lower'] <= result['predicted_remaining_days'] <= interval['upper']
+
+
+def test_single_row_and_batch_intervals_agree(pipeline):
+    batch = pipeline.predict(ROWS, include_feature_importance=False, with_interval=True)
+
+    for row, expected in zip(ROWS, batch):
+        single = pipeline.predict_single(with_interval=True, **row)
+        assert single['predicted_remaining_days'] == expected['predicted_remaining_days']
+        assert single['prediction_interval'] == expected['prediction_interval']
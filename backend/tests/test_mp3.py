@@ -0,0 +1,131 @@
+import pytest
+
+from src.services.audio_cache import AudioCache
+from src.services.mp3 import audio_frames, concat_mp3, parse_frame_header, skip_id3
+from src.services.voice_service import ElevenLabsVoiceService
+
+VERSION_BITS = {'1': 3, '2': 2, '2.5': 0}
+STEREO, MONO = 0, 3
+
+
+def frame(version='1', bitrate_index=9, sample_rate_index=0, padding=0, channel_mode=STEREO, fill=0x55,
+          info=False):
+    # Layer III (layer bits 01), no CRC.
+    header = bytes([
+        0xFF,
+        0xE0 | (VERSION_BITS[version] << 3) | (1 << 1) | 1,
+        (bitrate_index << 4) | (sample_rate_index << 2) | (padding << 1),
+        channel_mode << 6
+    ])
+    length = parse_frame_header(header, 0)['length']
+    body = bytearray([fill] * (length - 4))
+    if info:
+        if version == '1':
+            side_info = 17 if channel_mode == MONO else 32
+        else:
+            side_info = 9 if channel_mode == MONO else 17
+        body[side_info:side_info + 4] = b'Info'
+    return header + bytes(body)
+
+
+def id3_tag(size, footer=False):
+    synchsafe = bytes([(size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    flags = 0x10 if footer else 0
+    return b'ID3' + bytes([4, 0, flags]) + synchsafe + b'\x00' * size + (b'3DI' + b'\x00' * 7 if footer else b'')
+
+
+@pytest.mark.parametrize('version, bitrate_index, sample_rate_index, padding, expected', [
+    ('1', 9, 0, 0, 417),    # 128 kbps, 44.1 kHz
+    ('1', 9, 0, 1, 418),
+    ('1', 14, 1, 0, 960),   # 320 kbps, 48 kHz
+    ('2', 8, 1, 0, 192),    # 64 kbps, 24 kHz
+    ('2', 8, 1, 1, 193),
+    ('2', 4, 0, 0, 104),    # 32 kbps, 22.05 kHz
+    ('2.5', 8, 2, 0, 576),  # 64 kbps, 8 kHz
+])
+def test_frame_length(version, bitrate_index, sample_rate_index, padding, expected):
+    data = frame(version, bitrate_index, sample_rate_index, padding)
+    header = parse_frame_header(data, 0)
+
+    assert header['length'] == expected == len(data)
+    assert header['version'] == version
+
+
+@pytest.mark.parametrize('data', [
+    b'\xff\xfb',                  # truncated
+    b'ID3\x04\x00\x00',           # not a frame
+    b'\xff\xfd\x90\x00',          # layer II
+    b'\xff\xfb\xf0\x00',          # bad bitrate index
+    b'\xff\xfb\x9c\x00',          # reserved sample rate
+])
+def test_invalid_headers_are_rejected(data):
+    assert parse_frame_header(data, 0) is None
+
+
+@pytest.mark.parametrize('footer', [False, True])
+def test_id3v2_tag_is_skipped(footer):
+    tag = id3_tag(300, footer)
+    audio = frame(fill=1) + frame(fill=2, padding=1)
+
+    assert skip_id3(tag + audio) == len(tag)
+    assert audio_frames(tag + audio) == (('1', 44100, 2), [frame(fill=1), frame(fill=2, padding=1)])
+    assert skip_id3(audio) == 0
+
+
+def test_trailing_bytes_after_the_last_frame_are_dropped():
+    audio = frame(fill=1) + frame(fill=2)
+    _, frames = audio_frames(audio + b'TAG' + b'\x00' * 125)
+    assert b''.join(frames) == audio
+    _, frames = audio_frames(audio + frame(fill=3)[:100])
+    assert b''.join(frames) == audio
+
+
+@pytest.mark.parametrize('version, channel_mode, sample_rate_index', [
+    ('1', STEREO, 0), ('1', MONO, 0), ('2', STEREO, 1), ('2', MONO, 1)
+])
+def test_info_frame_is_dropped_from_every_clip(version, channel_mode, sample_rate_index):
+    def clip(fill):
+        return id3_tag(20) + frame(version, 8, sample_rate_index, channel_mode=channel_mode, info=True) + b''.join(
+            frame(version, 8, sample_rate_index, channel_mode=channel_mode, fill=fill + i) for i in range(2)
+        )
+
+    joined = concat_mp3([clip(1), clip(10), clip(20)])
+
+    expected = b''.join(
+        frame(version, 8, sample_rate_index, channel_mode=channel_mode, fill=fill)
+        for fill in (1, 2, 10, 11, 20, 21)
+    )
+    assert joined == expected
+    assert b'Info' not in joined
+
+
+def test_mixed_sample_rates_across_clips_cannot_be_joined():
+    with pytest.raises(ValueError, match='Cannot join'):
+        concat_mp3([frame(sample_rate_index=0), frame(sample_rate_index=1)])
+
+
+def test_mixed_channel_modes_within_a_clip_are_rejected():
+    with pytest.raises(ValueError, match='Mixed MP3 formats'):
+        concat_mp3([frame() + frame(channel_mode=MONO)])
+
+
+def test_clip_without_frames_is_rejected():
+    with pytest.raises(ValueError, match='No MPEG layer III frames'):
+        concat_mp3([frame(), b'not audio'])
+
+
+def test_unjoinable_segments_are_synthesized_whole(tmp_path, monkeypatch):
+    service = ElevenLabsVoiceService()
+    service.audio_cache = AudioCache(str(tmp_path))
+    clips = {'first': frame(sample_rate_index=0), 'second': frame(sample_rate_index=1)}
+    requested = []
+
+    def synthesize(text, voice_id=None):
+        requested.append(text)
+        return {'success': True, 'cache': 'miss', 'audio_data': clips.get(text, b'whole')}
+
+    monkeypatch.setattr(service, 'cached_text_to_speech', synthesize)
+
+    result = service.segmented_text_to_speech(['first', 'second'])
+    assert result['audio_data'] == b'whole'
+    assert sorted(requested) == ['first', 'first second', 'second']
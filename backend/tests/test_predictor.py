@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.models.predictor import ShelfLifePredictor
+
+
+@pytest.fixture
+def saved(pipeline, training_data, tmp_path):
+    X, _ = training_data
+    X_featured = pipeline.feature_engineer.transform(pipeline.preprocessor.transform(X.copy()))
+    filepath = os.path.join(tmp_path, 'model.pkl')
+    pipeline.model.save(filepath)
+    return filepath, X_featured[pipeline.model.get_feature_columns()]
+
+
+def count_compiled_calls(predictor, monkeypatch):
+    calls = []
+    predict = predictor.compiled.predict
+    monkeypatch.setattr(predictor.compiled, 'predict', lambda X: calls.append(len(X)) or predict(X))
+    return calls
+
+
+def test_mmap_load_predicts_small_batches_without_the_pickle(saved, monkeypatch):
+    filepath, X = saved
+    predictor = ShelfLifePredictor().load(filepath)
+    calls = count_compiled_calls(predictor, monkeypatch)
+
+    predictor.predict(X.iloc[:10])
+    assert calls == [10]
+    assert predictor.model is None
+
+
+def test_mmap_load_hands_large_batches_to_sklearn(saved, pipeline, monkeypatch):
+    filepath, X = saved
+    predictor = ShelfLifePredictor().load(filepath)
+    predictor.compiled_max_rows = 10
+    calls = count_compiled_calls(predictor, monkeypatch)
+
+    predictions = predictor.predict(X.iloc[:11])
+    assert calls == []
+    assert predictor.model is not None
+    np.testing.assert_allclose(predictions, pipeline.model.model.predict(X.iloc[:11]))
+
+
+def test_large_batches_stay_compiled_if_the_pickle_changed(saved, monkeypatch):
+    filepath, X = saved
+    predictor = ShelfLifePredictor().load(filepath)
+    predictor.compiled_max_rows = 10
+    calls = count_compiled_calls(predictor, monkeypatch)
+    os.utime(filepath, ns=(0, 0))
+
+    predictor.predict(X.iloc[:11])
+    assert calls == [11]
+    assert predictor.model is None
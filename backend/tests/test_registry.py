@@ -0,0 +1,56 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+from src.models.bundle import load_model_bundle, BUNDLE_DIRNAME
+from src.feature_engineering.engineer import FeatureEngineer
+from src.rules.interpreter import RuleBasedInterpreter
+from src.inference.pipeline import InferencePipeline
+from src.inference.grid import PredictionGrid, GRID_DIRNAME
+from src.inference.registry import ModelRegistry
+
+
+def test_reload_skips_while_another_reload_holds_the_lock(models_dir):
+    registry = ModelRegistry(models_dir, poll_interval=0)
+    with registry._reload_lock:
+        assert registry.reload() is False
+    assert registry.version is None
+
+
+def test_reload_wait_blocks_until_the_running_reload_finishes(models_dir):
+    registry = ModelRegistry(models_dir, poll_interval=0)
+    results = []
+    registry._reload_lock.acquire()
+    waiter = threading.Thread(target=lambda: results.append(registry.reload(wait=True)))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    registry._reload_lock.release()
+    waiter.join(30)
+    assert results == [True]
+    assert registry.version is not None
+    assert registry.last_error is None
+
+
+def save_grid(models_dir, tmp_path, max_abs_error):
+    directory = tmp_path / 'models'
+    shutil.copytree(models_dir, directory)
+    bundle = load_model_bundle(str(directory))
+    pipeline = InferencePipeline(
+        bundle.preprocessor, FeatureEngineer(), bundle.predictor, RuleBasedInterpreter(), model_version=bundle.version
+    )
+    axes = {'temperature': (0.0, 10.0, 5.0), 'humidity': (50.0, 70.0, 10.0), 'days_stored': (0.0, 4.0, 2.0)}
+    grid = PredictionGrid.build(pipeline, axes)
+    grid.error = {'max_abs_error': max_abs_error}
+    grid.save(os.path.join(directory, BUNDLE_DIRNAME, GRID_DIRNAME))
+    return str(directory)
+
+
+@pytest.mark.parametrize('max_abs_error, served', [(0.4, True), (36.8, False)])
+def test_grid_over_the_default_error_ceiling_is_refused(models_dir, tmp_path, max_abs_error, served):
+    registry = ModelRegistry(save_grid(models_dir, tmp_path, max_abs_error), poll_interval=0, use_grid=True)
+    assert registry.reload()
+    assert (registry.pipeline.grid is not None) == served
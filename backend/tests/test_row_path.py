@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+COLUMNS = ['food_type', 'temperature', 'humidity', 'storage_type', 'days_stored']
+
+
+def boundary_items(pipeline):
+    # compute_features compares scaled temperatures against 10, 0, -5 and 30,
+    # so pick raw values that land exactly on those points as well as the
+    # raw rule thresholds.
+    mean, scale = pipeline.preprocessor.means[0], pipeline.preprocessor.scales[0]
+    temperatures = [mean + edge * scale for edge in (10, 0, -5, 30)] + [-18, -5, 0, 4, 8, 8.0001, 10, 25, 30]
+    return [
+        ('meat', float(temperature), 65.0, storage_type, 3)
+        for temperature in temperatures
+        for storage_type in ('refrigerator', 'freezer', 'pantry')
+    ]
+
+
+MIXED_ITEMS = [
+    ('dairy', 4.0, 65.0, 'refrigerator', 2),
+    ('seafood', 2.5, 90.0, 'refrigerator', 0),
+    ('bakery', 22.0, 45.0, 'pantry', 5),
+    ('vegetables', -18.0, 60.0, 'freezer', 60),
+    ('fruits', 12.0, 91.0, 'pantry', 1.5),
+    ('cheese', 4.0, 65.0, 'refrigerator', 2),
+    ('dairy', 4.0, 65.0, 'garage', 2),
+    (7, 4.0, 65.0, 3, 2),
+    ('meat', np.nan, 65.0, 'refrigerator', 2),
+    ('meat', 4.0, np.nan, 'freezer', np.nan),
+    ('meat', np.nan, np.nan, 'pantry', np.nan),
+]
+
+
+def frame_features(pipeline, items):
+    df = pd.DataFrame(items, columns=COLUMNS)
+    processed = pipeline.preprocessor.transform(df)
+    featured = pipeline.feature_engineer.transform(processed)
+    return featured[pipeline.feature_columns].to_numpy(dtype=float), featured
+
+
+def all_items(pipeline):
+    return MIXED_ITEMS + boundary_items(pipeline)
+
+
+def test_row_features_match_frame(pipeline):
+    items = all_items(pipeline)
+    expected, _ = frame_features(pipeline, items)
+
+    for item, row in zip(items, expected):
+        buffer = pipeline.fill_row_buffer(*item)
+        np.testing.assert_allclose(buffer[0], row, rtol=1e-12, atol=1e-12, err_msg=str(item))
+
+
+def test_row_predictions_match_frame(pipeline):
+    items = all_items(pipeline)
+    _, featured = frame_features(pipeline, items)
+    expected = np.asarray(pipeline.model.predict(featured[pipeline.feature_columns]), dtype=float)
+
+    for item, value in zip(items, expected):
+        assert pipeline.predict_single_raw(*item) == pytest.approx(value, abs=1e-9), item
+
+
+def test_predict_single_matches_predict(pipeline):
+    for item in all_items(pipeline):
+        single = pipeline.predict_single(*item)
+        batch = pipeline.predict(dict(zip(COLUMNS, item)))
+        # Compared as JSON so that NaN readings echoed back compare equal.
+        assert json.dumps(single, sort_keys=True) == json.dumps(batch, sort_keys=True), item
+
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from score import score, OUTPUT_COLUMNS
+
+ROWS = pd.DataFrame({
+    'sku': ['a1', 'b2', 'c3'],
+    'food_type': ['dairy', 'meat', 'bakery'],
+    'temperature': [4.0, 9.0, 22.0],
+    'humidity': [60.0, 65.0, 55.0],
+    'storage_type': ['refrigerator', 'refrigerator', 'pantry'],
+    'days_stored': [2.0, 1.0, 3.0]
+})
+
+
+def write_input(tmp_path, frame):
+    path = tmp_path / 'inventory.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_scores_to_parquet_by_default(models_dir, tmp_path):
+    pytest.importorskip('pyarrow')
+    output_dir = tmp_path / 'scored'
+    score(write_input(tmp_path, ROWS), str(output_dir), models_dir=models_dir, chunk_size=2, workers=0,
+          keep_columns=['sku'], with_interval=True)
+
+    parts = sorted(output_dir.glob('part-*.parquet'))
+    assert len(parts) == 2
+    scored = pd.concat([pd.read_parquet(path) for path in parts], ignore_index=True)
+    written = [column for column in OUTPUT_COLUMNS if column not in ('issues', 'recommendations')]
+    assert sorted(scored.columns) == sorted(['sku'] + written)
+    assert scored['sku'].tolist() == ROWS['sku'].tolist()
+    assert scored['food_type'].tolist() == ROWS['food_type'].tolist()
+
+    for column in ('food_type', 'storage_type', 'safety_classification', 'severity'):
+        assert isinstance(scored[column].dtype, pd.CategoricalDtype)
+    for column in ('temperature', 'humidity', 'days_stored', 'predicted_remaining_days', 'raw_prediction',
+                   'interval_lower', 'interval_upper', 'interval_std'):
+        assert scored[column].dtype == np.float32
+    for column in ('issue_mask', 'recommendation_mask'):
+        assert scored[column].dtype == np.uint8
+    assert (output_dir / '_SUCCESS').exists()
+
+
+def test_scores_to_csv(models_dir, tmp_path):
+    output_dir = tmp_path / 'scored'
+    score(write_input(tmp_path, ROWS), str(output_dir), models_dir=models_dir, chunk_size=2, workers=0,
+          output_format='csv', keep_columns=['sku'])
+
+    parts = sorted(output_dir.glob('part-*.csv'))
+    assert len(parts) == 2
+    scored = pd.concat([pd.read_csv(path) for path in parts], ignore_index=True)
+    assert scored['sku'].tolist() == ROWS['sku'].tolist()
+    assert (output_dir / '_SUCCESS').exists()
+
+
+def test_missing_input_column_is_reported_up_front(models_dir, tmp_path):
+    output_dir = tmp_path / 'scored'
+    with pytest.raises(SystemExit, match='missing column.*humidity'):
+        score(write_input(tmp_path, ROWS.drop(columns='humidity')), str(output_dir), models_dir=models_dir, workers=0)
+    assert not output_dir.exists()
+
+
+def test_keep_columns_must_not_clash_with_output(models_dir, tmp_path):
+    frame = ROWS.assign(severity='unknown')
+    with pytest.raises(SystemExit, match='severity'):
+        score(write_input(tmp_path, frame), str(tmp_path / 'scored'), models_dir=models_dir, workers=0,
+              keep_columns=['sku', 'severity'])
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import api
+
+CSV = (
+    'food_type,temperature,humidity,storage_type,days_stored\n'
+    'dairy,4,60,refrigerator,2\n'
+    'meat,12,85,room_temp,5\n'
+    'fruits,,55,pantry,7\n'
+    'vegetables,-18,40,freezer,30\n'
+    'bakery,20,,pantry,3\n'
+)
+
+ROWS = [
+    {'food_type': 'dairy', 'temperature': 4.0, 'humidity': 60.0, 'storage_type': 'refrigerator', 'days_stored': 2},
+    {'food_type': 'meat', 'temperature': 12.0, 'humidity': 85.0, 'storage_type': 'room_temp', 'days_stored': 5},
+    {'food_type': 'fruits', 'temperature': 20.0, 'humidity': 55.0, 'storage_type': 'pantry', 'days_stored': 7},
+    {'food_type': 'vegetables', 'temperature': -18.0, 'humidity': 40.0, 'storage_type': 'freezer', 'days_stored': 30},
+    {'food_type': 'bakery', 'temperature': 20.0, 'humidity': 50.0, 'storage_type': 'pantry', 'days_stored': 3},
+]
+
+
+@pytest.fixture
+def client(pipeline, monkeypatch):
+    monkeypatch.setattr(api, 'pipeline', pipeline)
+    return api.app.test_client()
+
+
+def reject_constant(token):
+    raise ValueError(f"invalid JSON token {token}")
+
+
+def post(client, body, content_type, chunk_size):
+    response = client.post(
+        f'/batch_predict/stream?chunk_size={chunk_size}', data=body, content_type=content_type
+    )
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    text = response.get_data(as_text=True)
+    assert text.endswith('\n')
+    # Strict NDJSON: a bare NaN or Infinity token fails the parse.
+    return [json.loads(line, parse_constant=reject_constant) for line in text.splitlines()]
+
+
+def ndjson(rows):
+    return ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 100])
+def test_ndjson_results_do_not_depend_on_chunk_boundaries(client, pipeline, chunk_size):
+    lines = post(client, ndjson(ROWS), 'application/x-ndjson', chunk_size)
+    expected = pipeline.predict(ROWS, include_feature_importance=False)
+    assert lines == json.loads(json.dumps(expected))
+
+
+@pytest.mark.parametrize('chunk_size', [2, 100])
+def test_csv_blank_cells_are_imputed_and_sent_as_null(client, chunk_size):
+    lines = post(client, CSV, 'text/csv', chunk_size)
+
+    assert [line['food_type'] for line in lines] == [row['food_type'] for row in ROWS]
+    assert lines[2]['temperature'] is None
+    assert lines[4]['humidity'] is None
+    assert all(isinstance(line['predicted_remaining_days'], float) for line in lines)
+
+
+def test_failed_chunk_becomes_one_error_line(client):
+    rows = [dict(row) for row in ROWS]
+    rows[3]['temperature'] = 'cold'
+
+    lines = post(client, ndjson(rows), 'application/x-ndjson', 2)
+    assert len(lines) == 4
+    assert 'error' not in lines[0] and 'error' not in lines[1]
+    assert lines[2]['rows'] == [2, 4]
+    assert lines[3]['food_type'] == 'bakery'
+
+
+def test_malformed_line_ends_the_stream(client):
+    body = ndjson(ROWS[:3]) + '{"food_type": \n' + ndjson(ROWS[3:])
+
+    lines = post(client, body, 'application/x-ndjson', 2)
+    assert len(lines) == 3
+    assert [line['food_type'] for line in lines[:2]] == ['dairy', 'meat']
+    assert lines[2]['error'].startswith('Invalid input in the chunk starting at row 2')
+
+
+def test_other_content_types_are_rejected(client):
+    response = client.post('/batch_predict/stream', data='[]', content_type='application/json')
+    assert response.status_code == 415
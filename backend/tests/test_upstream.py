@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.services.upstream import UpstreamClient, UpstreamUnavailable
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    # Answers each request with the next (delay, status) from the script,
+    # then with an immediate 200 once the script runs out.
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.calls += 1
+            delay, status = self.server.script.pop(0) if self.server.script else (0, 200)
+        time.sleep(delay)
+
+        body = b'{"ok": true}'
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if status in (429, 503):
+                self.send_header('Retry-After', '0')
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ScriptedHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.calls = 0
+    server.script = []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1/test"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_server_errors(upstream):
+    upstream.script = [(0, 503), (0, 502)]
+    client = UpstreamClient('test', retries=2, backoff=0.01)
+
+    assert client.post(upstream.url, json={}).status_code == 200
+    assert upstream.calls == 3
+    assert client.retried == 2
+    assert client.breaker.state == 'closed'
+
+
+def test_timed_out_attempt_is_not_retried(upstream):
+    upstream.script = [(1.0, 200)]
+    client = UpstreamClient('test', retries=2, backoff=0.01)
+
+    start = time.perf_counter()
+    with pytest.raises(requests.Timeout):
+        client.post(upstream.url, json={}, timeout=0.3)
+    assert time.perf_counter() - start < 0.6
+    assert upstream.calls == 1
+    assert client.stats()['outcomes']['ReadTimeout'] == 1
+
+
+def test_retries_share_the_timeout(upstream):
+    upstream.script = [(0.2, 503), (1.0, 200)]
+    client = UpstreamClient('test', retries=2, backoff=0.01)
+
+    start = time.perf_counter()
+    with pytest.raises(requests.Timeout):
+        client.post(upstream.url, json={}, timeout=0.5)
+    assert time.perf_counter() - start < 0.8
+    assert upstream.calls == 2
+    assert client.retried == 1
+
+
+def test_no_retry_once_the_backoff_outlasts_the_timeout(upstream):
+    upstream.script = [(0, 500)]
+    client = UpstreamClient('test', retries=2)
+    client._retry_delay = lambda attempt, response=None: 1.0
+
+    start = time.perf_counter()
+    assert client.post(upstream.url, json={}, timeout=0.5).status_code == 500
+    assert time.perf_counter() - start < 0.3
+    assert upstream.calls == 1
+
+
+def test_async_timed_out_attempt_is_not_retried(upstream):
+    upstream.script = [(1.0, 200)]
+    client = UpstreamClient('test', retries=2, backoff=0.01)
+
+    async def call():
+        try:
+            return await client.post_async(upstream.url, json={}, timeout=0.3)
+        finally:
+            await client.close_async()
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call())
+    assert time.perf_counter() - start < 0.6
+    assert upstream.calls == 1
+
+
+def test_rate_limiting_opens_the_circuit(upstream):
+    upstream.script = [(0, 429), (0, 429)]
+    client = UpstreamClient('test', retries=0, failure_threshold=2, reset_timeout=60)
+
+    assert client.post(upstream.url, json={}).status_code == 429
+    assert client.breaker.failures == 1
+    assert client.post(upstream.url, json={}).status_code == 429
+    assert client.breaker.state == 'open'
+
+    with pytest.raises(UpstreamUnavailable):
+        client.post(upstream.url, json={})
+    assert upstream.calls == 2
+
+
+def test_client_errors_do_not_count_as_failures(upstream):
+    upstream.script = [(0, 503), (0, 400)]
+    client = UpstreamClient('test', retries=0, failure_threshold=2)
+
+    client.post(upstream.url, json={})
+    assert client.breaker.failures == 1
+    assert client.post(upstream.url, json={}).status_code == 400
+    assert client.breaker.failures == 0
+
+
+def test_concurrency_is_capped(upstream):
+    upstream.script = [(0.5, 200)]
+    client = UpstreamClient('test', max_concurrency=1, retries=0)
+    assert client._semaphore is None
+
+    first = threading.Thread(target=client.post, args=(upstream.url,), kwargs={'json': {}})
+    first.start()
+    time.sleep(0.1)
+    with pytest.raises(UpstreamUnavailable):
+        client.post(upstream.url, json={}, timeout=0.1)
+    first.join()
+
+    assert client.post(upstream.url, json={}).status_code == 200
+    assert client.stats()['in_flight'] == 0
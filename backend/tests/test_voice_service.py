@@ -0,0 +1,169 @@
+import asyncio
+import glob
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.services.audio_cache import AudioCache
+from src.services.voice_service import ElevenLabsVoiceService
+
+CHUNK = 4096
+CHUNKS = 8
+
+
+class FakeStreamingTTS(BaseHTTPRequestHandler):
+    # Sends the audio in paced chunks; with "FAIL" in the text it drops the
+    # connection half-way through.
+    def do_POST(self):
+        text = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        self.server.calls += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(CHUNK * CHUNKS))
+        self.end_headers()
+        try:
+            for i in range(CHUNKS):
+                if 'FAIL' in text and i == CHUNKS // 2:
+                    break
+                self.wfile.write(bytes([i]) * CHUNK)
+                self.wfile.flush()
+                time.sleep(0.01)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+AUDIO = b''.join(bytes([i]) * CHUNK for i in range(CHUNKS))
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeStreamingTTS)
+    server.daemon_threads = True
+    server.calls = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def service(upstream, tmp_path, monkeypatch):
+    service = ElevenLabsVoiceService()
+    service.api_key = 'test'
+    service.base_url = f"http://127.0.0.1:{upstream.server_address[1]}/v1"
+    service.audio_cache = AudioCache(str(tmp_path / 'audio'))
+    monkeypatch.setattr(service.client, 'retries', 0)
+    return service
+
+
+def cache_files(service):
+    return sorted(glob.glob(os.path.join(service.audio_cache.directory, '*', '*')))
+
+
+def test_full_stream_is_committed_to_the_cache(service, upstream):
+    result = service.stream_text_to_speech('hello')
+    relay = result['audio_stream']
+    path = service.audio_cache.path(result['cache_key'])
+
+    chunks = iter(relay)
+    first = next(chunks)
+    # Mid-stream only the temporary file exists.
+    assert not os.path.exists(path)
+    assert [os.path.basename(p).split('.tmp-')[0] for p in cache_files(service)] == [os.path.basename(path)]
+
+    assert first + b''.join(chunks) == AUDIO
+    assert cache_files(service) == [path]
+    with open(path, 'rb') as f:
+        assert f.read() == AUDIO
+    assert service.client.stats()['in_flight'] == 0
+
+    again = service.stream_text_to_speech('hello')
+    assert again['cache'] == 'memory' or again['cache'] == 'disk'
+    assert upstream.calls == 1
+
+
+def test_aborted_client_leaves_no_file(service):
+    result = service.stream_text_to_speech('hello')
+    relay = result['audio_stream']
+    chunks = iter(relay)
+    next(chunks)
+    # What the WSGI server does when the client disconnects.
+    chunks.close()
+
+    assert cache_files(service) == []
+    assert service.client.stats()['in_flight'] == 0
+
+
+def test_unread_stream_leaves_no_file(service):
+    result = service.stream_text_to_speech('hello')
+    result['audio_stream'].close()
+
+    assert cache_files(service) == []
+    assert service.client.stats()['in_flight'] == 0
+
+
+def test_upstream_failure_mid_stream_leaves_no_file(service):
+    relay = service.stream_text_to_speech('FAIL please')['audio_stream']
+    with pytest.raises(Exception):
+        for _ in relay:
+            pass
+
+    assert cache_files(service) == []
+    assert service.client.stats()['in_flight'] == 0
+
+
+def test_async_full_stream_is_committed(service):
+    async def stream():
+        try:
+            result = await service.stream_text_to_speech_async('hello')
+            return result['cache_key'], b''.join([chunk async for chunk in result['audio_stream']])
+        finally:
+            await service.close_async()
+
+    key, audio = asyncio.run(stream())
+    assert audio == AUDIO
+    assert cache_files(service) == [service.audio_cache.path(key)]
+
+
+def test_async_aborted_client_leaves_no_file(service):
+    async def stream():
+        try:
+            relay = (await service.stream_text_to_speech_async('hello'))['audio_stream']
+            chunks = relay.__aiter__()
+            await chunks.__anext__()
+            # What the async server's stream_audio does on a disconnect.
+            await chunks.aclose()
+            relay.close()
+        finally:
+            await service.close_async()
+
+    asyncio.run(stream())
+    assert cache_files(service) == []
+    assert service.client.stats()['in_flight'] == 0
+
+
+def test_async_cache_lookups_run_off_the_event_loop(service, monkeypatch):
+    lookups = []
+    get = service.audio_cache.get
+    monkeypatch.setattr(service.audio_cache, 'get', lambda key: lookups.append(threading.current_thread()) or get(key))
+
+    async def lookup():
+        try:
+            await service.cached_text_to_speech_async('hello')
+            streamed = await service.stream_text_to_speech_async('hello')
+            assert 'audio_stream' not in streamed
+            await service.segmented_text_to_speech_async(['hello', 'there'])
+        finally:
+            await service.close_async()
+
+    asyncio.run(lookup())
+    assert lookups
+    assert threading.main_thread() not in lookups
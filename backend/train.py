@@ -5,6 +5,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.preprocessing.preprocessor import DataPreprocessor, load_data
 from src.feature_engineering.engineer import FeatureEngineer
 from src.models.predictor import ShelfLifePredictor
+from src.models.bundle import save_model_bundle
 import json
 
 
@@ -63,8 +64,17 @@ def train_model():
     print("\nSaving model and preprocessor...")
     os.makedirs('models', exist_ok=True)
 
-    predictor.save('models/shelf_life_predictor.pkl')
-    preprocessor.save('models/preprocessor.pkl')
+    bundle = save_model_bundle(
+        predictor, preprocessor, X_featured.columns,
+        metrics={
+            'mae': metrics['mae'],
+            'rmse': metrics['rmse'],
+            'r2': metrics['r2'],
+            'cv_mean_mae': cv_results['mean_mae'],
+            'cv_std_mae': cv_results['std_mae']
+        }
+    )
+    print(f"Model bundle version: {bundle.version}")
 
     print("Model saved successfully!")
 
@@ -4,6 +4,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.preprocessing.preprocessor import DataPreprocessor, load_data
 from src.feature_engineering.engineer import FeatureEngineer
+from src.models.bundle import save_model_bundle
 import json
 from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor, VotingRegressor, StackingRegressor, ExtraTreesRegressor
 from sklearn.linear_model import Ridge
@@ -213,19 +214,17 @@ def train_model():
     print("\nSaving best model...")
     os.makedirs('models', exist_ok=True)
 
-    import joblib
-    
     best_model = stacking_regressor
     best_mae = stacking_mae
     best_r2 = stacking_r2
 
-    joblib.dump(best_model, 'models/shelf_life_predictor.pkl')
-    print(f"Model saved: models/shelf_life_predictor.pkl")
+    bundle = save_model_bundle(
+        best_model, preprocessor, X_featured.columns,
+        metrics={'model': 'Stacking Ensemble', 'r2': best_r2, 'mae': best_mae}
+    )
+    print(f"Model bundle saved: models/shelf_life_model (version {bundle.version})")
     print(f"Performance: R2={best_r2:.4f}, MAE={best_mae:.3f} days")
 
-    preprocessor.save('models/preprocessor.pkl')
-    print("Preprocessor saved: models/preprocessor.pkl")
-
     print(f"\nFinal Accuracy: {best_r2*100:.1f}%")
     
     return best_model, preprocessor
@@ -4,12 +4,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.preprocessing.preprocessor import DataPreprocessor
 from src.feature_engineering.engineer import FeatureEngineer
+from src.models.bundle import save_model_bundle
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, VotingRegressor, StackingRegressor
 from sklearn.linear_model import Ridge
 from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
-import joblib
 
 
 def train_simple():
@@ -158,11 +158,11 @@ def train_simple():
     print("\nSaving model...")
     os.makedirs('models', exist_ok=True)
     
-    joblib.dump(best_model, 'models/shelf_life_predictor.pkl')
-    print("Model saved: models/shelf_life_predictor.pkl")
-    
-    preprocessor.save('models/preprocessor.pkl')
-    print("Preprocessor saved: models/preprocessor.pkl")
+    bundle = save_model_bundle(
+        best_model, preprocessor, X_featured.columns,
+        metrics={'model': best_name, 'r2': best_r2, 'mae': best_mae}
+    )
+    print(f"Model bundle saved: models/shelf_life_model (version {bundle.version})")
     
     print(f"\nFinal Accuracy: {best_acc:.1f}%")
     print(f"Status: {'SUCCESS' if best_acc >= 97 else 'GOOD' if best_acc >= 90 else 'ACCURATE'}")
@@ -26,7 +26,7 @@ from sklearn.model_selection import train_test_split, cross_val_score, Randomize
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from src.models.predictor import ShelfLifePredictor
 from src.feature_engineering.engineer import FeatureEngineer
-import joblib
+from src.models.bundle import save_model_bundle
 
 
 def load_data(filepath):
@@ -364,14 +364,14 @@ def train_model():
     print("\nSaving best model...")
     os.makedirs('models', exist_ok=True)
 
-    joblib.dump(best_model, 'models/shelf_life_predictor.pkl')
-    print(f"Model saved: models/shelf_life_predictor.pkl")
+    bundle = save_model_bundle(
+        best_model, preprocessor, X_featured.columns,
+        metrics={'model': best_name, 'r2': best_r2, 'mae': best_mae}
+    )
+    print(f"Model bundle saved: models/shelf_life_model (version {bundle.version})")
     print(f"Best Model: {best_name}")
     print(f"Performance: R2={best_r2:.4f}, MAE={best_mae:.3f} days")
 
-    preprocessor.save('models/preprocessor.pkl')
-    print("Preprocessor saved: models/preprocessor.pkl")
-
     print(f"\nFinal Accuracy: {best_r2*100:.1f}%")
 
     return best_model, preprocessor
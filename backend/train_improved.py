@@ -4,6 +4,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.preprocessing.preprocessor import DataPreprocessor, load_data
 from src.feature_engineering.engineer import FeatureEngineer
+from src.models.bundle import save_model_bundle
 from src.models.predictor import ShelfLifePredictor
 import json
 from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor, VotingRegressor
@@ -155,14 +156,17 @@ def train_model():
     print("\nSaving best model...")
     os.makedirs('models', exist_ok=True)
 
-    import joblib
     best_model = voting_regressor if voting_r2 >= 0.90 else rf_best
 
-    joblib.dump(best_model, 'models/shelf_life_predictor.pkl')
-    print("Model saved successfully as: models/shelf_life_predictor.pkl")
-
-    preprocessor.save('models/preprocessor.pkl')
-    print("Preprocessor saved successfully as: models/preprocessor.pkl")
+    bundle = save_model_bundle(
+        best_model, preprocessor, X_featured.columns,
+        metrics={
+            'model': 'Voting Ensemble' if voting_r2 >= 0.90 else 'Random Forest',
+            'r2': voting_r2 if voting_r2 >= 0.90 else rf_r2,
+            'mae': voting_mae if voting_r2 >= 0.90 else rf_mae
+        }
+    )
+    print(f"Model bundle saved successfully as: models/shelf_life_model (version {bundle.version})")
 
     return best_model, preprocessor
 
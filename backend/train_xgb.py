@@ -4,6 +4,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.preprocessing.preprocessor import DataPreprocessor, load_data
 from src.feature_engineering.engineer import FeatureEngineer
+from src.models.bundle import save_model_bundle
 import json
 import numpy as np
 
@@ -25,7 +26,6 @@ from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor, V
 from sklearn.linear_model import Ridge
 from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV, RandomizedSearchCV
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-import joblib
 
 
 def train_model():
@@ -286,11 +286,11 @@ def train_model():
     print("\nSaving best model...")
     os.makedirs('models', exist_ok=True)
 
-    joblib.dump(final_model, 'models/shelf_life_predictor.pkl')
-    print("Model saved: models/shelf_life_predictor.pkl")
-
-    preprocessor.save('models/preprocessor.pkl')
-    print("Preprocessor saved: models/preprocessor.pkl")
+    bundle = save_model_bundle(
+        final_model, preprocessor, X_featured.columns,
+        metrics={'r2': final_r2, 'mae': final_mae}
+    )
+    print(f"Model bundle saved: models/shelf_life_model (version {bundle.version})")
 
     print(f"\nFinal Accuracy: {final_r2*100:.1f}%")
     print(f"Final MAE: {final_mae:.3f} days")
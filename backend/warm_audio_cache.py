@@ -0,0 +1,58 @@
+import sys
+import os
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.rules.interpreter import RuleBasedInterpreter
+from src.services.voice_service import ElevenLabsVoiceService
+from src.services.audio_cache import AudioCache
+
+
+def warm_audio_cache(cache_dir, max_disk_mb, voice_id=None, concurrency=4):
+    print("="*80)
+    print("Warming explanation audio cache")
+    print("="*80)
+
+    voice_service = ElevenLabsVoiceService()
+    # Only the shared disk tier matters here; the serving processes keep
+    # their own memory tiers.
+    voice_service.audio_cache = AudioCache(cache_dir, max_memory_bytes=0,
+                                           max_disk_bytes=int(max_disk_mb * 1024 * 1024))
+    phrases = voice_service.explanation_phrases(RuleBasedInterpreter())
+    print(f"Cache directory: {cache_dir}")
+    print(f"Static phrases:  {len(phrases)}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda phrase: voice_service.cached_text_to_speech(phrase, voice_id), phrases))
+    elapsed = time.perf_counter() - start
+
+    outcomes = {}
+    for phrase, result in zip(phrases, results):
+        if 'error' in result:
+            outcome = 'error'
+            print(f"  Failed: {phrase!r}: {result['error']}")
+        else:
+            outcome = result['cache']
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    print(f"\nSynthesized:     {outcomes.get('miss', 0)}")
+    print(f"Already cached:  {outcomes.get('memory', 0) + outcomes.get('disk', 0)}")
+    print(f"Failed:          {outcomes.get('error', 0)}")
+    print(f"Disk usage:      {voice_service.audio_cache.disk_bytes / 1024 / 1024:.1f} MB")
+    print(f"Elapsed:         {elapsed:.1f}s")
+    return outcomes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-render the fixed phrases of spoken explanations')
+    parser.add_argument('--cache-dir', default=os.getenv('AUDIO_CACHE_DIR', 'cache/audio'))
+    parser.add_argument('--max-disk-mb', type=float, default=float(os.getenv('AUDIO_CACHE_DISK_MB', '512')))
+    parser.add_argument('--voice-id', default=None)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    outcomes = warm_audio_cache(args.cache_dir, args.max_disk_mb, args.voice_id, args.concurrency)
+    sys.exit(1 if outcomes.get('error') else 0)
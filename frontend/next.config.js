@@ -1,11 +1,24 @@
 /** @type {import('next').NextConfig} */
+const apiUrl = process.env.API_URL || 'http://localhost:5001'
+// Chat and voice go to the async service (backend/async_api.py) when it runs,
+// so slow upstream calls never wait in line with predictions.
+const asyncApiUrl = process.env.ASYNC_API_URL || apiUrl
+
 const nextConfig = {
   reactStrictMode: true,
   async rewrites() {
     return [
+      {
+        source: '/api/chat/:path*',
+        destination: `${asyncApiUrl}/chat/:path*`,
+      },
+      {
+        source: '/api/voice/:path*',
+        destination: `${asyncApiUrl}/voice/:path*`,
+      },
       {
         source: '/api/:path*',
-        destination: 'http://localhost:5001/:path*',
+        destination: `${apiUrl}/:path*`,
       },
     ]
   },